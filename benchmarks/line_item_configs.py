@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import time
+import tracemalloc
+
+import dfp.create_line_items
+
+
+SIZES = [{'width': '300', 'height': '250'}, {'width': '728', 'height': '90'}]
+PLACEMENT_IDS = [1234567, 2345678]
+AD_UNIT_IDS = [3456789]
+
+def build_per_price(prices):
+  """
+  Builds each config from scratch with `create_line_item_config`.
+  """
+  return [dfp.create_line_items.create_line_item_config(name=u'benchmark: HB ${0}'.format(price),
+                                                        order_id=111, placement_ids=PLACEMENT_IDS,
+                                                        ad_unit_ids=AD_UNIT_IDS, cpm_micro_amount=price,
+                                                        sizes=SIZES, hb_bidder_key_id=222, hb_pb_key_id=333,
+                                                        hb_bidder_value_id=444, hb_pb_value_id=price,
+                                                        currency_code='USD')
+          for price in prices]
+
+def build_from_template(prices):
+  """
+  Stamps each config from one `LineItemConfigTemplate`.
+  """
+  template = dfp.create_line_items.LineItemConfigTemplate(order_id=111, placement_ids=PLACEMENT_IDS,
+                                                          ad_unit_ids=AD_UNIT_IDS, sizes=SIZES,
+                                                          hb_bidder_key_id=222, hb_pb_key_id=333,
+                                                          hb_bidder_value_id=444, currency_code='USD')
+  return [template.create(name=u'benchmark: HB ${0}'.format(price), cpm_micro_amount=price,
+                          hb_pb_value_id=price)
+          for price in prices]
+
+BUILDERS = [
+  ('per_price', build_per_price),
+  ('template', build_from_template),
+]
+
+def run_case(build, num_prices, repeat=3):
+  """
+  Returns:
+    an object: the best time per config in microseconds, and the bytes
+      allocated per config that are still held by the built configs
+  """
+  prices = [i * 10000 for i in range(1, num_prices + 1)]
+
+  seconds = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    build(prices)
+    seconds.append(time.perf_counter() - start)
+
+  tracemalloc.start()
+  try:
+    before = tracemalloc.get_traced_memory()[0]
+    configs = build(prices)
+    held = tracemalloc.get_traced_memory()[0] - before
+  finally:
+    tracemalloc.stop()
+  del configs
+
+  return {
+    'prices': num_prices,
+    'us_per_config': min(seconds) / num_prices * 1e6,
+    'bytes_per_config': held / float(num_prices),
+  }
+
+def run(num_prices):
+  return dict((name, run_case(build, num_prices)) for name, build in BUILDERS)
+
+def format_results(results):
+  lines = ['builder     us/config  bytes/config']
+  for name, _ in BUILDERS:
+    lines.append('{0:<10} {1:>10.2f} {2:>13.0f}'.format(name,
+      results[name]['us_per_config'], results[name]['bytes_per_config']))
+  return '\n'.join(lines)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(
+    description='Benchmark building line item configs per price vs. from a template.')
+  parser.add_argument('--prices', type=int, default=10000)
+  parser.add_argument('--output', help='the file to write JSON results to')
+  args = parser.parse_args(argv)
+
+  results = run(args.prices)
+  print(format_results(results))
+  if args.output:
+    with open(args.output, 'w') as output_file:
+      json.dump(results, output_file, indent=2, sort_keys=True)
+  return results
+
+if __name__ == '__main__':
+  main()
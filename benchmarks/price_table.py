@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import sys
+import time
+
+from tasks.price_utils import (
+  PriceTable,
+  get_price_bucket_ranges,
+  get_prices_array_from_ranges,
+  micro_amount_to_num,
+  num_to_str,
+)
+
+
+LINE_ITEM_FORMAT = u'{bidder_code}: HB ${price}'
+
+def format_scalar(ranges, bidder_codes):
+  """
+  Builds the prices as a list of ints and formats each price one at a time
+  with the scalar helpers, once for every bidder.
+  """
+  prices = get_prices_array_from_ranges(ranges)
+  price_strs = [num_to_str(micro_amount_to_num(price)) for price in prices]
+  names = [[LINE_ITEM_FORMAT.format(bidder_code=bidder_code, price=price_str)
+            for price_str in price_strs]
+           for bidder_code in bidder_codes]
+  return prices, names
+
+def format_table(ranges, bidder_codes):
+  """
+  Builds one PriceTable and formats its prices once for every bidder.
+  """
+  table = PriceTable.from_ranges(ranges)
+  return table, [table.to_names(LINE_ITEM_FORMAT, bidder_code)
+                 for bidder_code in bidder_codes]
+
+FORMATTERS = [
+  ('scalar', format_scalar),
+  ('table', format_table),
+]
+
+def get_price_bytes(prices):
+  """
+  Returns the bytes held by the prices, including each int in a list.
+  """
+  if isinstance(prices, PriceTable):
+    return sys.getsizeof(prices.micro_amounts)
+  return sys.getsizeof(prices) + sum(sys.getsizeof(price) for price in prices)
+
+def run_case(format_prices, ranges, bidder_codes, repeat=3):
+  """
+  Returns:
+    an object: the best time per name in microseconds, and the bytes per
+      price held by the prices
+  """
+  seconds = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    prices, names = format_prices(ranges, bidder_codes)
+    seconds.append(time.perf_counter() - start)
+
+  num_names = sum(len(bidder_names) for bidder_names in names)
+  return {
+    'names': num_names,
+    'us_per_name': min(seconds) / num_names * 1e6,
+    'bytes_per_price': get_price_bytes(prices) / float(len(prices)),
+  }
+
+def run(num_bidders, price_buckets='high'):
+  ranges = get_price_bucket_ranges(price_buckets)
+  bidder_codes = ['bidder{0}'.format(i) for i in range(num_bidders)]
+  return dict((name, run_case(format_prices, ranges, bidder_codes))
+              for name, format_prices in FORMATTERS)
+
+def format_results(results):
+  lines = ['formatter   us/name  bytes/price']
+  for name, _ in FORMATTERS:
+    lines.append('{0:<10} {1:>8.3f} {2:>12.1f}'.format(name,
+      results[name]['us_per_name'], results[name]['bytes_per_price']))
+  return '\n'.join(lines)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(
+    description='Benchmark formatting price bucket labels and line item names with the scalar helpers vs. a PriceTable.')
+  parser.add_argument('--bidders', type=int, default=100)
+  parser.add_argument('--price-buckets', default='high',
+    help='a Prebid price granularity preset')
+  parser.add_argument('--output', help='the file to write JSON results to')
+  args = parser.parse_args(argv)
+
+  results = run(args.bidders, args.price_buckets)
+  print(format_results(results))
+  if args.output:
+    with open(args.output, 'w') as output_file:
+      json.dump(results, output_file, indent=2, sort_keys=True)
+  return results
+
+if __name__ == '__main__':
+  main()
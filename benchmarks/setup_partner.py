@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import subprocess
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+import dfp.instrumentation
+import tasks.add_new_prebid_partner
+from tests.fake_ad_manager import build_network, fake_ad_manager
+
+
+logger = logging.getLogger(__name__)
+
+BIDDER_CODE = 'benchmark'
+USER_EMAIL = 'benchmark@example.com'
+ADVERTISER_NAME = 'Benchmark Advertiser'
+SIZES = [{'width': '300', 'height': '250'}]
+
+class MemorySampler(object):
+  """
+  Samples the traced memory in a background thread while it is running,
+  so the peak memory of each phase can be read from the samples taken
+  during it.
+
+  Args:
+    interval (float): seconds between samples
+  """
+
+  def __init__(self, interval=0.001):
+    self.interval = interval
+    self.samples = []
+    self._stopped = threading.Event()
+    self._thread = threading.Thread(target=self._run)
+    self._thread.daemon = True
+
+  def _run(self):
+    while True:
+      self.sample()
+      if self._stopped.wait(self.interval):
+        return
+
+  def sample(self):
+    self.samples.append((time.time(), tracemalloc.get_traced_memory()[0]))
+
+  def start(self):
+    self._thread.start()
+
+  def stop(self):
+    self._stopped.set()
+    self._thread.join()
+    self.sample()
+
+  def get_peak(self, start, end):
+    """
+    Returns the most memory sampled from `start` to `end`, or the last
+    sample before `end` if the span was too short to be sampled.
+    """
+    during = [memory for sample_time, memory in self.samples
+      if start <= sample_time <= end]
+    if during:
+      return max(during)
+    before = [memory for sample_time, memory in self.samples
+      if sample_time <= end]
+    return before[-1] if before else 0
+
+def run_case(num_line_items, num_creatives, num_placements, latency):
+  """
+  Sets up one partner against a fresh fake network.
+
+  Args:
+    num_line_items (int): the number of prices, and so line items
+    num_creatives (int): the number of creatives per line item
+    num_placements (int): the number of targeted placements
+    latency (float): simulated seconds per API call
+  Returns:
+    an object: the case parameters and its measurements
+  """
+  placements = ['Benchmark Placement {0}'.format(i)
+    for i in range(num_placements)]
+  network = build_network(USER_EMAIL, ADVERTISER_NAME, placements=placements,
+    latency=latency)
+  prices = [i * 10000 for i in range(1, num_line_items + 1)]
+
+  # Phases, and the calls made in each, are recorded by dfp.instrumentation.
+  sampler = MemorySampler()
+  tracemalloc.start()
+  sampler.start()
+  start = time.time()
+  try:
+    with fake_ad_manager(network), dfp.instrumentation.instrumented() as metrics:
+      tasks.add_new_prebid_partner.setup_partner(USER_EMAIL, ADVERTISER_NAME,
+        'Benchmark Order', placements, [], SIZES, BIDDER_CODE, prices,
+        num_creatives, 'USD', u'{bidder_code}: HB ${price}')
+    wall_time = time.time() - start
+    peak_memory = tracemalloc.get_traced_memory()[1]
+  finally:
+    sampler.stop()
+    tracemalloc.stop()
+
+  calls_by_phase = Counter()
+  for (phase, _, _), stats in metrics.calls.items():
+    calls_by_phase[phase] += stats['calls']
+
+  return {
+    'line_items': num_line_items,
+    'creatives': num_creatives,
+    'placements': num_placements,
+    'latency': latency,
+    'wall_time': wall_time,
+    'api_calls': sum(network.calls.values()),
+    'peak_memory': peak_memory,
+    'calls_by_method': dict(network.calls),
+    'phases': {
+      phase: {
+        'wall_time': span['end'] - span['start'],
+        'api_calls': calls_by_phase[phase],
+        'peak_memory': sampler.get_peak(span['start'], span['end']),
+      }
+      for phase, span in metrics.phases.items()
+    },
+  }
+
+def run_sweep(line_item_counts, creative_counts, placement_counts, latencies):
+  """
+  Runs every combination of the given parameters.
+
+  Returns:
+    an array of case results, as returned by `run_case`
+  """
+  results = []
+  for case in itertools.product(line_item_counts, creative_counts,
+    placement_counts, latencies):
+    logger.info('Running {0} line items, {1} creatives, {2} placements, '
+      '{3}s latency...'.format(*case))
+    results.append(run_case(*case))
+  return results
+
+def get_commit():
+  try:
+    return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+      cwd=os.path.dirname(os.path.abspath(__file__)),
+      stderr=subprocess.DEVNULL).decode('utf-8').strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def case_key(result):
+  return (result['line_items'], result['creatives'], result['placements'],
+    result['latency'])
+
+def format_results(results, baseline=None):
+  """
+  Returns a table of the results, comparing wall times to a baseline run's
+  if one is given.
+  """
+  baseline_times = {}
+  if baseline is not None:
+    baseline_times = dict((case_key(result), result['wall_time'])
+      for result in baseline['results'])
+
+  lines = ['line_items creatives placements latency  wall_s  calls  peak_mb  '
+    'slowest phase' + ('  vs baseline' if baseline else '')]
+  for result in results:
+    phases = result['phases']
+    slowest = max(phases, key=lambda phase: phases[phase]['wall_time'])
+    line = '{0:>10} {1:>9} {2:>10} {3:>7} {4:>7.2f} {5:>6} {6:>8.1f}  {7} ({8:.2f}s)'.format(
+      result['line_items'], result['creatives'], result['placements'],
+      result['latency'], result['wall_time'], result['api_calls'],
+      result['peak_memory'] / 1e6, slowest, phases[slowest]['wall_time'])
+    if case_key(result) in baseline_times:
+      line += '  {0:.2f}x'.format(
+        result['wall_time'] / baseline_times[case_key(result)])
+    lines.append(line)
+  return '\n'.join(lines)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(
+    description='Benchmark partner setup against a fake Ad Manager network.')
+  parser.add_argument('--line-items', type=int, nargs='+',
+    default=[200, 2000, 10000])
+  parser.add_argument('--creatives', type=int, nargs='+', default=[2])
+  parser.add_argument('--placements', type=int, nargs='+', default=[2])
+  parser.add_argument('--latency', type=float, nargs='+', default=[0, 0.01],
+    help='simulated seconds per API call')
+  parser.add_argument('--output', help='the file to write JSON results to')
+  parser.add_argument('--baseline',
+    help='a JSON results file from an earlier run to compare against')
+  args = parser.parse_args(argv)
+
+  results = run_sweep(args.line_items, args.creatives, args.placements,
+    args.latency)
+  report = {
+    'commit': get_commit(),
+    'python': platform.python_version(),
+    'date': datetime.now().isoformat(),
+    'results': results,
+  }
+
+  baseline = None
+  if args.baseline:
+    with open(args.baseline, 'r') as baseline_file:
+      baseline = json.load(baseline_file)
+  print(format_results(results, baseline))
+
+  if args.output:
+    with open(args.output, 'w') as output_file:
+      json.dump(report, output_file, indent=2, sort_keys=True)
+  return report
+
+if __name__ == '__main__':
+  # Only show the sweep's progress, not every setup's.
+  logging.getLogger('dfp').setLevel(logging.WARNING)
+  logging.getLogger('tasks').setLevel(logging.WARNING)
+  main()
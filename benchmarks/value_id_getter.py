@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import time
+
+from tasks.add_new_prebid_partner import DFPValueIdGetter
+from tasks.price_utils import PriceTable
+from tests.fake_ad_manager import FakeNetwork, fake_ad_manager
+
+
+def build_network(num_values):
+  """
+  Returns a FakeNetwork with an `hb_pb` key that has `num_values` values.
+  """
+  network = FakeNetwork()
+  key = network.add('targeting_key', name='hb_pb', displayName='hb_pb',
+    type='PREDEFINED')
+  names = PriceTable(i * 10000 for i in range(num_values)).to_strs()
+  for name in names:
+    network.add('targeting_value', name=name, displayName=name,
+      customTargetingKeyId=key['id'], status='ACTIVE')
+  return network, names
+
+def run_case(num_values, num_lookups=2000, repeat=5):
+  """
+  Returns:
+    an object: the best time per `get_value_id` call in microseconds
+      against a key with `num_values` existing values, looking up names
+      spread across the key
+  """
+  network, names = build_network(num_values)
+  with fake_ad_manager(network):
+    getter = DFPValueIdGetter('hb_pb')
+
+  step = max(num_values // num_lookups, 1)
+  names = names[::step]
+
+  seconds = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    for name in names:
+      getter.get_value_id(name)
+    seconds.append(time.perf_counter() - start)
+
+  return {
+    'values': num_values,
+    'lookups': len(names),
+    'us_per_lookup': min(seconds) / len(names) * 1e6,
+  }
+
+def run(value_counts):
+  return [run_case(num_values) for num_values in value_counts]
+
+def format_results(results):
+  lines = ['values  us/lookup']
+  for result in results:
+    lines.append('{0:>6} {1:>10.3f}'.format(result['values'],
+      result['us_per_lookup']))
+  return '\n'.join(lines)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(
+    description='Benchmark looking up targeting value IDs as a key accumulates values.')
+  parser.add_argument('--values', type=int, nargs='+',
+    default=[1000, 10000, 100000])
+  parser.add_argument('--output', help='the file to write JSON results to')
+  args = parser.parse_args(argv)
+
+  results = run(args.values)
+  print(format_results(results))
+  if args.output:
+    with open(args.output, 'w') as output_file:
+      json.dump(results, output_file, indent=2, sort_keys=True)
+  return results
+
+if __name__ == '__main__':
+  main()
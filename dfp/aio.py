@@ -0,0 +1,51 @@
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from dfp.batches import get_max_concurrent_requests
+from dfp.instrumentation import propagate
+
+
+def run(func, *args, **kwargs):
+  """
+  Runs a blocking DFP call on the event loop's executor, e.g.
+  `await dfp.aio.run(dfp.get_users.get_user_id_by_email, email)`.
+
+  The googleads SOAP client is synchronous, so each call runs on its own
+  thread while the event loop awaits it. Call this inside a
+  `dfp.client.pooled()` block so the threads share one client.
+
+  Args:
+    func (function): the blocking function to call
+  Returns:
+    an awaitable: resolves to the return value of `func`
+  """
+  loop = asyncio.get_event_loop()
+  return loop.run_in_executor(None,
+    propagate(functools.partial(func, *args, **kwargs)))
+
+def run_until_complete(coroutine, max_workers=None):
+  """
+  Runs a coroutine to completion on a new event loop, with at most
+  `max_workers` blocking DFP calls in flight at once.
+
+  Args:
+    coroutine: the coroutine to run
+    max_workers (int): the size of the thread pool for blocking calls.
+      Defaults to the DFP_MAX_CONCURRENT_REQUESTS setting, or 4.
+  Returns:
+    the return value of the coroutine
+  """
+  if max_workers is None:
+    max_workers = get_max_concurrent_requests()
+
+  loop = asyncio.new_event_loop()
+  executor = ThreadPoolExecutor(max_workers=max(max_workers, 1))
+  loop.set_default_executor(executor)
+  try:
+    return loop.run_until_complete(coroutine)
+  finally:
+    loop.run_until_complete(loop.shutdown_asyncgens())
+    loop.close()
+    executor.shutdown(wait=True)
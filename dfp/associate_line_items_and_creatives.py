@@ -2,53 +2,122 @@
 import logging
 from googleads import ad_manager
 
-from dfp.client import get_client
+from dfp.batches import iter_batches, submit_batches
+from dfp.client import get_service
 
 
 logger = logging.getLogger(__name__)
 
-def make_licas(line_item_ids, creative_ids, size_overrides=[]):
+def make_licas(line_item_ids, creative_ids, size_overrides=[], batch_size=500,
+  max_workers=None, existing_licas=None, on_batch_created=None):
   """
   Attaches creatives to line items in DFP.
 
   Args:
     line_item_ids (arr): an array of line item IDs
     creative_ids (arr): an array of creative IDs
+    batch_size (int): the maximum number of associations per request
+    max_workers (int): the maximum number of requests in flight at once.
+      Defaults to the DFP_MAX_CONCURRENT_REQUESTS setting, or 4.
+    existing_licas (set): (line item ID, creative ID) pairs that are already
+      associated and should be skipped
+    on_batch_created (function): if set, called with each batch of created
+      associations as soon as the batch completes
   Returns:
-    None
+    an integer: the number of associations created
   """
-  dfp_client = get_client()
-  lica_service = dfp_client.GetService(
-    'LineItemCreativeAssociationService', version='v202008')
+  licas = iter_lica_configs(line_item_ids, creative_ids, size_overrides,
+    existing_licas)
+  return create_licas(licas, batch_size=batch_size, max_workers=max_workers,
+    on_batch_created=on_batch_created)
 
-  sizes = []
+def iter_lica_configs(line_item_ids, creative_ids, size_overrides=[],
+  existing_licas=None):
+  """
+  Yields a config associating each creative with each line item, one at a
+  time, so the full cross product is never held in memory.
 
-  for size_override in size_overrides:
-    sizes.append(size_override)
+  Args:
+    line_item_ids (arr): an array of line item IDs
+    creative_ids (arr): an array of creative IDs
+    size_overrides (arr): the sizes the creatives may serve to
+    existing_licas (set): (line item ID, creative ID) pairs to skip
+  Returns:
+    a generator of objects: the association configs
+  """
+  # Every association shares one copy of the sizes.
+  sizes = list(size_overrides)
 
-  licas = []
   for line_item_id in line_item_ids:
     for creative_id in creative_ids:
-      licas.append({
-        'creativeId': creative_id,
-        'lineItemId': line_item_id,
-        # "Overrides the value set for Creative.size, which allows the
-        #   creative to be served to ad units that would otherwise not be
-        #   compatible for its actual size."
-        #    https://developers.google.com/doubleclick-publishers/docs/reference/v201802/LineItemCreativeAssociationService.LineItemCreativeAssociation
-        #
-        # This is equivalent to selecting "Size overrides" in the DFP creative
-        # settings, as recommended: http://prebid.org/adops/step-by-step.html
-        'sizes': sizes
-      })
-
-  batchsize = 500
-  for i in range(0, len(licas), batchsize):
-    batch = licas[i:i+batchsize] # select a portion of licas array to process in batches
-    batch = lica_service.createLineItemCreativeAssociations(batch)
-
-    if batch:
-      current_total = i+batchsize if i+batchsize < len(licas) else len(licas)
-      logger.info('Created {0} line items of {1} <> for creative associations.'.format(current_total, len(licas)))
-    else:
-      logger.info('No line item <> creative associations created.')
\ No newline at end of file
+      if existing_licas and (line_item_id, creative_id) in existing_licas:
+        continue
+      yield create_lica_config(line_item_id, creative_id, sizes)
+
+def create_lica_config(line_item_id, creative_id, size_overrides=[]):
+  """
+  Creates a line item creative association config object.
+
+  Args:
+    line_item_id (int): the ID of the line item
+    creative_id (int): the ID of the creative
+    size_overrides (arr): an array of objects, each containing 'width' and
+      'height' keys, of the sizes the creative may serve to
+  Returns:
+    an object: the line item creative association config
+  """
+  return {
+    'creativeId': creative_id,
+    'lineItemId': line_item_id,
+    # "Overrides the value set for Creative.size, which allows the
+    #   creative to be served to ad units that would otherwise not be
+    #   compatible for its actual size."
+    #    https://developers.google.com/doubleclick-publishers/docs/reference/v201802/LineItemCreativeAssociationService.LineItemCreativeAssociation
+    #
+    # This is equivalent to selecting "Size overrides" in the DFP creative
+    # settings, as recommended: http://prebid.org/adops/step-by-step.html
+    'sizes': size_overrides,
+  }
+
+def create_licas(licas, batch_size=500, max_workers=None,
+  on_batch_created=None):
+  """
+  Creates line item creative associations in DFP, in concurrent batches.
+
+  Args:
+    licas (iterable): an array or generator of objects, each an association
+      config
+    batch_size (int): the maximum number of associations per request
+    max_workers (int): the maximum number of requests in flight at once.
+      Defaults to the DFP_MAX_CONCURRENT_REQUESTS setting, or 4.
+    on_batch_created (function): if set, called with each batch of created
+      associations as soon as the batch completes
+  Returns:
+    an integer: the number of associations created
+  """
+  num_licas = [0]
+
+  def count_licas(licas):
+    for lica in licas:
+      num_licas[0] += 1
+      yield lica
+
+  def create_batch(batch):
+    lica_service = get_service(
+      'LineItemCreativeAssociationService', version='v202008')
+    created_licas = lica_service.createLineItemCreativeAssociations(batch)
+    if created_licas and on_batch_created is not None:
+      on_batch_created(created_licas)
+    return len(created_licas) if created_licas else 0
+
+  created_counts = submit_batches(create_batch,
+    iter_batches(count_licas(licas), batch_size), max_workers=max_workers,
+    description='line item <> creative associations')
+
+  num_created = sum(created_counts)
+  if num_created:
+    logger.info('Created {0} of {1} line item <> creative associations.'.format(
+      num_created, num_licas[0]))
+  else:
+    logger.info('No line item <> creative associations created.')
+  return num_created
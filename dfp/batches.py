@@ -0,0 +1,128 @@
+
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+from dfp.instrumentation import propagate
+from dfp.retry import is_batch_too_large, record
+
+
+logger = logging.getLogger(__name__)
+
+def get_max_concurrent_requests():
+  """
+  Returns the maximum number of DFP requests to have in flight at once.
+  """
+  return getattr(settings, 'DFP_MAX_CONCURRENT_REQUESTS', 4)
+
+def split_into_batches(items, batch_size):
+  """
+  Splits an array into consecutive batches.
+
+  Args:
+    items (arr): the array to split
+    batch_size (int): the maximum length of each batch
+  Returns:
+    an array of arrays
+  """
+  return [items[i:i+batch_size] for i in range(0, len(items), batch_size)]
+
+def iter_batches(items, batch_size):
+  """
+  Like `split_into_batches`, for any iterable: yields consecutive batches,
+  pulling only one batch of items from `items` at a time.
+
+  Args:
+    items (iterable): the items to split
+    batch_size (int): the maximum length of each batch
+  Returns:
+    a generator of arrays
+  """
+  items = iter(items)
+  while True:
+    batch = list(itertools.islice(items, batch_size))
+    if not batch:
+      return
+    yield batch
+
+def submit_batches(submit_batch, batches, max_workers=None, description='items'):
+  """
+  Calls `submit_batch` on every batch using a bounded pool of threads, and
+  logs how long each batch took.
+
+  If DFP rejects a batch as too large, the batch is split in half and the
+  halves are submitted instead, and later batches are split to the same
+  size.
+
+  Batches are taken from `batches` only as workers free up, so when it is a
+  generator, at most about `max_workers` batches are in memory at once.
+
+  Args:
+    submit_batch (function): called with one batch, returning its result
+    batches (iterable): an array or generator of batches
+    max_workers (int): the maximum number of batches to submit at once
+    description (str): what the batches contain, for logging
+  Returns:
+    an array: the result of each batch submitted, in the same order as
+      `batches`. A batch that was split has a result for each part.
+  """
+  if max_workers is None:
+    max_workers = get_max_concurrent_requests()
+
+  lock = threading.Lock()
+  # The largest batch DFP has accepted so far, once one has been rejected.
+  max_batch_size = [None]
+
+  def submit_with_splitting(batch):
+    results = []
+    for part in split_into_batches(batch, max_batch_size[0] or len(batch)):
+      try:
+        results.append(submit_batch(part))
+      except Exception as e:
+        if not is_batch_too_large(e) or len(part) <= 1:
+          raise
+        with lock:
+          max_batch_size[0] = min(max_batch_size[0] or len(part), len(part) // 2)
+        record('batch_splits')
+        logger.info(u'DFP rejected {size} {description} as too many for one '
+          'request. Retrying in batches of {new_size}.'.format(
+            size=len(part), description=description,
+            new_size=max_batch_size[0]))
+        results.extend(submit_with_splitting(part))
+    return results
+
+  # Generators have no length to report progress against.
+  total = u' of {0}'.format(len(batches)) if hasattr(batches, '__len__') else ''
+
+  @propagate
+  def timed_submit(indexed_batch):
+    batch_num, batch = indexed_batch
+    start = time.time()
+    results = submit_with_splitting(batch)
+    logger.info(u'Submitted batch {num}{total} ({size} {description}) '
+      'in {secs:.2f}s.'.format(num=batch_num, total=total,
+        size=len(batch), description=description, secs=time.time() - start))
+    return results
+
+  indexed_batches = enumerate(batches, 1)
+  if max_workers <= 1 or (hasattr(batches, '__len__') and len(batches) <= 1):
+    batch_results = [timed_submit(indexed_batch)
+      for indexed_batch in indexed_batches]
+  else:
+    batch_results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+      # Keep at most `max_workers` batches in flight, collecting results in
+      # batch order, and only take the next batch once one is collected.
+      pending = deque()
+      for indexed_batch in indexed_batches:
+        if len(pending) >= max_workers:
+          batch_results.append(pending.popleft().result())
+        pending.append(executor.submit(timed_submit, indexed_batch))
+      while pending:
+        batch_results.append(pending.popleft().result())
+
+  return [result for results in batch_results for result in results]
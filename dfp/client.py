@@ -1,8 +1,185 @@
 
+import logging
+import threading
+from contextlib import contextmanager
+
+import yaml
 from googleads import ad_manager
 
 import settings
+from dfp.instrumentation import wrap_service
+from dfp.retry import RetryingService, get_retry_stats, reset_retry_stats
 
 
-def get_client():
+logger = logging.getLogger(__name__)
+
+class ClientPool(object):
+  """
+  A process-wide cache of the DFP client and its SOAP service proxies.
+
+  While the pool is open, credentials are loaded from the googleads YAML
+  file once and each service proxy is built once per (service name, API
+  version, thread). Service proxies keep their own HTTP session, so reusing
+  them also reuses keep-alive connections to the API.
+  """
+
+  def __init__(self):
+    self._lock = threading.RLock()
+    self._depth = 0
+    self._client = None
+    self._services = {}
+    self.reset_stats()
+
+  @property
+  def is_open(self):
+    return self._depth > 0
+
+  def open(self):
+    """
+    Opens one level of the pool. Opening the outermost level resets the
+    pool and retry stats, so each run reports only its own.
+    """
+    with self._lock:
+      self._depth += 1
+      if self._depth == 1:
+        self.reset_stats()
+        reset_retry_stats()
+
+  def close(self):
+    """
+    Closes one level of the pool. The cached client and services are
+    dropped when the outermost level is closed.
+    """
+    with self._lock:
+      self._depth = max(self._depth - 1, 0)
+      if self._depth == 0:
+        self._client = None
+        self._services = {}
+
+  def reset_stats(self):
+    with self._lock:
+      self.stats = {
+        'client_hits': 0,
+        'client_misses': 0,
+        'service_hits': 0,
+        'service_misses': 0,
+      }
+
+  def get_client(self):
+    """
+    Returns the pooled DFP client, loading it on first use.
+    """
+    with self._lock:
+      if self._client is None:
+        self.stats['client_misses'] += 1
+        self._client = _load_client()
+      else:
+        self.stats['client_hits'] += 1
+      return self._client
+
+  def get_service(self, service_name, version):
+    """
+    Returns the pooled service proxy for the calling thread, building it
+    on first use. SOAP proxies are not safe to share across threads, so
+    each thread gets its own.
+    """
+    key = (service_name, version, threading.current_thread().ident)
+    with self._lock:
+      service = self._services.get(key)
+      if service is not None:
+        self.stats['service_hits'] += 1
+        return service
+      self.stats['service_misses'] += 1
+      dfp_client = self.get_client()
+
+    # Building the proxy fetches and parses the WSDL, so do it outside the
+    # lock to let other threads keep using their cached services.
+    service = dfp_client.GetService(service_name, version=version)
+    with self._lock:
+      return self._services.setdefault(key, service)
+
+_pool = ClientPool()
+
+def _load_client():
   return ad_manager.AdManagerClient.LoadFromStorage(settings.GOOGLEADS_YAML_FILE)
+
+_network_codes = {}
+_network_codes_lock = threading.Lock()
+
+def get_network_code():
+  """
+  Returns the network code from the googleads YAML file. The file is read
+  once per path, without building a client or refreshing credentials.
+  """
+  path = settings.GOOGLEADS_YAML_FILE
+  with _network_codes_lock:
+    if path not in _network_codes:
+      with open(path, 'r') as yaml_file:
+        config = yaml.safe_load(yaml_file) or {}
+      _network_codes[path] = (config.get('ad_manager') or {}).get('network_code')
+    return _network_codes[path]
+
+def get_client():
+  """
+  Returns a DFP client. Inside a `pooled()` block the client is shared,
+  otherwise credentials are loaded on every call.
+  """
+  if _pool.is_open:
+    return _pool.get_client()
+  return _load_client()
+
+def get_service(service_name, version):
+  """
+  Returns a DFP service proxy, e.g. `get_service('OrderService', 'v202008')`.
+
+  Args:
+    service_name (str): the name of the DFP service
+    version (str): the DFP API version
+  Returns:
+    a googleads SOAP service proxy. Calls are rate limited and retried (see
+      `dfp.retry`), and instrumented if instrumentation is active (see
+      `dfp.instrumentation`).
+  """
+  if _pool.is_open:
+    service = _pool.get_service(service_name, version)
+  else:
+    service = _load_client().GetService(service_name, version=version)
+  return RetryingService(wrap_service(service, service_name))
+
+@contextmanager
+def pooled():
+  """
+  Shares one DFP client and its service proxies across every DFP call made
+  inside the block, from any thread. Blocks may be nested; the cache is
+  dropped when the outermost block exits.
+  """
+  _pool.open()
+  try:
+    yield _pool
+  finally:
+    if _pool._depth == 1:
+      stats = get_pool_stats()
+      logger.info(('DFP client pool: {client_misses} client loads, '
+        '{service_misses} services built, {service_hits} service '
+        'reuses.').format(**stats))
+      retry_stats = get_retry_stats()
+      if retry_stats:
+        logger.info(('DFP retries: {retries} retries, {gave_up} gave up, '
+          '{backoff_seconds:.1f}s backing off, {rate_limited_seconds:.1f}s '
+          'rate limited, {batch_splits} batch splits.').format(**dict({
+            'retries': 0, 'gave_up': 0, 'backoff_seconds': 0,
+            'rate_limited_seconds': 0, 'batch_splits': 0}, **retry_stats)))
+    _pool.close()
+
+def get_pool_stats():
+  """
+  Returns the pool's hit/miss counters.
+
+  Returns:
+    an object: with keys "client_hits", "client_misses", "service_hits" and
+      "service_misses"
+  """
+  return dict(_pool.stats)
+
+def reset_pool_stats():
+  _pool.reset_stats()
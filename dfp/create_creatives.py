@@ -1,15 +1,86 @@
 
+import hashlib
 import logging
 import os
 import pprint
+import threading
 
 from googleads import ad_manager
 
-from dfp.client import get_client
+import settings
+from dfp.client import get_service
+from dfp.get_creatives import iter_creatives_for_advertiser
 
 
 logger = logging.getLogger(__name__)
 
+# The Prebid universal creative snippet used unless the settings choose
+# another.
+DEFAULT_SNIPPET_FILE = os.path.join(os.path.dirname(__file__),
+  'creative_snippet.html')
+
+# Replaced by the bidder code in snippets.
+BIDDER_CODE_PLACEHOLDER = '${bidder_code}'
+
+_snippets = {}
+_snippets_lock = threading.Lock()
+
+# Matches the names `build_creative_name` gives creatives.
+POOL_NAME_PATTERN = '%: HB %'
+
+# Partners setting up at the same time take turns at the pool, so each sees
+# the creatives the others created.
+_pool_lock = threading.Lock()
+
+def load_snippet(path):
+  """
+  Returns the contents of a snippet file, reading it only the first time
+  and again whenever the file is modified.
+
+  Args:
+    path (str): the path of the snippet file
+  Returns:
+    a string
+  """
+  mtime = os.path.getmtime(path)
+  with _snippets_lock:
+    cached = _snippets.get(path)
+    if cached is not None and cached[0] == mtime:
+      return cached[1]
+  with open(path, 'r') as snippet_file:
+    snippet = snippet_file.read()
+  with _snippets_lock:
+    _snippets[path] = (mtime, snippet)
+  return snippet
+
+def get_snippet_file(bidder_code=None):
+  """
+  Returns the path of the snippet file for a bidder: its entry in the
+  DFP_CREATIVE_SNIPPET_FILES setting, else the DFP_CREATIVE_SNIPPET_FILE
+  setting, else the Prebid universal creative.
+  """
+  snippet_files = getattr(settings, 'DFP_CREATIVE_SNIPPET_FILES', None) or {}
+  if bidder_code in snippet_files:
+    return snippet_files[bidder_code]
+  return getattr(settings, 'DFP_CREATIVE_SNIPPET_FILE', None) or DEFAULT_SNIPPET_FILE
+
+def get_snippet(bidder_code=None):
+  """
+  Returns the creative snippet for a bidder, with `${bidder_code}` in the
+  snippet file replaced by the bidder code.
+
+  Args:
+    bidder_code (str): the bidder code for the header bidding partner
+  Returns:
+    a string
+  """
+  snippet = load_snippet(get_snippet_file(bidder_code))
+  if bidder_code is None:
+    return snippet
+  # Only the placeholder is replaced, so any other `$` in the snippet's
+  # JavaScript is kept as is.
+  return snippet.replace(BIDDER_CODE_PLACEHOLDER, bidder_code)
+
 def create_creatives(creatives):
   """
   Creates creatives in DFP.
@@ -19,8 +90,7 @@ def create_creatives(creatives):
   Returns:
     an array: an array of created creative IDs
   """
-  dfp_client = get_client()
-  creative_service = dfp_client.GetService('CreativeService',
+  creative_service = get_service('CreativeService',
     version='v202008')
   creatives = creative_service.createCreatives(creatives)
 
@@ -31,7 +101,7 @@ def create_creatives(creatives):
     logger.info(u'Created creative with name "{name}".'.format(name=creative['name']))
   return created_creative_ids
 
-def create_creative_config(name, advertiser_id, video_ad_type, redirect_url):
+def create_creative_config(name, advertiser_id, video_ad_type, redirect_url, snippet=None):
   """
   Creates a creative config object.
 
@@ -40,15 +110,12 @@ def create_creative_config(name, advertiser_id, video_ad_type, redirect_url):
     advertiser_id (int): the ID of the advertiser in DFP
     video_ad_type (bool): create video ads
     redirect_url (str): if not empty, creates a redirect creative with the provided URL instead of a third party
+    snippet (str): the third party creative's snippet. Defaults to the
+      snippet from `get_snippet`.
   Returns:
     an object: the line item config
   """
 
-  snippet_file_path = os.path.join(os.path.dirname(__file__),
-    'creative_snippet.html')
-  with open(snippet_file_path, 'r') as snippet_file:
-      snippet = snippet_file.read()
-
   # https://developers.google.com/doubleclick-publishers/docs/reference/v201802/CreativeService.Creative
   config = {
     'name': name,
@@ -62,7 +129,7 @@ def create_creative_config(name, advertiser_id, video_ad_type, redirect_url):
     config['vastXmlUrl'] = redirect_url
   else:
     config['xsi_type'] = 'ThirdPartyCreative'
-    config['snippet'] = snippet
+    config['snippet'] = snippet if snippet is not None else get_snippet()
     config['isSafeFrameCompatible'] = True
     config['size'] = { 'width': '1', 'height': '1' }
 
@@ -98,6 +165,9 @@ def create_duplicate_creative_configs(bidder_code, order_name, advertiser_id,
   Returns:
     an array: an array of length `num_creatives`, each item a line item config
   """
+  # Every duplicate shares the bidder's snippet. Video creatives have none.
+  snippet = None if video_ad_type else get_snippet(bidder_code)
+
   creative_configs = []
   for creative_num in range(1, num_creatives + 1):
     config = create_creative_config(
@@ -105,7 +175,62 @@ def create_duplicate_creative_configs(bidder_code, order_name, advertiser_id,
       advertiser_id=advertiser_id,
       video_ad_type=video_ad_type,
       redirect_url=redirect_url,
+      snippet=snippet,
     )
     creative_configs.append(config)
   return creative_configs
 
+
+def get_snippet_hash(snippet):
+  """
+  Returns a hash of a creative snippet, to compare snippets by.
+  """
+  return hashlib.sha256(snippet.encode('utf-8')).hexdigest()
+
+def get_pooled_creative_ids(bidder_code, order_name, advertiser_id,
+  num_creatives=1, exclude_ids=()):
+  """
+  Returns the IDs of `num_creatives` third party creatives for a bidder,
+  reusing the advertiser's existing creatives made by this tool that have
+  the bidder's snippet and creating only the shortfall.
+
+  Args:
+    bidder_code (str): the bidder code for the header bidding partner
+    order_name (int): the name of the order in DFP
+    advertiser_id (int): the ID of the advertiser in DFP
+    num_creatives (int): how many creatives to return
+    exclude_ids (arr): IDs of creatives not to return, e.g. those a line
+      item already has
+  Returns:
+    an array: the creative IDs
+  """
+  snippet = get_snippet(bidder_code)
+  snippet_hash = get_snippet_hash(snippet)
+  exclude_ids = set(exclude_ids)
+
+  with _pool_lock:
+    # Page through the pool one page at a time, and stop as soon as enough
+    # matching creatives are found.
+    creative_ids = []
+    creatives = iter_creatives_for_advertiser(advertiser_id, POOL_NAME_PATTERN,
+      max_workers=1)
+    while len(creative_ids) < num_creatives:
+      creative = next(creatives, None)
+      if creative is None:
+        break
+      if creative['id'] in exclude_ids or 'snippet' not in creative:
+        continue
+      if get_snippet_hash(creative['snippet']) == snippet_hash:
+        creative_ids.append(creative['id'])
+    num_reused = len(creative_ids)
+
+    if num_reused < num_creatives:
+      # Number the new creatives after the ones reused.
+      creative_configs = create_duplicate_creative_configs(bidder_code,
+        order_name, advertiser_id, len(exclude_ids) + num_creatives)
+      creative_configs = creative_configs[len(exclude_ids) + num_reused:]
+      creative_ids.extend(create_creatives(creative_configs))
+
+  logger.info(u'Reused {num} existing creatives.'.format(num=num_reused))
+
+  return creative_ids
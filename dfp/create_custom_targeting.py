@@ -4,7 +4,7 @@ import logging
 
 from googleads import ad_manager
 
-from dfp.client import get_client
+from dfp.client import get_service
 
 
 logger = logging.getLogger(__name__)
@@ -21,8 +21,7 @@ def create_targeting_key(name, display_name=None, key_type='FREEFORM'):
     an integer: the ID of the created key
   """
 
-  dfp_client = get_client()
-  custom_targeting_service = dfp_client.GetService('CustomTargetingService',
+  custom_targeting_service = get_service('CustomTargetingService',
     version='v202008')
 
   if display_name is None:
@@ -58,8 +57,7 @@ def create_targeting_value(name, key_id):
     None
   """
 
-  dfp_client = get_client()
-  custom_targeting_service = dfp_client.GetService('CustomTargetingService',
+  custom_targeting_service = get_service('CustomTargetingService',
     version='v202008')
 
   values_config = [
@@ -85,3 +83,44 @@ def create_targeting_value(name, key_id):
       display_name=created_value['displayName']))
 
   return created_value['id']
+
+def create_targeting_values(names, key_id, batch_size=500):
+  """
+  Creates custom targeting values for a specific key in DFP, sending up to
+  `batch_size` values in each request.
+
+  Args:
+    names (arr): an array of value names
+    key_id (int): the ID of the associated DFP key
+    batch_size (int): the maximum number of values to create per request
+  Returns:
+    an object: a map of each created value name to its DFP ID
+  """
+
+  custom_targeting_service = get_service('CustomTargetingService',
+    version='v202008')
+
+  # Drop duplicate names, keeping their order.
+  names = [str(name) for name in dict.fromkeys(names)]
+
+  value_ids = {}
+  for i in range(0, len(names), batch_size):
+    values_config = [
+      {
+        'customTargetingKeyId': key_id,
+        'displayName': name,
+        'name': name,
+        'matchType': 'EXACT'
+      }
+      for name in names[i:i+batch_size]
+    ]
+    values = custom_targeting_service.createCustomTargetingValues(
+      values_config)
+
+    for value in values or []:
+      value_ids[value['name']] = value['id']
+
+    logger.info(u'Created {0} of {1} custom targeting values.'.format(
+      min(i + batch_size, len(names)), len(names)))
+
+  return value_ids
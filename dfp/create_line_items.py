@@ -1,26 +1,50 @@
 
 from googleads import ad_manager
 
-from dfp.client import get_client
+import settings
+from dfp.batches import iter_batches, submit_batches
+from dfp.client import get_service
 
 
-def create_line_items(line_items):
+def create_line_items(line_items, batch_size=None, max_workers=None,
+  on_batch_created=None):
   """
-  Creates line items in DFP.
+  Creates line items in DFP, splitting them into batches that are created
+  concurrently.
 
   Args:
-    line_items (arr): an array of objects, each a line item configuration
+    line_items (iterable): an array or generator of objects, each a line item
+      configuration. A generator's configs are only built as batches are
+      sent.
+    batch_size (int): the maximum number of line items per request. Defaults
+      to the DFP_LINE_ITEM_BATCH_SIZE setting, or 250.
+    max_workers (int): the maximum number of requests in flight at once.
+      Defaults to the DFP_MAX_CONCURRENT_REQUESTS setting, or 4.
+    on_batch_created (function): if set, called with each batch of created
+      line items as soon as the batch completes
   Returns:
-    an array: an array of created line item IDs
+    an array: an array of created line item IDs, in the same order as
+      `line_items`
   """
-  dfp_client = get_client()
-  line_item_service = dfp_client.GetService('LineItemService', version='v202008')
-  line_items = line_item_service.createLineItems(line_items)
+  if batch_size is None:
+    batch_size = getattr(settings, 'DFP_LINE_ITEM_BATCH_SIZE', 250)
+
+  def create_batch(batch):
+    line_item_service = get_service('LineItemService', version='v202008')
+    created_line_items = line_item_service.createLineItems(batch)
+    if on_batch_created is not None:
+      on_batch_created(created_line_items)
+    return created_line_items
+
+  created_batches = submit_batches(create_batch,
+    iter_batches(line_items, batch_size), max_workers=max_workers,
+    description='line items')
 
   # Return IDs of created line items.
   created_line_item_ids = []
-  for line_item in line_items:
-    created_line_item_ids.append(line_item['id'])
+  for created_line_items in created_batches:
+    for line_item in created_line_items:
+      created_line_item_ids.append(line_item['id'])
   return created_line_item_ids
 
 def create_line_item_config(name, order_id, placement_ids, ad_unit_ids, cpm_micro_amount, sizes, hb_bidder_key_id,
@@ -45,73 +69,118 @@ def create_line_item_config(name, order_id, placement_ids, ad_unit_ids, cpm_micr
     an object: the line item config
   """
 
-  # Set up sizes.
-  creative_placeholders = []
-  
-  for size in sizes:
-    creative_placeholders.append({
-      'size': size
-    })
-
-  # Create key/value targeting for Prebid.
-  # https://github.com/googleads/googleads-python-lib/blob/master/examples/dfp/v201802/line_item_service/target_custom_criteria.py
-  # create custom criterias
-
-  hb_bidder_criteria = {
-    'xsi_type': 'CustomCriteria',
-    'keyId': hb_bidder_key_id,
-    'valueIds': [hb_bidder_value_id],
-    'operator': 'IS'
-  }
-
-  hb_pb_criteria = {
-    'xsi_type': 'CustomCriteria',
-    'keyId': hb_pb_key_id,
-    'valueIds': [hb_pb_value_id],
-    'operator': 'IS'
-  }
-
-  # The custom criteria will resemble:
-  # (hb_bidder_criteria.key == hb_bidder_criteria.value AND
-  #    hb_pb_criteria.key == hb_pb_criteria.value)
-  top_set = {
-    'xsi_type': 'CustomCriteriaSet',
-    'logicalOperator': 'AND',
-    'children': [hb_bidder_criteria, hb_pb_criteria]
-  }
-
-  # https://developers.google.com/doubleclick-publishers/docs/reference/v201802/LineItemService.LineItem
-  line_item_config = {
-    'name': name,
-    'orderId': order_id,
-    # https://developers.google.com/doubleclick-publishers/docs/reference/v201802/LineItemService.Targeting
-    'targeting': {
-      'inventoryTargeting': {},
-      'customTargeting': top_set,
-    },
-    'startDateTimeType': 'IMMEDIATELY',
-    'unlimitedEndDateTime': True,
-    'lineItemType': 'PRICE_PRIORITY',
-    'costType': 'CPM',
-    'costPerUnit': {
-      'currencyCode': currency_code,
-      'microAmount': cpm_micro_amount
-    },
-    'creativeRotationType': 'EVEN',
-    'primaryGoal': {
-      'goalType': 'NONE'
-    },
-    'creativePlaceholders': creative_placeholders,
-  }
-  if video_ad_type:
-    line_item_config['environmentType'] = 'VIDEO_PLAYER'
-    # https://developers.google.com/ad-manager/api/reference/v202005/LineItemService.RequestPlatformTargeting
-    line_item_config['targeting']['requestPlatformTargeting'] = { 'targetedRequestPlatforms': [ 'VIDEO_PLAYER' ] },
+  template = LineItemConfigTemplate(order_id=order_id, placement_ids=placement_ids, ad_unit_ids=ad_unit_ids,
+                                    sizes=sizes, hb_bidder_key_id=hb_bidder_key_id, hb_pb_key_id=hb_pb_key_id,
+                                    hb_bidder_value_id=hb_bidder_value_id, currency_code=currency_code,
+                                    video_ad_type=video_ad_type)
+  return template.create(name=name, cpm_micro_amount=cpm_micro_amount, hb_pb_value_id=hb_pb_value_id)
+
+class LineItemConfigTemplate(object):
+  """
+  Builds line item configs that differ only by name, price and `hb_pb`
+  value, e.g. one per price bucket in an order.
 
-  if placement_ids is not None:
-    line_item_config['targeting']['inventoryTargeting']['targetedPlacementIds'] = placement_ids
+  The parts every line item shares (creative placeholders, inventory
+  targeting and the `hb_bidder` criteria) are built once and shared by all
+  the configs the template creates, so treat them as read-only.
+  """
 
-  if ad_unit_ids is not None:
-    line_item_config['targeting']['inventoryTargeting']['targetedAdUnits'] = [{'adUnitId': id} for id in ad_unit_ids]
+  def __init__(self, order_id, placement_ids, ad_unit_ids, sizes, hb_bidder_key_id, hb_pb_key_id,
+               hb_bidder_value_id, currency_code='USD', video_ad_type=False):
+    """
+    Args:
+      order_id (int): the ID of the order in DFP
+      placement_ids (arr): an array of DFP placement IDs to target
+      ad_unit_ids (arr): an array of DFP ad unit IDs to target
+      sizes (arr): an array of objects, each containing 'width' and 'height'
+        keys, to set the creative sizes the line items will serve
+      hb_bidder_key_id (int): the DFP ID of the `hb_bidder` targeting key
+      hb_pb_key_id (int): the DFP ID of the `hb_pb` targeting key
+      hb_bidder_value_id (int): the DFP ID of the `hb_bidder` value
+      currency_code (str): the currency code (e.g. 'USD' or 'EUR')
+      video_ad_type (bool): create video type line items
+    """
+    self.order_id = order_id
+    self.hb_pb_key_id = hb_pb_key_id
+    self.currency_code = currency_code
+    self.video_ad_type = video_ad_type
+
+    # Set up sizes.
+    self.creative_placeholders = [{'size': size} for size in sizes]
+
+    # Create key/value targeting for Prebid.
+    # https://github.com/googleads/googleads-python-lib/blob/master/examples/dfp/v201802/line_item_service/target_custom_criteria.py
+    self.hb_bidder_criteria = {
+      'xsi_type': 'CustomCriteria',
+      'keyId': hb_bidder_key_id,
+      'valueIds': [hb_bidder_value_id],
+      'operator': 'IS'
+    }
+
+    self.inventory_targeting = {}
+    if placement_ids is not None:
+      self.inventory_targeting['targetedPlacementIds'] = placement_ids
+    if ad_unit_ids is not None:
+      self.inventory_targeting['targetedAdUnits'] = [{'adUnitId': id} for id in ad_unit_ids]
 
-  return line_item_config
+    # https://developers.google.com/ad-manager/api/reference/v202005/LineItemService.RequestPlatformTargeting
+    self.request_platform_targeting = ({ 'targetedRequestPlatforms': [ 'VIDEO_PLAYER' ] },)
+
+    self.primary_goal = {
+      'goalType': 'NONE'
+    }
+
+  def create(self, name, cpm_micro_amount, hb_pb_value_id):
+    """
+    Creates the config of one line item.
+
+    Args:
+      name (str): the name of the line item
+      cpm_micro_amount (int): the currency value (in micro amounts) of the
+        line item
+      hb_pb_value_id (int): the DFP ID of the `hb_pb` value
+    Returns:
+      an object: the line item config
+    """
+    hb_pb_criteria = {
+      'xsi_type': 'CustomCriteria',
+      'keyId': self.hb_pb_key_id,
+      'valueIds': [hb_pb_value_id],
+      'operator': 'IS'
+    }
+
+    # The custom criteria will resemble:
+    # (hb_bidder_criteria.key == hb_bidder_criteria.value AND
+    #    hb_pb_criteria.key == hb_pb_criteria.value)
+    top_set = {
+      'xsi_type': 'CustomCriteriaSet',
+      'logicalOperator': 'AND',
+      'children': [self.hb_bidder_criteria, hb_pb_criteria]
+    }
+
+    # https://developers.google.com/doubleclick-publishers/docs/reference/v201802/LineItemService.LineItem
+    line_item_config = {
+      'name': name,
+      'orderId': self.order_id,
+      # https://developers.google.com/doubleclick-publishers/docs/reference/v201802/LineItemService.Targeting
+      'targeting': {
+        'inventoryTargeting': self.inventory_targeting,
+        'customTargeting': top_set,
+      },
+      'startDateTimeType': 'IMMEDIATELY',
+      'unlimitedEndDateTime': True,
+      'lineItemType': 'PRICE_PRIORITY',
+      'costType': 'CPM',
+      'costPerUnit': {
+        'currencyCode': self.currency_code,
+        'microAmount': cpm_micro_amount
+      },
+      'creativeRotationType': 'EVEN',
+      'primaryGoal': self.primary_goal,
+      'creativePlaceholders': self.creative_placeholders,
+    }
+    if self.video_ad_type:
+      line_item_config['environmentType'] = 'VIDEO_PLAYER'
+      line_item_config['targeting']['requestPlatformTargeting'] = self.request_platform_targeting
+
+    return line_item_config
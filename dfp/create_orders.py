@@ -6,7 +6,7 @@ from googleads import ad_manager
 
 import settings
 import dfp.get_orders
-from dfp.client import get_client
+from dfp.client import get_service
 from dfp.exceptions import BadSettingException, MissingSettingException
 
 
@@ -40,8 +40,6 @@ def create_order(order_name, advertiser_id, trafficker_id):
     an integer: the ID of the created order
   """
 
-  dfp_client = get_client()
-
   # Check to make sure an order does not exist with this name.
   # Otherwise, DFP will throw an exception.
   existing_order = dfp.get_orders.get_order_by_name(order_name)
@@ -65,7 +63,7 @@ def create_order(order_name, advertiser_id, trafficker_id):
       create_order_config(name=order_name, advertiser_id=advertiser_id,
         trafficker_id=trafficker_id)
     ]
-    order_service = dfp_client.GetService('OrderService', version='v202008')
+    order_service = get_service('OrderService', version='v202008')
     orders = order_service.createOrders(orders)
 
     order = orders[0]
@@ -5,12 +5,14 @@ import logging
 from googleads import ad_manager
 
 import settings
-from dfp.client import get_client
+from dfp.client import get_service
 from dfp.exceptions import (
   BadSettingException,
   DFPObjectNotFound,
   MissingSettingException
 )
+from dfp.get_by_names import get_objects_by_names
+from dfp.lookup_cache import cached_lookup_many
 
 
 logger = logging.getLogger(__name__)
@@ -25,8 +27,7 @@ def get_ad_unit_by_name(ad_unit_name):
     a DFP ad unit object
   """
 
-  dfp_client = get_client()
-  ad_unit_service = dfp_client.GetService('InventoryService',
+  ad_unit_service = get_service('InventoryService',
     version='v202008')
 
   query = 'WHERE name = :name'
@@ -55,6 +56,7 @@ def get_ad_unit_by_name(ad_unit_name):
     logger.info(u'Found ad_unit with name "{name}".'.format(name=ad_unit['name']))
   return ad_unit
 
+@cached_lookup_many('ad_unit')
 def get_ad_unit_ids_by_name(ad_unit_names):
   """
   Gets ad unit IDs from DFP based on their names.
@@ -63,11 +65,11 @@ def get_ad_unit_ids_by_name(ad_unit_names):
     ad_unit_names (arr): an array of ad unit name strings
   Returns:
     an array: an array of ad unit IDs
-  """  
-  ad_unit_ids = []
-  for ad_unit_name in ad_unit_names:
-    ad_unit_ids.append(get_ad_unit_by_name(ad_unit_name)['id'])
-  return ad_unit_ids
+  """
+  ad_unit_service = get_service('InventoryService', version='v202008')
+  ad_units = get_objects_by_names(ad_unit_service.getAdUnitsByStatement,
+    ad_unit_names, 'ad unit')
+  return [ad_units[ad_unit_name]['id'] for ad_unit_name in ad_unit_names]
 
 def main():
   """
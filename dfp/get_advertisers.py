@@ -5,12 +5,13 @@ import logging
 from googleads import ad_manager
 
 import settings
-from dfp.client import get_client
+from dfp.client import get_service
 from dfp.exceptions import (
   BadSettingException,
   DFPObjectNotFound,
   MissingSettingException
 )
+from dfp.lookup_cache import cached_lookup
 
 
 logger = logging.getLogger(__name__)
@@ -24,8 +25,7 @@ def create_advertiser(name):
   Returns:
     an integer: the advertiser's DFP ID
   """
-  dfp_client = get_client()
-  company_service = dfp_client.GetService('CompanyService', version='v202008')
+  company_service = get_service('CompanyService', version='v202008')
 
   advertisers_config = [
     {
@@ -43,6 +43,7 @@ def create_advertiser(name):
 
   return advertiser
 
+@cached_lookup('advertiser')
 def get_advertiser_id_by_name(name):
   """
   Returns a DFP company ID from company name.
@@ -52,8 +53,7 @@ def get_advertiser_id_by_name(name):
   Returns:
     an integer: the advertiser's DFP ID
   """
-  dfp_client = get_client()
-  company_service = dfp_client.GetService('CompanyService', version='v202008')
+  company_service = get_service('CompanyService', version='v202008')
 
   # Filter by name.
   query = 'WHERE name = :name'
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+import logging
+
+from googleads import ad_manager
+
+from dfp.exceptions import DFPObjectNotFound
+
+
+logger = logging.getLogger(__name__)
+
+# The maximum number of names to put in a single `IN (...)` clause.
+NAMES_PER_QUERY = 100
+
+def get_objects_by_names(get_by_statement, names, object_type,
+  names_per_query=NAMES_PER_QUERY):
+  """
+  Gets DFP objects by name, with one `WHERE name IN (...)` query per chunk
+  of names rather than one query per name.
+
+  Args:
+    get_by_statement (function): a DFP service's get*ByStatement method,
+      e.g. `placement_service.getPlacementsByStatement`
+    names (arr): an array of object names
+    object_type (str): the kind of object, e.g. 'placement', for messages
+    names_per_query (int): the maximum number of names per query
+  Returns:
+    an object: a map of each name to its DFP object
+  Raises:
+    DFPObjectNotFound: listing every name that does not exist in DFP
+  """
+  unique_names = list(dict.fromkeys(names))
+
+  objects_by_name = {}
+  for i in range(0, len(unique_names), names_per_query):
+    chunk = unique_names[i:i+names_per_query]
+    query = 'WHERE name IN ({0})'.format(
+      ', '.join(':name{0}'.format(j) for j in range(len(chunk))))
+    values = [
+      {'key': 'name{0}'.format(j),
+       'value': {
+           'xsi_type': 'TextValue',
+           'value': name
+       }}
+      for j, name in enumerate(chunk)
+    ]
+    statement = ad_manager.FilterStatement(query, values)
+
+    # Page through the results, stopping at the first short page. Only the
+    # first object found for a name is used.
+    while True:
+      response = get_by_statement(statement.ToStatement())
+      results = response['results'] if 'results' in response else []
+      for dfp_object in results:
+        objects_by_name.setdefault(dfp_object['name'], dfp_object)
+      statement.offset += ad_manager.SUGGESTED_PAGE_LIMIT
+      if len(results) < ad_manager.SUGGESTED_PAGE_LIMIT:
+        break
+      if ('totalResultSetSize' in response
+        and statement.offset >= response['totalResultSetSize']):
+        break
+
+  missing_names = [name for name in unique_names
+    if name not in objects_by_name]
+  if missing_names:
+    raise DFPObjectNotFound('No DFP {0} found with names: {1}'.format(
+      object_type, ', '.join(missing_names)))
+
+  for name in unique_names:
+    logger.info(u'Found {object_type} with name "{name}".'.format(
+      object_type=object_type, name=name))
+
+  return objects_by_name
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+import logging
+
+from dfp.paginator import iter_results
+
+
+logger = logging.getLogger(__name__)
+
+def get_creatives_for_advertiser(advertiser_id, name_pattern=None):
+  """
+  Gets the creatives of an advertiser.
+
+  Args:
+    advertiser_id (int): the ID of the advertiser in DFP
+    name_pattern (str): if set, only get creatives with names matching
+      this PQL `LIKE` pattern, e.g. '%: HB %'
+  Returns:
+    an array of DFP creatives
+  """
+  creatives = list(iter_creatives_for_advertiser(advertiser_id, name_pattern))
+
+  logger.info(u'Found {num} existing creatives for advertiser {advertiser_id}.'.format(
+    num=len(creatives), advertiser_id=advertiser_id))
+
+  return creatives
+
+def iter_creatives_for_advertiser(advertiser_id, name_pattern=None,
+  max_workers=None):
+  """
+  Yields the creatives of an advertiser, fetching each page only as it is
+  needed once the pages already requested are used up. Takes the same
+  arguments as `get_creatives_for_advertiser`.
+
+  Args:
+    max_workers (int): the maximum number of pages to request at once. Set
+      to 1 so that no page is requested before it is needed.
+  Returns:
+    a generator of DFP creatives
+  """
+  query = 'WHERE advertiserId = :advertiser_id'
+  values = [{
+    'key': 'advertiser_id',
+    'value': {
+      'xsi_type': 'NumberValue',
+      'value': advertiser_id,
+    }
+  }]
+  if name_pattern is not None:
+    query += ' AND name LIKE :name_pattern'
+    values.append({
+      'key': 'name_pattern',
+      'value': {
+        'xsi_type': 'TextValue',
+        'value': name_pattern,
+      }
+    })
+
+  return iter_results('CreativeService', 'getCreativesByStatement', query,
+    values, max_workers=max_workers)
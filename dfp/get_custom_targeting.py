@@ -4,11 +4,14 @@ import logging
 
 from googleads import ad_manager
 
-from dfp.client import get_client
+from dfp.client import get_service
+from dfp.lookup_cache import cached_lookup
+from dfp.paginator import iter_results
 
 
 logger = logging.getLogger(__name__)
 
+@cached_lookup('targeting_key')
 def get_key_id_by_name(name):
   """
   Gets a targeting key by key name.
@@ -19,8 +22,7 @@ def get_key_id_by_name(name):
     an integer, or None
   """
 
-  dfp_client = get_client()
-  custom_targeting_service = dfp_client.GetService('CustomTargetingService',
+  custom_targeting_service = get_service('CustomTargetingService',
     version='v202008')
 
   # Get a key by name.
@@ -44,57 +46,26 @@ def get_key_id_by_name(name):
   return key_id
 
 
-def get_targeting_by_key_name(name):
+def get_targeting_by_key_name(name, key_id=None):
   """
   Gets a set of custom targeting values by key name
 
   Args:
     name (str): the name of the targeting key
+    key_id (int): the ID of the key, if already known, to save looking it up
+      again
   Returns:
     an array, or None: if the key exists, return an array of objects, where
       each object is info about a custom targeting value
   """
 
-  dfp_client = get_client()
-  custom_targeting_service = dfp_client.GetService('CustomTargetingService',
-    version='v202008')
-
-  # Get a key by name.
-  query = ('WHERE name = :name')
-  values = [{
-    'key': 'name',
-    'value': {
-      'xsi_type': 'TextValue',
-      'value': name
-    }
-  }]
-  targeting_key_statement = ad_manager.FilterStatement(query, values)
-
-  response = custom_targeting_service.getCustomTargetingKeysByStatement(
-      targeting_key_statement.ToStatement())
+  if key_id is None:
+    key_id = get_key_id_by_name(name)
 
   # If the key exists, get predefined values.
   key_values = None
-  if 'results' in response and len(response['results']) > 0:
-    key = response['results'][0]
-    key_values = []
-
-    query = "WHERE status = 'ACTIVE' AND customTargetingKeyId IN (%s)" % str(key['id'])
-    statement = ad_manager.FilterStatement(query)
-
-    response = custom_targeting_service.getCustomTargetingValuesByStatement(
-        statement.ToStatement())
-    while 'results' in response and len(response['results']) > 0:
-      for custom_val in response['results']:
-        key_values.append({
-          'id': custom_val['id'],
-          'name': custom_val['name'],
-          'displayName': custom_val['displayName'],
-          'customTargetingKeyId': custom_val['customTargetingKeyId']
-        })
-      statement.offset += ad_manager.SUGGESTED_PAGE_LIMIT
-      response = custom_targeting_service.getCustomTargetingValuesByStatement(
-        statement.ToStatement())
+  if key_id is not None:
+    key_values = list(iter_targeting_values(key_id))
 
   if key_values is None:
     logger.info(u'Key "{key_name}"" does not exist in DFP.'. format(
@@ -108,6 +79,31 @@ def get_targeting_by_key_name(name):
 
   return key_values
 
+def iter_targeting_values(key_id, max_workers=None,
+  page_size=ad_manager.SUGGESTED_PAGE_LIMIT):
+  """
+  Yields the active values of a targeting key, fetching pages concurrently
+  (see `dfp.paginator.iter_pages`).
+
+  Args:
+    key_id (int): the ID of the targeting key
+    max_workers (int): the maximum number of requests in flight at once.
+      Defaults to the DFP_MAX_CONCURRENT_REQUESTS setting, or 4.
+    page_size (int): the number of values per request
+  Returns:
+    a generator of objects, each info about a custom targeting value
+  """
+  query = "WHERE status = 'ACTIVE' AND customTargetingKeyId IN (%s)" % str(int(key_id))
+  for custom_val in iter_results('CustomTargetingService',
+    'getCustomTargetingValuesByStatement', query, page_size=page_size,
+    max_workers=max_workers):
+    yield {
+      'id': custom_val['id'],
+      'name': custom_val['name'],
+      'displayName': custom_val['displayName'],
+      'customTargetingKeyId': custom_val['customTargetingKeyId']
+    }
+
 def main():
   get_targeting_by_key_name('hb_bidder')
   get_targeting_by_key_name('hb_pb')
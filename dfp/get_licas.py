@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+
+import logging
+
+from dfp.paginator import iter_results
+
+
+logger = logging.getLogger(__name__)
+
+# The maximum number of line item IDs to put in a single `IN (...)` clause.
+LINE_ITEM_IDS_PER_QUERY = 100
+
+def get_licas_for_line_items(line_item_ids):
+  """
+  Gets all line item <> creative associations for the given line items.
+
+  Args:
+    line_item_ids (arr): an array of DFP line item IDs
+  Returns:
+    an array of DFP line item creative associations
+  """
+  if len(line_item_ids) < 1:
+    return []
+
+  licas = []
+  for i in range(0, len(line_item_ids), LINE_ITEM_IDS_PER_QUERY):
+    query = 'WHERE lineItemId IN ({0})'.format(', '.join(
+      str(int(line_item_id))
+      for line_item_id in line_item_ids[i:i+LINE_ITEM_IDS_PER_QUERY]))
+    licas.extend(iter_results('LineItemCreativeAssociationService',
+      'getLineItemCreativeAssociationsByStatement', query))
+
+  logger.info(u'Found {num} existing line item <> creative associations.'.format(
+    num=len(licas)))
+
+  return licas
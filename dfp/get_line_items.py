@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+
+import logging
+
+from dfp.paginator import get_all_results
+
+
+logger = logging.getLogger(__name__)
+
+def get_line_items_for_orders(order_ids):
+  """
+  Gets all line items in the given orders.
+
+  Args:
+    order_ids (arr): an array of DFP order IDs
+  Returns:
+    an array of DFP line items
+  """
+  if len(order_ids) < 1:
+    return []
+
+  query = 'WHERE orderId IN ({0})'.format(
+    ', '.join(str(int(order_id)) for order_id in order_ids))
+  line_items = get_all_results('LineItemService', 'getLineItemsByStatement',
+    query)
+
+  logger.info(u'Found {num} existing line items in {num_orders} orders.'.format(
+    num=len(line_items), num_orders=len(order_ids)))
+
+  return line_items
@@ -5,7 +5,8 @@ import logging
 
 from googleads import ad_manager
 
-from dfp.client import get_client
+from dfp.client import get_service
+from dfp.paginator import iter_results
 
 
 logger = logging.getLogger(__name__)
@@ -21,8 +22,7 @@ def get_order_by_name(order_name):
     a DFP order, or None
   """
 
-  dfp_client = get_client()
-  order_service = dfp_client.GetService('OrderService', version='v202008')
+  order_service = get_service('OrderService', version='v202008')
 
   # Filter by name.
   query = 'WHERE name = :name'
@@ -49,6 +49,25 @@ def get_order_by_name(order_name):
     logger.info(u'Found an order with name "{name}".'.format(name=order['name']))
     return order
 
+def get_orders_by_name_pattern(name_pattern):
+  """
+  Gets the orders with names matching a PQL `LIKE` pattern from DFP.
+
+  Args:
+    name_pattern (str): the pattern, e.g. 'My Order (%/%)'
+  Returns:
+    an array of DFP orders
+  """
+  values = [{
+    'key': 'name_pattern',
+    'value': {
+      'xsi_type': 'TextValue',
+      'value': name_pattern
+    }
+  }]
+  return list(iter_results('OrderService', 'getOrdersByStatement',
+    'WHERE name LIKE :name_pattern', values))
+
 def get_all_orders(print_orders=False):
   """
   Logs all orders in DFP.
@@ -57,28 +76,14 @@ def get_all_orders(print_orders=False):
       None
   """
 
-  dfp_client = get_client()
-
-  # Initialize appropriate service.
-  order_service = dfp_client.GetService('OrderService', version='v202008')
-
-  # Create a statement to select orders.
-  statement = ad_manager.FilterStatement()
   print('Getting all orders...')
 
-  # Retrieve a small amount of orders at a time, paging
-  # through until all orders have been retrieved.
-  while True:
-    response = order_service.getOrdersByStatement(statement.ToStatement())
-    if 'results' in response and len(response['results']) > 0:
-      for order in response['results']:
-        msg = u'Found an order with name "{name}".'.format(name=order['name'])
-        if print_orders:
-          print(msg)
-      statement.offset += ad_manager.SUGGESTED_PAGE_LIMIT
-    else:
-      print('No additional orders found.')
-      break
+  # Retrieve the orders a page at a time, fetching pages concurrently.
+  for order in iter_results('OrderService', 'getOrdersByStatement'):
+    msg = u'Found an order with name "{name}".'.format(name=order['name'])
+    if print_orders:
+      print(msg)
+  print('No additional orders found.')
 
 def main():
   get_all_orders(print_orders=True)
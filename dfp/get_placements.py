@@ -5,12 +5,14 @@ import logging
 from googleads import ad_manager
 
 import settings
-from dfp.client import get_client
+from dfp.client import get_service
 from dfp.exceptions import (
   BadSettingException,
   DFPObjectNotFound,
   MissingSettingException
 )
+from dfp.get_by_names import get_objects_by_names
+from dfp.lookup_cache import cached_lookup_many
 
 
 logger = logging.getLogger(__name__)
@@ -25,8 +27,7 @@ def get_placement_by_name(placement_name):
     a DFP placement object
   """
 
-  dfp_client = get_client()
-  placement_service = dfp_client.GetService('PlacementService',
+  placement_service = get_service('PlacementService',
     version='v202008')
 
   query = 'WHERE name = :name'
@@ -55,6 +56,7 @@ def get_placement_by_name(placement_name):
     logger.info(u'Found placement with name "{name}".'.format(name=placement['name']))
   return placement
 
+@cached_lookup_many('placement')
 def get_placement_ids_by_name(placement_names):
   """
   Gets placement IDs from DFP based on their names.
@@ -63,11 +65,11 @@ def get_placement_ids_by_name(placement_names):
     placement_names (arr): an array of placement name strings
   Returns:
     an array: an array of placement IDs
-  """  
-  placement_ids = []
-  for placement_name in placement_names:
-    placement_ids.append(get_placement_by_name(placement_name)['id'])
-  return placement_ids
+  """
+  placement_service = get_service('PlacementService', version='v202008')
+  placements = get_objects_by_names(placement_service.getPlacementsByStatement,
+    placement_names, 'placement')
+  return [placements[placement_name]['id'] for placement_name in placement_names]
 
 def main():
   """
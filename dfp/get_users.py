@@ -5,12 +5,14 @@ import logging
 from googleads import ad_manager
 
 import settings
-from dfp.client import get_client
+from dfp.client import get_service
 from dfp.exceptions import DFPObjectNotFound, MissingSettingException
+from dfp.lookup_cache import cached_lookup
 
 
 logger = logging.getLogger(__name__)
 
+@cached_lookup('user')
 def get_user_id_by_email(email_address):
   """
   Returns a DFP user ID from email address.
@@ -20,8 +22,7 @@ def get_user_id_by_email(email_address):
   Returns:
     an integer: the user's DFP ID
   """
-  dfp_client = get_client()
-  user_service = dfp_client.GetService('UserService', version='v202008')
+  user_service = get_service('UserService', version='v202008')
 
   # Filter by email address.
   query = 'WHERE email = :email'
@@ -0,0 +1,334 @@
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import settings
+
+try:
+  import contextvars
+except ImportError:
+  # Python 3.6 has no contextvars, so the phase is kept per thread instead
+  # and handed to other threads by `propagate`.
+  contextvars = None
+
+
+# The upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+# Calls made outside any phase are recorded under this name.
+NO_PHASE = 'other'
+
+if contextvars is not None:
+  _current_phase = contextvars.ContextVar('dfp_phase', default=NO_PHASE)
+else:
+  _thread_phase = threading.local()
+_active = []
+_active_lock = threading.Lock()
+
+class Instrumentation(object):
+  """
+  Records every DFP service call made while it is active: the number of
+  calls and errors, a latency histogram and the number of objects sent and
+  received, per phase, service and method. It also records how long each
+  phase ran.
+
+  Any object with the same `record_call` and `record_phase` methods can be
+  activated with `instrumented()` to receive the same events.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.calls = {}
+    self.phases = {}
+
+  def record_call(self, phase, service_name, method_name, seconds,
+                  objects_sent, objects_received, error=None):
+    with self._lock:
+      stats = self.calls.get((phase, service_name, method_name))
+      if stats is None:
+        stats = self.calls[(phase, service_name, method_name)] = {
+          'calls': 0,
+          'errors': 0,
+          'seconds': 0,
+          'max_seconds': 0,
+          'latency_buckets': [0] * len(LATENCY_BUCKETS),
+          'objects_sent': 0,
+          'objects_received': 0,
+        }
+      stats['calls'] += 1
+      stats['errors'] += 1 if error is not None else 0
+      stats['seconds'] += seconds
+      stats['max_seconds'] = max(stats['max_seconds'], seconds)
+      for i, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+          stats['latency_buckets'][i] += 1
+          break
+      stats['objects_sent'] += objects_sent
+      stats['objects_received'] += objects_received
+
+  def record_phase(self, phase, start, end):
+    """
+    Extends the phase's span to cover `start` to `end`, so a phase entered
+    several times (e.g. once per partner) spans all of its runs.
+    """
+    with self._lock:
+      span = self.phases.setdefault(phase, {'start': start, 'end': end})
+      span['start'] = min(span['start'], start)
+      span['end'] = max(span['end'], end)
+
+  def _phase_names(self):
+    names = sorted(self.phases, key=lambda phase: self.phases[phase]['start'])
+    for phase, _, _ in sorted(self.calls):
+      if phase not in names:
+        names.append(phase)
+    return names
+
+  def summary(self):
+    """
+    Returns a human-readable summary of the calls made in each phase.
+    """
+    with self._lock:
+      lines = ['DFP API calls by phase:']
+      for phase in self._phase_names():
+        phase_calls = sorted((key, stats) for key, stats in self.calls.items()
+          if key[0] == phase)
+        span = self.phases.get(phase)
+        lines.append(u'  {phase}: {secs} {calls} calls, {errors} errors'.format(
+          phase=phase,
+          secs='{0:.2f}s,'.format(span['end'] - span['start']) if span else '',
+          calls=sum(stats['calls'] for _, stats in phase_calls),
+          errors=sum(stats['errors'] for _, stats in phase_calls)))
+        for (_, service_name, method_name), stats in phase_calls:
+          lines.append((u'    {service}.{method}: {calls} calls, '
+            '{mean:.3f}s mean, {max:.3f}s max, {sent} objects sent, '
+            '{received} received').format(
+              service=service_name,
+              method=method_name,
+              calls=stats['calls'],
+              mean=stats['seconds'] / stats['calls'],
+              max=stats['max_seconds'],
+              sent=stats['objects_sent'],
+              received=stats['objects_received']))
+      return '\n'.join(lines)
+
+  def to_json(self):
+    """
+    Returns the recorded calls and phases as a JSON-serializable object.
+    """
+    with self._lock:
+      return {
+        'phases': dict((phase, {'seconds': span['end'] - span['start']})
+          for phase, span in self.phases.items()),
+        'calls': [dict(stats, phase=phase, service=service_name,
+            method=method_name,
+            latency_bucket_bounds=[str(bound) for bound in LATENCY_BUCKETS])
+          for (phase, service_name, method_name), stats
+          in sorted(self.calls.items())],
+      }
+
+  def to_prometheus(self):
+    """
+    Returns the recorded calls in the Prometheus text exposition format.
+    """
+    lines = [
+      '# TYPE dfp_api_calls_total counter',
+      '# TYPE dfp_api_errors_total counter',
+      '# TYPE dfp_api_objects_sent_total counter',
+      '# TYPE dfp_api_objects_received_total counter',
+      '# TYPE dfp_api_call_seconds histogram',
+    ]
+    with self._lock:
+      for (phase, service_name, method_name), stats in sorted(self.calls.items()):
+        labels = 'phase="{0}",service="{1}",method="{2}"'.format(
+          phase, service_name, method_name)
+        lines.append('dfp_api_calls_total{{{0}}} {1}'.format(labels, stats['calls']))
+        lines.append('dfp_api_errors_total{{{0}}} {1}'.format(labels, stats['errors']))
+        lines.append('dfp_api_objects_sent_total{{{0}}} {1}'.format(
+          labels, stats['objects_sent']))
+        lines.append('dfp_api_objects_received_total{{{0}}} {1}'.format(
+          labels, stats['objects_received']))
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, stats['latency_buckets']):
+          cumulative += count
+          lines.append('dfp_api_call_seconds_bucket{{{0},le="{1}"}} {2}'.format(
+            labels, '+Inf' if bound == float('inf') else bound, cumulative))
+        lines.append('dfp_api_call_seconds_sum{{{0}}} {1}'.format(
+          labels, stats['seconds']))
+        lines.append('dfp_api_call_seconds_count{{{0}}} {1}'.format(
+          labels, stats['calls']))
+      lines.append('# TYPE dfp_phase_seconds gauge')
+      for phase, span in sorted(self.phases.items()):
+        lines.append('dfp_phase_seconds{{phase="{0}"}} {1}'.format(
+          phase, span['end'] - span['start']))
+    return '\n'.join(lines) + '\n'
+
+  def write(self, path):
+    """
+    Writes the metrics to a file: in the Prometheus text format if the path
+    ends with ".prom", otherwise as JSON.
+    """
+    with open(path, 'w') as metrics_file:
+      if path.endswith('.prom'):
+        metrics_file.write(self.to_prometheus())
+      else:
+        json.dump(self.to_json(), metrics_file, indent=2)
+
+class InstrumentedService(object):
+  """
+  Wraps a DFP service proxy, reporting each call to the active
+  instrumentation.
+  """
+
+  def __init__(self, service, service_name):
+    self._service = service
+    self._service_name = service_name
+
+  def __getattr__(self, method_name):
+    method = getattr(self._service, method_name)
+    if not callable(method):
+      return method
+
+    @wraps(method)
+    def instrumented_method(*args, **kwargs):
+      start = time.time()
+      error = None
+      response = None
+      try:
+        response = method(*args, **kwargs)
+        return response
+      except Exception as e:
+        error = e
+        raise
+      finally:
+        record_call(self._service_name, method_name, time.time() - start,
+          count_objects(args[0] if args else None), count_objects(response),
+          error)
+    return instrumented_method
+
+def count_objects(payload):
+  """
+  Returns the number of DFP objects in a request or response.
+  """
+  if payload is None:
+    return 0
+  if isinstance(payload, (list, tuple)):
+    return len(payload)
+  try:
+    if 'results' in payload:
+      return len(payload['results'])
+  except TypeError:
+    pass
+  return 1
+
+def is_active():
+  return len(_active) > 0
+
+def get_phase():
+  """
+  Returns the name of the current phase.
+  """
+  if contextvars is not None:
+    return _current_phase.get()
+  return getattr(_thread_phase, 'name', NO_PHASE)
+
+def _set_phase(name):
+  # Returns a token that `_reset_phase` restores the previous phase with.
+  if contextvars is not None:
+    return _current_phase.set(name)
+  previous = get_phase()
+  _thread_phase.name = name
+  return previous
+
+def _reset_phase(token):
+  if contextvars is not None:
+    _current_phase.reset(token)
+  else:
+    _thread_phase.name = token
+
+def record_call(service_name, method_name, seconds, objects_sent,
+                objects_received, error=None):
+  phase = get_phase()
+  for instrumentation in list(_active):
+    instrumentation.record_call(phase, service_name, method_name, seconds,
+      objects_sent, objects_received, error)
+
+def wrap_service(service, service_name):
+  """
+  Returns the service, instrumented if any instrumentation is active.
+  """
+  if not is_active():
+    return service
+  return InstrumentedService(service, service_name)
+
+@contextmanager
+def instrumented(instrumentation=None):
+  """
+  Records every DFP service call made inside the block, from any thread.
+
+  Args:
+    instrumentation: defaults to a new Instrumentation
+  Yields:
+    the instrumentation
+  """
+  instrumentation = instrumentation or Instrumentation()
+  with _active_lock:
+    _active.append(instrumentation)
+  try:
+    yield instrumentation
+  finally:
+    with _active_lock:
+      _active.remove(instrumentation)
+
+@contextmanager
+def phase(name):
+  """
+  Attributes the DFP calls made inside the block to the named phase,
+  including calls made from threads started with `propagate`.
+  """
+  token = _set_phase(name)
+  start = time.time()
+  try:
+    yield
+  finally:
+    _reset_phase(token)
+    end = time.time()
+    for instrumentation in list(_active):
+      instrumentation.record_phase(name, start, end)
+
+def propagate(func):
+  """
+  Returns a function that runs `func` in the caller's current phase, for
+  handing work to another thread.
+  """
+  if contextvars is None:
+    name = get_phase()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+      token = _set_phase(name)
+      try:
+        return func(*args, **kwargs)
+      finally:
+        _reset_phase(token)
+    return wrapper
+
+  context = contextvars.copy_context()
+
+  @wraps(func)
+  def wrapper(*args, **kwargs):
+    return context.copy().run(func, *args, **kwargs)
+  return wrapper
+
+def report(instrumentation, logger):
+  """
+  Logs the instrumentation's summary and, if the DFP_METRICS_FILE setting
+  is set, writes its metrics to that file.
+  """
+  logger.info(instrumentation.summary())
+  metrics_file = getattr(settings, 'DFP_METRICS_FILE', None)
+  if metrics_file:
+    instrumentation.write(metrics_file)
+    logger.info(u'Wrote DFP API metrics to {0}.'.format(metrics_file))
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+import functools
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import closing, contextmanager
+
+import settings
+from dfp.client import get_network_code
+
+
+logger = logging.getLogger(__name__)
+
+class LookupCache(object):
+  """
+  A SQLite-backed cache of DFP IDs, keyed by network code, object type and
+  name, so repeated runs can skip lookups of objects that rarely change.
+  """
+
+  def __init__(self, path, ttl):
+    """
+    Args:
+      path (str): the path of the SQLite file
+      ttl (int): how many seconds a cached value stays valid
+    """
+    self.path = path
+    self.ttl = ttl
+    with self._connect() as connection:
+      connection.execute(
+        'CREATE TABLE IF NOT EXISTS lookups ('
+        '  network_code TEXT NOT NULL,'
+        '  object_type TEXT NOT NULL,'
+        '  name TEXT NOT NULL,'
+        '  value TEXT NOT NULL,'
+        '  created_at REAL NOT NULL,'
+        '  PRIMARY KEY (network_code, object_type, name))')
+
+  @contextmanager
+  def _connect(self):
+    # Open a connection per operation so the cache can be used from
+    # worker threads. The inner block commits, and `closing` closes it.
+    with closing(sqlite3.connect(self.path)) as connection:
+      with connection:
+        yield connection
+
+  def get(self, network_code, object_type, name):
+    """
+    Returns the cached value, or None if it is missing or expired.
+    """
+    with self._connect() as connection:
+      row = connection.execute(
+        'SELECT value FROM lookups WHERE network_code = ? AND '
+        'object_type = ? AND name = ? AND created_at >= ?',
+        (str(network_code), object_type, name, time.time() - self.ttl)
+      ).fetchone()
+    return json.loads(row[0]) if row else None
+
+  def set(self, network_code, object_type, name, value):
+    with self._connect() as connection:
+      connection.execute(
+        'INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?, ?)',
+        (str(network_code), object_type, name, json.dumps(value), time.time()))
+
+  def invalidate(self, network_code=None, object_type=None, name=None):
+    """
+    Deletes cached values. Any argument left as None matches every value,
+    so calling this with no arguments clears the cache.
+    """
+    conditions = []
+    params = []
+    for column, value in [('network_code', network_code),
+      ('object_type', object_type), ('name', name)]:
+      if value is not None:
+        conditions.append('{0} = ?'.format(column))
+        params.append(str(value))
+    query = 'DELETE FROM lookups'
+    if conditions:
+      query += ' WHERE ' + ' AND '.join(conditions)
+    with self._connect() as connection:
+      connection.execute(query, params)
+
+# The LookupCache for each (path, ttl), built once per process.
+_lookup_caches = {}
+_lookup_caches_lock = threading.Lock()
+
+def get_lookup_cache():
+  """
+  Returns the lookup cache set up in settings, or None if it is disabled.
+  """
+  path = getattr(settings, 'DFP_LOOKUP_CACHE_FILE', None)
+  if not path:
+    return None
+  ttl = getattr(settings, 'DFP_LOOKUP_CACHE_TTL', 86400)
+  with _lookup_caches_lock:
+    if (path, ttl) not in _lookup_caches:
+      _lookup_caches[(path, ttl)] = LookupCache(path, ttl)
+    return _lookup_caches[(path, ttl)]
+
+def cached_lookup(object_type):
+  """
+  Decorates a function that takes a name and returns its DFP ID so that IDs
+  are read from and saved to the lookup cache, when enabled. None results
+  are not cached.
+  """
+  def decorator(lookup):
+    @functools.wraps(lookup)
+    def wrapper(name):
+      lookup_cache = get_lookup_cache()
+      if lookup_cache is None:
+        return lookup(name)
+
+      network_code = get_network_code()
+      value = lookup_cache.get(network_code, object_type, name)
+      if value is not None:
+        logger.info(u'Using cached {object_type} "{name}".'.format(
+          object_type=object_type, name=name))
+        return value
+
+      value = lookup(name)
+      if value is not None:
+        lookup_cache.set(network_code, object_type, name, value)
+      return value
+    return wrapper
+  return decorator
+
+def cached_lookup_many(object_type):
+  """
+  Like `cached_lookup`, for a function that takes an array of names and
+  returns an array of their DFP IDs. Only the names missing from the cache
+  are passed on to the decorated function.
+  """
+  def decorator(lookup):
+    @functools.wraps(lookup)
+    def wrapper(names):
+      lookup_cache = get_lookup_cache()
+      if lookup_cache is None:
+        return lookup(names)
+
+      network_code = get_network_code()
+      ids_by_name = {}
+      for name in names:
+        value = lookup_cache.get(network_code, object_type, name)
+        if value is not None:
+          ids_by_name[name] = value
+
+      missing_names = [name for name in names if name not in ids_by_name]
+      if len(missing_names) < len(names):
+        logger.info(u'Using {num} cached {object_type} IDs.'.format(
+          num=len(names) - len(missing_names), object_type=object_type))
+      if missing_names:
+        for name, value in zip(missing_names, lookup(missing_names)):
+          lookup_cache.set(network_code, object_type, name, value)
+          ids_by_name[name] = value
+
+      return [ids_by_name[name] for name in names]
+    return wrapper
+  return decorator
+
+def main():
+  """
+  Clears the lookup cache.
+  """
+  lookup_cache = get_lookup_cache()
+  if lookup_cache is None:
+    logger.info('The lookup cache is disabled in settings.')
+    return
+  lookup_cache.invalidate()
+  logger.info(u'Cleared the lookup cache at {path}.'.format(path=lookup_cache.path))
+
+if __name__ == '__main__':
+  logging.basicConfig(stream=sys.stdout, level=logging.INFO, format='%(message)s')
+  main()
@@ -0,0 +1,104 @@
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from googleads import ad_manager
+
+from dfp.batches import get_max_concurrent_requests
+from dfp.client import get_service
+from dfp.instrumentation import propagate
+
+
+def iter_pages(service_name, method_name, query='', values=None,
+  page_size=ad_manager.SUGGESTED_PAGE_LIMIT, max_workers=None,
+  version='v202008'):
+  """
+  Yields each page of results of a DFP `get*ByStatement` call, e.g.
+  `iter_pages('OrderService', 'getOrdersByStatement', 'WHERE name = :name',
+  values)`.
+
+  The first page also gives the total number of results, so the offsets of
+  the rest of the pages are known up front and they are requested together,
+  at most `max_workers` at a time. Pages are yielded in order as they
+  arrive, and only `max_workers` pages are held at once. If DFP does not
+  report a total, pages are fetched one at a time until one comes back
+  empty.
+
+  Args:
+    service_name (str): the name of the DFP service, e.g. 'OrderService'
+    method_name (str): the service's get-by-statement method
+    query (str): the PQL filter, e.g. "WHERE status = 'ACTIVE'"
+    values (arr): the bind variables of the query
+    page_size (int): the number of results per request
+    max_workers (int): the maximum number of requests in flight at once.
+      Defaults to the DFP_MAX_CONCURRENT_REQUESTS setting, or 4.
+    version (str): the DFP API version
+  Returns:
+    a generator of arrays: the results of each page
+  """
+  if max_workers is None:
+    max_workers = get_max_concurrent_requests()
+
+  def get_page(offset):
+    # Each thread gets its own service proxy.
+    service = get_service(service_name, version=version)
+    statement = ad_manager.FilterStatement(query, values, limit=page_size,
+      offset=offset)
+    response = getattr(service, method_name)(statement.ToStatement())
+    results = list(response['results']) if 'results' in response else []
+    total = (response['totalResultSetSize']
+      if 'totalResultSetSize' in response else None)
+    return results, total
+
+  results, total = get_page(0)
+  if not results:
+    return
+  yield results
+
+  if total is None:
+    offset = page_size
+    while True:
+      results, _ = get_page(offset)
+      if not results:
+        return
+      yield results
+      offset += page_size
+
+  offsets = range(page_size, total, page_size)
+  if max_workers <= 1 or len(offsets) <= 1:
+    for offset in offsets:
+      results, _ = get_page(offset)
+      if results:
+        yield results
+    return
+
+  with ThreadPoolExecutor(max_workers=min(max_workers, len(offsets))) as executor:
+    pending = deque()
+    for offset in offsets:
+      if len(pending) >= max_workers:
+        yield pending.popleft().result()[0]
+      pending.append(executor.submit(propagate(get_page), offset))
+    while pending:
+      yield pending.popleft().result()[0]
+
+def iter_results(service_name, method_name, query='', values=None,
+  page_size=ad_manager.SUGGESTED_PAGE_LIMIT, max_workers=None,
+  version='v202008'):
+  """
+  Yields every result of a DFP `get*ByStatement` call, one at a time. Takes
+  the same arguments as `iter_pages`.
+  """
+  for page in iter_pages(service_name, method_name, query, values,
+    page_size=page_size, max_workers=max_workers, version=version):
+    for result in page:
+      yield result
+
+def get_all_results(service_name, method_name, query='', values=None,
+  page_size=ad_manager.SUGGESTED_PAGE_LIMIT, max_workers=None,
+  version='v202008'):
+  """
+  Returns every result of a DFP `get*ByStatement` call in an array. Takes
+  the same arguments as `iter_pages`.
+  """
+  return list(iter_results(service_name, method_name, query, values,
+    page_size=page_size, max_workers=max_workers, version=version))
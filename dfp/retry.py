@@ -0,0 +1,273 @@
+
+import logging
+import random
+import socket
+import threading
+import time
+from collections import Counter, deque
+from functools import wraps
+
+from googleads import errors
+
+import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Faults worth retrying: the request was throttled or failed on DFP's side.
+RETRYABLE_ERRORS = (
+  'QuotaError.EXCEEDED_QUOTA',
+  'QuotaError.UNKNOWN',
+  'ServerError.SERVER_ERROR',
+  'ServerError.SERVER_BUSY',
+  'ServerError.UNKNOWN',
+  'CommonError.CONCURRENT_MODIFICATION',
+  'InternalApiError.UNEXPECTED_INTERNAL_API_ERROR',
+  'InternalApiError.DOWNTIME',
+)
+
+# Faults that mean the request had too many objects, and should be split.
+BATCH_TOO_LARGE_ERRORS = (
+  'CollectionSizeError.TOO_LARGE',
+  'RequiredCollectionError.TOO_LARGE',
+  'StatementError.TOO_MANY_RESULTS',
+)
+
+# The slowest the rate limiter will throttle to, in requests per second.
+MIN_REQUESTS_PER_SECOND = 0.5
+
+# The rate assumed when too few requests have been sent to measure it.
+DEFAULT_REQUESTS_PER_SECOND = 8
+
+def get_error_strings(error):
+  """
+  Returns the DFP error strings of a fault, e.g. "QuotaError.EXCEEDED_QUOTA".
+  """
+  if not isinstance(error, errors.GoogleAdsServerFault):
+    return []
+  error_strings = []
+  for api_error in error.errors or []:
+    try:
+      error_strings.append(api_error['errorString'])
+    except (KeyError, TypeError):
+      error_strings.append(getattr(api_error, 'errorString', None))
+  if not any(error_strings):
+    # Fall back to the message, e.g. "[QuotaError.EXCEEDED_QUOTA @ ]".
+    error_strings = [error_string for error_string
+      in RETRYABLE_ERRORS + BATCH_TOO_LARGE_ERRORS
+      if error_string in str(error)]
+  return [error_string for error_string in error_strings if error_string]
+
+def is_transport_error(error):
+  return isinstance(error, (errors.GoogleAdsSoapTransportError, socket.timeout,
+    ConnectionError))
+
+def is_retryable(error, retry_transport_errors=True):
+  """
+  Returns whether a failed call is worth retrying.
+
+  Args:
+    error (Exception): the error the call raised
+    retry_transport_errors (bool): whether to retry errors reaching DFP,
+      e.g. timeouts. These are not safe to retry for calls that create
+      objects, since DFP may have created them before the connection failed.
+  """
+  if is_transport_error(error):
+    return retry_transport_errors
+  return any(error_string in RETRYABLE_ERRORS
+    for error_string in get_error_strings(error))
+
+def is_quota_error(error):
+  return any(error_string.startswith('QuotaError.')
+    for error_string in get_error_strings(error))
+
+def is_batch_too_large(error):
+  return any(error_string in BATCH_TOO_LARGE_ERRORS
+    for error_string in get_error_strings(error))
+
+class RateLimiter(object):
+  """
+  A token bucket shared by every thread, refilled at `rate` requests per
+  second. A rate of None means no limit.
+
+  The rate adapts to DFP's quota: it is halved on each quota error and
+  grows back slowly on success. Without a configured rate, the first quota
+  error starts limiting at half the rate requests were being sent at.
+  """
+
+  def __init__(self, rate=None):
+    self.max_rate = rate
+    self.rate = rate
+    self._tokens = rate or 0
+    self._last_refill = time.time()
+    self._recent_requests = deque(maxlen=50)
+    self._lock = threading.Lock()
+
+  def acquire(self):
+    """
+    Waits for a token, and returns the number of seconds waited.
+    """
+    waited = 0
+    while True:
+      with self._lock:
+        now = time.time()
+        self._recent_requests.append(now)
+        if self.rate is None:
+          return waited
+        self._tokens = min(self._tokens + (now - self._last_refill) * self.rate,
+          max(self.rate, 1))
+        self._last_refill = now
+        if self._tokens >= 1:
+          self._tokens -= 1
+          return waited
+        wait = (1 - self._tokens) / self.rate
+        self._recent_requests.pop()
+      time.sleep(wait)
+      waited += wait
+
+  def on_quota_error(self):
+    with self._lock:
+      if self.rate is None:
+        self.rate = self._get_recent_rate()
+      self.rate = max(self.rate / 2.0, MIN_REQUESTS_PER_SECOND)
+      self._tokens = min(self._tokens, 0)
+      logger.info('Throttling DFP requests to {0:.1f} per second.'.format(
+        self.rate))
+
+  def on_success(self):
+    with self._lock:
+      if self.rate is None:
+        return
+      if self.max_rate is None or self.rate < self.max_rate:
+        self.rate += 0.1
+        if self.max_rate is not None:
+          self.rate = min(self.rate, self.max_rate)
+
+  def _get_recent_rate(self):
+    if len(self._recent_requests) < 10:
+      return DEFAULT_REQUESTS_PER_SECOND
+    elapsed = self._recent_requests[-1] - self._recent_requests[0]
+    return (len(self._recent_requests) - 1) / max(elapsed, 0.001)
+
+_stats_lock = threading.Lock()
+_stats = Counter()
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+  """
+  Returns the process-wide rate limiter, configured by the
+  DFP_MAX_REQUESTS_PER_SECOND setting.
+  """
+  global _limiter
+  with _limiter_lock:
+    if _limiter is None:
+      _limiter = RateLimiter(
+        getattr(settings, 'DFP_MAX_REQUESTS_PER_SECOND', None))
+    return _limiter
+
+def reset_rate_limiter():
+  global _limiter
+  with _limiter_lock:
+    _limiter = None
+
+def record(stat, amount=1):
+  with _stats_lock:
+    _stats[stat] += amount
+
+def get_retry_stats():
+  """
+  Returns:
+    an object: with keys "retries" (the total), "retries:<error>" for each
+      kind of error retried, "gave_up", "backoff_seconds",
+      "rate_limited_seconds" and "batch_splits"
+  """
+  with _stats_lock:
+    return dict(_stats)
+
+def reset_retry_stats():
+  with _stats_lock:
+    _stats.clear()
+
+def is_idempotent(method_name):
+  """
+  Returns whether calling a DFP service method twice has the same effect as
+  calling it once. Only the `create*` methods are not: a repeat creates
+  duplicates.
+  """
+  return not method_name.startswith('create')
+
+def call_with_retry(method, *args, retry_transport_errors=True, **kwargs):
+  """
+  Calls a DFP service method through the rate limiter, retrying retryable
+  faults with jittered exponential backoff. With `retry_transport_errors`
+  False, errors reaching DFP (e.g. timeouts) are raised instead of retried.
+
+  The DFP_MAX_RETRIES (default 5), DFP_RETRY_BASE_DELAY (default 1 second)
+  and DFP_RETRY_MAX_DELAY (default 60 seconds) settings control the
+  retries.
+  """
+  max_retries = getattr(settings, 'DFP_MAX_RETRIES', 5)
+  base_delay = getattr(settings, 'DFP_RETRY_BASE_DELAY', 1)
+  max_delay = getattr(settings, 'DFP_RETRY_MAX_DELAY', 60)
+  limiter = get_rate_limiter()
+
+  attempt = 0
+  while True:
+    waited = limiter.acquire()
+    if waited:
+      record('rate_limited_seconds', waited)
+    try:
+      response = method(*args, **kwargs)
+    except Exception as e:
+      if is_quota_error(e):
+        limiter.on_quota_error()
+      if not is_retryable(e, retry_transport_errors) or is_batch_too_large(e):
+        if is_transport_error(e) and not retry_transport_errors:
+          logger.warning(u'{method} failed with {error}, which is not retried since DFP may have '
+            'created the objects anyway. Check for them before running it again, e.g. with '
+            '--resume.'.format(method=getattr(method, '__name__', 'DFP call'),
+              error=type(e).__name__))
+        raise
+      if attempt >= max_retries:
+        record('gave_up')
+        raise
+      attempt += 1
+      error_name = (get_error_strings(e) or [type(e).__name__])[0]
+      record('retries')
+      record('retries:{0}'.format(error_name))
+
+      # "Full jitter": spreads out retries from many threads.
+      delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+      logger.info(u'Retrying {method} after {error} in {delay:.1f}s '
+        '(attempt {attempt} of {max_retries}).'.format(
+          method=getattr(method, '__name__', 'DFP call'), error=error_name,
+          delay=delay, attempt=attempt, max_retries=max_retries))
+      time.sleep(delay)
+      record('backoff_seconds', delay)
+    else:
+      limiter.on_success()
+      return response
+
+class RetryingService(object):
+  """
+  Wraps a DFP service proxy so every method call goes through
+  `call_with_retry`. Errors reaching DFP are only retried for methods that
+  are safe to repeat (see `is_idempotent`).
+  """
+
+  def __init__(self, service):
+    self._service = service
+
+  def __getattr__(self, method_name):
+    method = getattr(self._service, method_name)
+    if not callable(method):
+      return method
+
+    retry_transport_errors = is_idempotent(method_name)
+
+    @wraps(method)
+    def retrying_method(*args, **kwargs):
+      return call_with_retry(method, *args,
+        retry_transport_errors=retry_transport_errors, **kwargs)
+    return retrying_method
@@ -0,0 +1,41 @@
+
+import logging
+
+import settings
+from dfp.batches import iter_batches, submit_batches
+from dfp.client import get_service
+
+
+logger = logging.getLogger(__name__)
+
+def update_line_items(line_items, batch_size=None, max_workers=None):
+  """
+  Updates existing line items in DFP, in concurrent batches.
+
+  Args:
+    line_items (iterable): an array or generator of DFP line items, each a
+      full line item as returned by DFP with the fields to change set
+    batch_size (int): the maximum number of line items per request. Defaults
+      to the DFP_LINE_ITEM_BATCH_SIZE setting, or 250.
+    max_workers (int): the maximum number of requests in flight at once.
+      Defaults to the DFP_MAX_CONCURRENT_REQUESTS setting, or 4.
+  Returns:
+    an array: the IDs of the updated line items
+  """
+  if batch_size is None:
+    batch_size = getattr(settings, 'DFP_LINE_ITEM_BATCH_SIZE', 250)
+
+  def update_batch(batch):
+    line_item_service = get_service('LineItemService', version='v202008')
+    return line_item_service.updateLineItems(batch)
+
+  updated_batches = submit_batches(update_batch,
+    iter_batches(line_items, batch_size), max_workers=max_workers,
+    description='line item updates')
+
+  updated_line_item_ids = []
+  for updated_line_items in updated_batches:
+    for line_item in updated_line_items:
+      updated_line_item_ids.append(line_item['id'])
+      logger.info(u'Updated line item "{name}".'.format(name=line_item['name']))
+  return updated_line_item_ids
@@ -69,6 +69,37 @@ DFP_USE_EXISTING_ORDER_IF_EXISTS = False
 # The currency to use in DFP when setting line item CPMs. Defaults to 'USD'.
 # DFP_CURRENCY_CODE = 'USD'
 
+# Optional
+# How many line items to send to DFP in each request. Defaults to 250.
+# DFP_LINE_ITEM_BATCH_SIZE = 250
+
+# Optional
+# How many requests to DFP may run at the same time when creating orders,
+# creatives and line items, and attaching creatives. Defaults to 4. Set to 1
+# to send requests one after another.
+# DFP_MAX_CONCURRENT_REQUESTS = 4
+
+# Optional
+# A SQLite file in which to cache the IDs of users, advertisers, placements,
+# ad units and targeting keys between runs. Disabled by default. Clear it
+# with `python -m dfp.lookup_cache` if any of those objects change in DFP.
+# DFP_LOOKUP_CACHE_FILE = os.path.join(ROOT_DIR, 'lookup_cache.sqlite3')
+
+# Optional
+# How many seconds a cached ID stays valid. Defaults to one day.
+# DFP_LOOKUP_CACHE_TTL = 86400
+
+# Optional
+# The most line items to put in one order. DFP limits how many line items an
+# order can have, so when there are more prices than this, the line items are
+# split across several orders. Defaults to 450.
+# DFP_MAX_LINE_ITEMS_PER_ORDER = 450
+
+# Optional
+# The format for order names when line items are split across several orders.
+# Defaults to u'{order_name} ({shard}/{total})'.
+# DFP_ORDER_SHARD_NAME_FORMAT = u'{order_name} ({shard}/{total})'
+
 # Optional
 # The format for line item name. Defaults to u'{bidder_code}: HB ${price}'.
 # This should be specified in python's format syntax.
@@ -82,8 +113,14 @@ PREBID_BIDDER_CODE = None
 
 # Price buckets. This should match your Prebid settings for the partner. See:
 # http://prebid.org/dev-docs/publisher-api-reference.html#module_pbjs.setPriceGranularity
-# FIXME: this should be an array of buckets. See:
-# https://github.com/prebid/Prebid.js/blob/8fed3d7aaa814e67ca3efc103d7d306cab8c692c/src/cpmBucketManager.js
+# This can be one range, as below; the name of a Prebid price granularity
+# ('low', 'medium', 'high', 'auto' or 'dense'); or an array of ranges, like
+# the "buckets" of a Prebid custom price granularity. In an array, "min"
+# defaults to the previous range's "max" and "precision" defaults to 2:
+# PREBID_PRICE_BUCKETS = [
+#   {'max': 5, 'increment': 0.05},
+#   {'max': 20, 'increment': 0.50},
+# ]
 PREBID_PRICE_BUCKETS = {
   'precision': 2,
   'min' : 0,
@@ -91,6 +128,70 @@ PREBID_PRICE_BUCKETS = {
   'increment': 0.10,
 }
 
+# Optional
+# Bidder codes to set up in one run with `python -m tasks.add_new_prebid_partners`.
+# Each entry is either a bidder code or an object with a "bidder_code" and
+# any of "order_name", "advertiser_name", "price_buckets", "num_creatives",
+# "currency_code" and "line_item_format" to override the settings above.
+# Unless overridden, order names are DFP_ORDER_NAME formatted with
+# {bidder_code}, e.g. DFP_ORDER_NAME = 'Prebid: {bidder_code}'.
+# PREBID_BIDDER_CODES = [
+#   'appnexus',
+#   {'bidder_code': 'rubicon', 'num_creatives': 4},
+# ]
+
+# Optional
+# How many partners `python -m tasks.add_new_prebid_partners` sets up at the
+# same time. Defaults to 2.
+# DFP_MAX_CONCURRENT_PARTNERS = 2
+
+# Optional
+# The most requests per second to send to DFP. By default requests are not
+# limited until DFP reports that the quota is exceeded; either way, the rate
+# is halved on each quota error and recovers gradually.
+# DFP_MAX_REQUESTS_PER_SECOND = 8
+
+# Optional
+# How many times to retry a request that failed with a quota or server
+# error, and the base and maximum seconds to back off between attempts.
+# Defaults to 5 retries, backing off from 1 up to 60 seconds.
+# DFP_MAX_RETRIES = 5
+# DFP_RETRY_BASE_DELAY = 1
+# DFP_RETRY_MAX_DELAY = 60
+
+# Optional
+# A file to write the API call metrics of each setup to: in the Prometheus
+# text format if the name ends with ".prom", otherwise as JSON. A summary is
+# always logged at the end of a setup.
+# DFP_METRICS_FILE = os.path.join(ROOT_DIR, 'metrics.json')
+
+# Optional
+# Whether to save the progress of every setup to a journal, not only of
+# setups run with the --resume flag. Defaults to False.
+# DFP_SETUP_JOURNAL = True
+
+# Optional
+# The directory where each setup's progress is saved, so an interrupted
+# setup can be continued with the --resume flag. Defaults to "journals" in
+# the repository root.
+# DFP_SETUP_JOURNAL_DIR = os.path.join(ROOT_DIR, 'journals')
+
+# Optional
+# The file holding the snippet of the third party creatives, and a map of
+# bidder codes to snippet files for bidders that need their own. "${bidder_code}"
+# in a snippet is replaced by the bidder code. Defaults to the Prebid
+# universal creative in dfp/creative_snippet.html.
+# DFP_CREATIVE_SNIPPET_FILE = os.path.join(ROOT_DIR, 'creative_snippet.html')
+# DFP_CREATIVE_SNIPPET_FILES = {
+#   'appnexus': os.path.join(ROOT_DIR, 'appnexus_snippet.html'),
+# }
+
+# Optional
+# Whether to reuse the advertiser's existing creatives made by this tool that
+# have the same snippet, e.g. from other bidders' orders, creating only the
+# creatives still needed. Video creatives are always created.
+# DFP_REUSE_CREATIVES = True
+
 #########################################################################
 
 # Try importing local settings, which will take precedence.
@@ -1,16 +1,24 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import argparse
+import asyncio
+import itertools
 import logging
 import os
+import re
 import sys
+from collections import Counter
 from builtins import input
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
 
 from colorama import init
 
 import settings
+import dfp.aio
 import dfp.associate_line_items_and_creatives
+import dfp.client
 import dfp.create_custom_targeting
 import dfp.create_creatives
 import dfp.create_line_items
@@ -18,18 +26,28 @@ import dfp.create_orders
 import dfp.get_ad_units
 import dfp.get_advertisers
 import dfp.get_custom_targeting
+import dfp.get_licas
+import dfp.get_line_items
+import dfp.get_orders
 import dfp.get_placements
 import dfp.get_users
+import dfp.instrumentation
+import dfp.update_line_items
+from dfp.batches import get_max_concurrent_requests, split_into_batches
 from dfp.exceptions import (
   BadSettingException,
+  DFPObjectNotFound,
   MissingSettingException
 )
 from tasks.price_utils import (
-  get_prices_array,
+  PRICE_GRANULARITY_PRESETS,
+  PriceTable,
+  get_price_bucket_ranges,
+  get_prices_array_from_ranges,
   get_prices_summary_string,
-  micro_amount_to_num,
-  num_to_str,
 )
+from tasks import setup_plan
+from tasks.setup_journal import NullSetupJournal, get_setup_journal
 
 # Colorama for cross-platform support for colored logging.
 # https://github.com/kmjennison/dfp-prebid-setup/issues/9
@@ -50,50 +68,94 @@ logger = logging.getLogger(__name__)
 
 
 def setup_partner(user_email, advertiser_name, order_name, placements, ad_units, sizes, bidder_code, prices,
-                  num_creatives, currency_code, line_item_format, video_ad_type=False, redirect_url=''):
+                  num_creatives, currency_code, line_item_format, video_ad_type=False, redirect_url='',
+                  journal=None, reconcile=False):
   """
   Call all necessary DFP tasks for a new Prebid partner setup.
+
+  If a `journal` (a SetupJournal) is given, progress is checkpointed to it,
+  and a journal loaded with `resume=True` continues an interrupted setup.
+
+  With `reconcile`, an existing setup is updated instead: only missing or
+  drifted objects are created or updated (see `reconcile_partner_order`).
   """
 
-  # Get the user.
-  user_id = dfp.get_users.get_user_id_by_email(user_email)
+  # Share one DFP client and its services across every call in the setup,
+  # and record each call for the summary.
+  with dfp.client.pooled(), dfp.instrumentation.instrumented() as metrics:
+    with dfp.instrumentation.phase('lookups'):
+      # Get the user.
+      user_id = dfp.get_users.get_user_id_by_email(user_email)
 
-  # Get the placement IDs.
-  placement_ids = dfp.get_placements.get_placement_ids_by_name(placements)
+      # Get the placement IDs.
+      placement_ids = dfp.get_placements.get_placement_ids_by_name(placements)
 
-  # Get the ad unit IDs.
-  ad_unit_ids = dfp.get_ad_units.get_ad_unit_ids_by_name(ad_units)
+      # Get the ad unit IDs.
+      ad_unit_ids = dfp.get_ad_units.get_ad_unit_ids_by_name(ad_units)
 
-  # Get (or potentially create) the advertiser.
-  advertiser_id = dfp.get_advertisers.get_advertiser_id_by_name(
-    advertiser_name)
+      # Get (or potentially create) the advertiser.
+      advertiser_id = dfp.get_advertisers.get_advertiser_id_by_name(
+        advertiser_name)
 
-  # Create the order.
-  order_id = dfp.create_orders.create_order(order_name, advertiser_id, user_id)
+      # Get DFP key IDs for line item targeting.
+      hb_bidder_key_id = get_or_create_dfp_targeting_key('hb_bidder')
+      hb_pb_key_id = get_or_create_dfp_targeting_key('hb_pb')
 
-  # Create creatives.
-  creative_configs = dfp.create_creatives.create_duplicate_creative_configs(
-      bidder_code, order_name, advertiser_id, num_creatives, video_ad_type, redirect_url)
-  creative_ids = dfp.create_creatives.create_creatives(creative_configs)
+      # Instantiate DFP targeting value ID getters for the targeting keys.
+      HBBidderValueGetter = DFPValueIdGetter('hb_bidder')
+      HBPBValueGetter = DFPValueIdGetter('hb_pb')
 
-  # Get DFP key IDs for line item targeting.
-  hb_bidder_key_id = get_or_create_dfp_targeting_key('hb_bidder')
-  hb_pb_key_id = get_or_create_dfp_targeting_key('hb_pb')
+    setup_order = reconcile_partner_order if reconcile else create_partner_order
+    setup_order(user_id, advertiser_id, order_name, placement_ids, ad_unit_ids, sizes, bidder_code, prices,
+                num_creatives, currency_code, line_item_format, hb_bidder_key_id, hb_pb_key_id,
+                HBBidderValueGetter, HBPBValueGetter, video_ad_type, redirect_url, journal)
 
-  # Instantiate DFP targeting value ID getters for the targeting keys.
-  HBBidderValueGetter = DFPValueIdGetter('hb_bidder')
-  HBPBValueGetter = DFPValueIdGetter('hb_pb')
+  dfp.instrumentation.report(metrics, logger)
 
-  # Create line items.
-  line_items_config = create_line_item_configs(prices, order_id, placement_ids, ad_unit_ids, bidder_code, sizes,
-                                               hb_bidder_key_id, hb_pb_key_id, currency_code, line_item_format,
-                                               HBBidderValueGetter, HBPBValueGetter, video_ad_type)
-  logger.info("Creating line items...")
-  line_item_ids = dfp.create_line_items.create_line_items(line_items_config)
+  logger.info("""
 
-  # Associate creatives with line items.
-  dfp.associate_line_items_and_creatives.make_licas(line_item_ids,
-    creative_ids, size_overrides=sizes)
+    Done! Please review your order, line items, and creatives to
+    make sure they are correct. Then, approve the order in DFP.
+
+    Happy bidding!
+
+  """)
+
+async def setup_partner_async(user_email, advertiser_name, order_name, placements, ad_units, sizes, bidder_code,
+                              prices, num_creatives, currency_code, line_item_format, video_ad_type=False,
+                              redirect_url='', journal=None, reconcile=False):
+  """
+  The same as `setup_partner`, but runs the independent lookups (user,
+  placements, ad units, advertiser and targeting keys) concurrently.
+
+  Run it with `dfp.aio.run_until_complete`.
+  """
+
+  async def get_key_and_value_getter(key_name):
+    key_id = await dfp.aio.run(get_or_create_dfp_targeting_key, key_name)
+    value_getter = await dfp.aio.run(DFPValueIdGetter, key_name)
+    return key_id, value_getter
+
+  with dfp.client.pooled(), dfp.instrumentation.instrumented() as metrics:
+    with dfp.instrumentation.phase('lookups'):
+      (user_id, placement_ids, ad_unit_ids, advertiser_id,
+        (hb_bidder_key_id, HBBidderValueGetter),
+        (hb_pb_key_id, HBPBValueGetter)) = await asyncio.gather(
+          dfp.aio.run(dfp.get_users.get_user_id_by_email, user_email),
+          dfp.aio.run(dfp.get_placements.get_placement_ids_by_name, placements),
+          dfp.aio.run(dfp.get_ad_units.get_ad_unit_ids_by_name, ad_units),
+          dfp.aio.run(dfp.get_advertisers.get_advertiser_id_by_name, advertiser_name),
+          get_key_and_value_getter('hb_bidder'),
+          get_key_and_value_getter('hb_pb'),
+        )
+
+    setup_order = reconcile_partner_order if reconcile else create_partner_order
+    await dfp.aio.run(setup_order, user_id, advertiser_id, order_name, placement_ids, ad_unit_ids,
+                      sizes, bidder_code, prices, num_creatives, currency_code, line_item_format,
+                      hb_bidder_key_id, hb_pb_key_id, HBBidderValueGetter, HBPBValueGetter, video_ad_type,
+                      redirect_url, journal)
+
+  dfp.instrumentation.report(metrics, logger)
 
   logger.info("""
 
@@ -104,6 +166,588 @@ def setup_partner(user_email, advertiser_name, order_name, placements, ad_units,
 
   """)
 
+def create_partner_order(user_id, advertiser_id, order_name, placement_ids, ad_unit_ids, sizes, bidder_code,
+                         prices, num_creatives, currency_code, line_item_format, hb_bidder_key_id, hb_pb_key_id,
+                         HBBidderValueGetter, HBPBValueGetter, video_ad_type=False, redirect_url='', journal=None):
+  """
+  Create the order, creatives, line items and associations for one Prebid
+  partner, once the user, inventory, advertiser and targeting keys are
+  resolved. If there are more prices than fit in one order, the line items
+  are split across several orders.
+
+  If a `journal` is given, progress is saved to it after each step. When
+  resuming from a journal, objects recorded in the journal or already in DFP
+  are reused, and only the remaining work is done. A journal of a setup that
+  already finished is left as is.
+
+  Returns:
+    an array: the IDs of the orders
+  """
+
+  if journal is None:
+    journal = NullSetupJournal()
+  resuming = journal.resuming
+
+  # Create the orders, one per shard of prices.
+  price_shards = get_order_price_shards(prices)
+  order_names = get_order_shard_names(order_name, len(price_shards))
+
+  if resuming and journal.is_done():
+    logger.info(u'The setup of "{0}" already finished. Nothing to resume.'.format(order_name))
+    return [journal.get_order_id(shard_order_name) for shard_order_name in order_names]
+
+  def get_or_create_order(shard_order_name):
+    order_id = journal.get_order_id(shard_order_name)
+    if order_id is None and resuming:
+      existing_order = dfp.get_orders.get_order_by_name(shard_order_name)
+      order_id = existing_order['id'] if existing_order is not None else None
+    if order_id is None:
+      order_id = dfp.create_orders.create_order(shard_order_name, advertiser_id, user_id)
+    journal.record_order(shard_order_name, order_id)
+    return order_id
+
+  # Create creatives.
+  def get_or_create_creatives():
+    with dfp.instrumentation.phase('creatives'):
+      creative_ids = journal.get_creative_ids()
+      if not creative_ids:
+        creative_ids = get_or_create_creative_ids(bidder_code, order_name,
+          advertiser_id, num_creatives, video_ad_type, redirect_url)
+        journal.record_creatives(creative_ids)
+      return creative_ids
+
+  # Creatives do not depend on the orders or line items, so create them in
+  # the background while the orders and line item configs are prepared.
+  max_workers = min(len(order_names) + 1, get_max_concurrent_requests())
+  with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+    creative_ids_future = executor.submit(
+      dfp.instrumentation.propagate(get_or_create_creatives))
+    succeeded = False
+    try:
+      with dfp.instrumentation.phase('orders'):
+        order_ids = list(executor.map(
+          dfp.instrumentation.propagate(get_or_create_order), order_names))
+
+      # Create line items, each in the order for its shard of prices. The
+      # targeting values are resolved here, but each config is only built as
+      # `create_line_items` sends it.
+      with dfp.instrumentation.phase('line_item_configs'):
+        line_items_config = itertools.chain.from_iterable([
+          iter_line_item_configs(shard_prices, shard_order_id, placement_ids, ad_unit_ids, bidder_code, sizes,
+                                 hb_bidder_key_id, hb_pb_key_id, currency_code, line_item_format,
+                                 HBBidderValueGetter, HBPBValueGetter, video_ad_type)
+          for shard_order_id, shard_prices in zip(order_ids, price_shards)])
+      succeeded = True
+    finally:
+      # Wait for the creatives even if the orders failed, so their outcome
+      # is reported rather than lost with the future.
+      if not succeeded:
+        report_background_creatives(creative_ids_future)
+
+    creative_ids = creative_ids_future.result()
+
+  with dfp.instrumentation.phase('line_items'):
+    if resuming:
+      # Skip line items created before the interruption, including any created
+      # after the journal was last saved.
+      line_item_ids_by_name = journal.get_line_item_ids_by_name()
+      for line_item in dfp.get_line_items.get_line_items_for_orders(order_ids):
+        line_item_ids_by_name.setdefault(line_item['name'], line_item['id'])
+      line_item_names = []
+      missing_line_item_names = []
+
+      def get_missing_line_items_config():
+        for config in line_items_config:
+          line_item_names.append(config['name'])
+          if config['name'] not in line_item_ids_by_name:
+            missing_line_item_names.append(config['name'])
+            yield config
+      missing_line_items_config = get_missing_line_items_config()
+    else:
+      missing_line_items_config = line_items_config
+
+    logger.info("Creating line items...")
+    created_line_item_ids = dfp.create_line_items.create_line_items(missing_line_items_config,
+                                                                    on_batch_created=journal.record_line_items)
+    if resuming:
+      logger.info(u'Resuming: {0} of {1} line items already existed.'.format(
+        len(line_item_names) - len(missing_line_item_names), len(line_item_names)))
+      for name, line_item_id in zip(missing_line_item_names, created_line_item_ids):
+        line_item_ids_by_name[name] = line_item_id
+      line_item_ids = [line_item_ids_by_name[name] for name in line_item_names]
+    else:
+      line_item_ids = created_line_item_ids
+
+  # Associate creatives with line items.
+  with dfp.instrumentation.phase('licas'):
+    existing_licas = None
+    if resuming:
+      existing_licas = journal.get_licas()
+      for lica in dfp.get_licas.get_licas_for_line_items(line_item_ids):
+        existing_licas.add((lica['lineItemId'], lica['creativeId']))
+    dfp.associate_line_items_and_creatives.make_licas(line_item_ids,
+      creative_ids, size_overrides=sizes, existing_licas=existing_licas,
+      on_batch_created=journal.record_licas)
+
+  journal.mark_done()
+
+  return order_ids
+
+def report_background_creatives(creative_ids_future):
+  """
+  Waits for creatives being created in the background of a setup that
+  failed, and logs the creatives created, or the error creating them.
+
+  Args:
+    creative_ids_future (Future): resolves to the creative IDs
+  """
+  creative_error = creative_ids_future.exception()
+  if creative_error is not None:
+    logger.error(u'Creating the creatives also failed: {0}'.format(creative_error))
+  else:
+    logger.warning(u'The setup failed after creating creatives {0}. Run it again with --resume to use '
+                   'them, or archive them in DFP.'.format(
+                     ', '.join(str(creative_id) for creative_id in creative_ids_future.result())))
+
+def reconcile_partner_order(user_id, advertiser_id, order_name, placement_ids, ad_unit_ids, sizes, bidder_code,
+                            prices, num_creatives, currency_code, line_item_format, hb_bidder_key_id, hb_pb_key_id,
+                            HBBidderValueGetter, HBPBValueGetter, video_ad_type=False, redirect_url='',
+                            journal=None):
+  """
+  Bring an existing partner setup in line with the settings, taking the
+  same arguments as `create_partner_order` (apart from `journal`, which is
+  not used).
+
+  The line items of every existing order of the setup are read once,
+  whether it was split across orders or not and however many orders it
+  had, and matched to the wanted line items by name, or by `hb_pb` value.
+  Existing line items stay in their orders. Only the missing line items are
+  created, in the existing orders with room left and then in new orders,
+  line items whose name or CPM drifted are updated, and only the missing
+  creative associations are created, reusing the creatives the existing
+  line items already have.
+
+  Returns:
+    an array: the IDs of the orders
+  """
+  with dfp.instrumentation.phase('orders'):
+    existing_orders = get_existing_partner_orders(order_name)
+    order_ids = [order['id'] for order in existing_orders]
+
+  # The orders of the missing line items are only known once they are
+  # matched against the existing ones.
+  with dfp.instrumentation.phase('line_item_configs'):
+    line_items_config = iter_line_item_configs(prices, None, placement_ids, ad_unit_ids, bidder_code, sizes,
+                                               hb_bidder_key_id, hb_pb_key_id, currency_code, line_item_format,
+                                               HBBidderValueGetter, HBPBValueGetter, video_ad_type)
+
+  with dfp.instrumentation.phase('line_items'):
+    existing_line_items = dfp.get_line_items.get_line_items_for_orders(order_ids) if order_ids else []
+    diff = get_line_item_diff(line_items_config, existing_line_items, hb_pb_key_id)
+
+    new_order_names = iter_new_order_names(order_name, len(get_order_price_shards(prices)),
+                                           [order['name'] for order in existing_orders])
+    def create_order():
+      order_id = dfp.create_orders.create_order(next(new_order_names), advertiser_id, user_id)
+      order_ids.append(order_id)
+      return order_id
+
+    missing_line_items_config = assign_orders(diff['missing'], order_ids,
+                                              Counter(line_item['orderId'] for line_item in existing_line_items),
+                                              create_order)
+
+    logger.info("Creating line items...")
+    created_line_item_ids = dfp.create_line_items.create_line_items(missing_line_items_config)
+    if diff['drifted']:
+      dfp.update_line_items.update_line_items(diff['drifted'])
+
+    created_line_item_ids = iter(created_line_item_ids)
+    line_item_ids = [line_item_id if line_item_id is not None else next(created_line_item_ids)
+                     for line_item_id in diff['line_item_ids']]
+
+  with dfp.instrumentation.phase('creatives'):
+    existing_line_item_ids = [line_item_id for line_item_id in diff['line_item_ids']
+                              if line_item_id is not None]
+    existing_licas = set()
+    creative_ids = []
+    for lica in dfp.get_licas.get_licas_for_line_items(existing_line_item_ids):
+      existing_licas.add((lica['lineItemId'], lica['creativeId']))
+      if lica['creativeId'] not in creative_ids:
+        creative_ids.append(lica['creativeId'])
+
+    # Create only the creatives the existing line items don't already have.
+    creative_ids = get_or_create_creative_ids(bidder_code, order_name,
+      advertiser_id, num_creatives, video_ad_type, redirect_url, creative_ids)
+
+  with dfp.instrumentation.phase('licas'):
+    num_licas = dfp.associate_line_items_and_creatives.make_licas(line_item_ids,
+      creative_ids, size_overrides=sizes, existing_licas=existing_licas)
+
+  logger.info(u'Reconciled {total} line items: {existing} already existed, {created} created and {updated} '
+    'updated. Created {licas} line item <> creative associations.'.format(
+      total=len(line_item_ids), existing=len(existing_line_item_ids),
+      created=len(line_item_ids) - len(existing_line_item_ids), updated=len(diff['drifted']), licas=num_licas))
+
+  return order_ids
+
+def get_existing_partner_orders(order_name):
+  """
+  Get the existing orders of a partner setup: the order named `order_name`
+  and any named as one of its shards, for any number of shards.
+
+  Args:
+    order_name (str)
+  Returns:
+    an array of DFP orders: the unsharded order first, then the shards by
+      their number of shards and shard number
+  """
+  name_format = getattr(settings, 'DFP_ORDER_SHARD_NAME_FORMAT',
+    u'{order_name} ({shard}/{total})')
+
+  # Mark where the numbers go, then turn the marks into a LIKE pattern and
+  # a regular expression that reads the numbers back.
+  shard_mark, total_mark = u'\x00', u'\x01'
+  marked_name = name_format.format(order_name=order_name, shard=shard_mark, total=total_mark)
+  name_pattern = marked_name.replace(shard_mark, '%').replace(total_mark, '%')
+  groups = {shard_mark: 'shard', total_mark: 'total'}
+  seen = set()
+  regex = ''
+  for part in re.split(u'([\x00\x01])', marked_name):
+    if part in groups:
+      regex += '(?P={0})'.format(groups[part]) if part in seen else r'(?P<{0}>\d+)'.format(groups[part])
+      seen.add(part)
+    else:
+      regex += re.escape(part)
+  regex = re.compile(u'^{0}$'.format(regex))
+
+  shard_orders = []
+  for order in dfp.get_orders.get_orders_by_name_pattern(name_pattern):
+    match = regex.match(order['name'])
+    if match is not None:
+      numbers = match.groupdict()
+      shard_orders.append(((int(numbers.get('total') or 0), int(numbers.get('shard') or 0)), order))
+  shard_orders.sort(key=lambda shard_order: shard_order[0])
+
+  orders = [order for _, order in shard_orders]
+  unsharded_order = dfp.get_orders.get_order_by_name(order_name)
+  if unsharded_order is not None:
+    orders.insert(0, unsharded_order)
+  return orders
+
+def iter_new_order_names(order_name, num_shards, existing_names):
+  """
+  Yields names for new orders of a partner setup, none of them in
+  `existing_names`: first the names of its `num_shards` shards, then those
+  of ever more shards.
+  """
+  taken = set(existing_names)
+  names = get_order_shard_names(order_name, num_shards)
+  total = max(num_shards, 1)
+  while True:
+    for name in names:
+      if name not in taken:
+        taken.add(name)
+        yield name
+    total += 1
+    names = get_order_shard_names(order_name, total)
+
+def assign_orders(line_items_config, order_ids, line_item_counts, create_order):
+  """
+  Put each line item config in the first order with room left for it,
+  creating a new order when every order is full.
+
+  Args:
+    line_items_config (iterable): the configs of the line items to create
+    order_ids (arr): the IDs of the orders to fill, in order. Orders created
+      by `create_order` are expected to be appended to it.
+    line_item_counts (Counter): the number of line items in each order
+    create_order (function): creates an order and returns its ID
+  Returns:
+    a generator of objects: the configs, with their "orderId" set
+  """
+  max_line_items = getattr(settings, 'DFP_MAX_LINE_ITEMS_PER_ORDER', 450)
+  position = 0
+  for config in line_items_config:
+    while position < len(order_ids) and line_item_counts[order_ids[position]] >= max_line_items:
+      position += 1
+    order_id = order_ids[position] if position < len(order_ids) else create_order()
+    line_item_counts[order_id] += 1
+    config['orderId'] = order_id
+    yield config
+
+def get_or_create_creative_ids(bidder_code, order_name, advertiser_id, num_creatives,
+                               video_ad_type=False, redirect_url='', creative_ids=()):
+  """
+  Returns the IDs of the creatives for a partner's line items: the given
+  creatives, then new ones up to `num_creatives`. With the
+  DFP_REUSE_CREATIVES setting, the advertiser's existing third party
+  creatives with the bidder's snippet are used first and only the shortfall
+  is created.
+
+  Args:
+    creative_ids (arr): IDs of creatives the line items already have
+  Returns:
+    an array: the creative IDs
+  """
+  creative_ids = list(creative_ids)
+  if len(creative_ids) >= num_creatives:
+    return creative_ids
+
+  # Video creatives have no snippet to match, so they are always created.
+  if getattr(settings, 'DFP_REUSE_CREATIVES', False) and not video_ad_type:
+    creative_ids.extend(dfp.create_creatives.get_pooled_creative_ids(
+      bidder_code, order_name, advertiser_id, num_creatives - len(creative_ids),
+      exclude_ids=creative_ids))
+  else:
+    creative_configs = dfp.create_creatives.create_duplicate_creative_configs(
+        bidder_code, order_name, advertiser_id, num_creatives, video_ad_type, redirect_url)
+    creative_ids.extend(dfp.create_creatives.create_creatives(creative_configs[len(creative_ids):]))
+  return creative_ids
+
+def get_line_item_diff(line_items_config, existing_line_items, hb_pb_key_id):
+  """
+  Compare the wanted line items with the ones already in DFP.
+
+  A wanted line item matches an existing one with the same name, or failing
+  that, one targeting the same `hb_pb` value. Matched line items stay in
+  their orders.
+
+  Args:
+    line_items_config (iterable): the wanted line item configs
+    existing_line_items (arr): the DFP line items in the orders
+    hb_pb_key_id (int): the DFP ID of the `hb_pb` targeting key
+  Returns:
+    an object: with keys "missing" (a generator of the configs with no
+      match, only valid until it is exhausted), "drifted" (the matched DFP
+      line items whose name or CPM differs, updated to match their configs)
+      and "line_item_ids" (for every config in order, the matched line
+      item's ID, or None if it is missing)
+  """
+  existing_by_name = {}
+  existing_by_value = {}
+  for line_item in existing_line_items:
+    existing_by_name.setdefault(line_item['name'], line_item)
+    for value_id in get_custom_targeting_value_ids(line_item['targeting']['customTargeting'], hb_pb_key_id):
+      existing_by_value.setdefault(value_id, line_item)
+
+  diff = {'drifted': [], 'line_item_ids': []}
+  matched_ids = set()
+
+  def get_missing():
+    for config in line_items_config:
+      hb_pb_value_ids = get_custom_targeting_value_ids(config['targeting']['customTargeting'], hb_pb_key_id)
+      line_item = existing_by_name.get(config['name'])
+      if line_item is None:
+        line_item = next((existing_by_value[value_id] for value_id in hb_pb_value_ids
+                          if value_id in existing_by_value), None)
+      if line_item is None or line_item['id'] in matched_ids:
+        diff['line_item_ids'].append(None)
+        yield config
+        continue
+
+      matched_ids.add(line_item['id'])
+      diff['line_item_ids'].append(line_item['id'])
+      micro_amount = config['costPerUnit']['microAmount']
+      if line_item['name'] != config['name'] or line_item['costPerUnit']['microAmount'] != micro_amount:
+        line_item['name'] = config['name']
+        line_item['costPerUnit']['microAmount'] = micro_amount
+        diff['drifted'].append(line_item)
+
+  # Consume the configs as `missing` is, so the ID list and drifted line items
+  # are complete once it is exhausted.
+  diff['missing'] = get_missing()
+  return diff
+
+def get_custom_targeting_value_ids(criteria, key_id):
+  """
+  Get the value IDs a custom targeting criteria set targets for a key.
+
+  Args:
+    criteria (object): a DFP CustomCriteriaSet or CustomCriteria
+    key_id (int): the DFP ID of the targeting key
+  Returns:
+    an array of integers
+  """
+  if criteria is None:
+    return []
+  try:
+    children = criteria['children']
+  except (KeyError, AttributeError):
+    children = None
+  if children:
+    return [value_id for child in children for value_id in get_custom_targeting_value_ids(child, key_id)]
+  try:
+    if criteria['keyId'] == key_id:
+      return list(criteria['valueIds'])
+  except (KeyError, AttributeError):
+    pass
+  return []
+
+def compile_plan(user_email, advertiser_name, order_name, placements, ad_units, sizes, bidder_code, prices,
+                 num_creatives, currency_code, line_item_format, video_ad_type=False, redirect_url=''):
+  """
+  Build every order, creative, line item and association config for a new
+  Prebid partner setup, without creating anything in DFP.
+
+  IDs come from the lookup cache when it has them. Every other ID, including
+  those of the objects the plan creates, is a placeholder (see
+  `tasks.setup_plan.ref`) that `apply_plan` fills in.
+
+  Returns:
+    an object: the plan
+  """
+  user_id = setup_plan.get_id_or_ref('user', user_email)
+  advertiser_id = setup_plan.get_id_or_ref('advertiser', advertiser_name)
+  placement_ids = [setup_plan.get_id_or_ref('placement', name) for name in placements]
+  ad_unit_ids = [setup_plan.get_id_or_ref('ad_unit', name) for name in ad_units]
+  hb_bidder_key_id = setup_plan.get_id_or_ref('targeting_key', 'hb_bidder')
+  hb_pb_key_id = setup_plan.get_id_or_ref('targeting_key', 'hb_pb')
+
+  price_shards = get_order_price_shards(prices)
+  order_names = get_order_shard_names(order_name, len(price_shards))
+  orders = [dfp.create_orders.create_order_config(shard_order_name, advertiser_id, user_id)
+            for shard_order_name in order_names]
+
+  creatives = dfp.create_creatives.create_duplicate_creative_configs(
+    bidder_code, order_name, advertiser_id, num_creatives, video_ad_type, redirect_url)
+
+  line_items = []
+  for i, shard_prices in enumerate(price_shards):
+    line_items.extend(
+      create_line_item_configs(shard_prices, setup_plan.ref('order', i), placement_ids, ad_unit_ids, bidder_code,
+                               sizes, hb_bidder_key_id, hb_pb_key_id, currency_code, line_item_format,
+                               setup_plan.PlanValueIdGetter('hb_bidder'), setup_plan.PlanValueIdGetter('hb_pb'),
+                               video_ad_type))
+
+  licas = [
+    dfp.associate_line_items_and_creatives.create_lica_config(
+      setup_plan.ref('line_item', i), setup_plan.ref('creative', j), sizes)
+    for i in range(len(line_items))
+    for j in range(len(creatives))
+  ]
+
+  return {
+    'order_name': order_name,
+    'bidder_code': bidder_code,
+    'orders': orders,
+    'creatives': creatives,
+    'line_items': line_items,
+    'licas': licas,
+  }
+
+def apply_plan(plan):
+  """
+  Create the objects in a plan from `compile_plan`, in DFP: look up (or
+  create) the IDs the plan left as placeholders, then create its orders,
+  creatives, line items and associations.
+
+  Returns:
+    an array: the IDs of the orders
+  """
+  with dfp.client.pooled(), dfp.instrumentation.instrumented() as metrics:
+    with dfp.instrumentation.phase('lookups'):
+      ids = resolve_plan_lookups(plan)
+
+    with dfp.instrumentation.phase('orders'):
+      order_ids = []
+      for i, order in enumerate(setup_plan.resolve(plan['orders'], ids)):
+        order_id = dfp.create_orders.create_order(order['name'], order['advertiserId'], order['traffickerId'])
+        ids[u'order:{0}'.format(i)] = order_id
+        order_ids.append(order_id)
+
+    with dfp.instrumentation.phase('creatives'):
+      creative_ids = dfp.create_creatives.create_creatives(setup_plan.resolve(plan['creatives'], ids))
+      for i, creative_id in enumerate(creative_ids):
+        ids[u'creative:{0}'.format(i)] = creative_id
+
+    with dfp.instrumentation.phase('line_items'):
+      logger.info("Creating line items...")
+      line_item_ids = dfp.create_line_items.create_line_items(setup_plan.resolve(plan['line_items'], ids))
+      for i, line_item_id in enumerate(line_item_ids):
+        ids[u'line_item:{0}'.format(i)] = line_item_id
+
+    with dfp.instrumentation.phase('licas'):
+      dfp.associate_line_items_and_creatives.create_licas(setup_plan.resolve(plan['licas'], ids))
+
+  dfp.instrumentation.report(metrics, logger)
+  return order_ids
+
+def resolve_plan_lookups(plan):
+  """
+  Get the IDs of the existing DFP objects a plan refers to by name, creating
+  the advertiser, targeting keys and targeting values if they don't exist.
+
+  Returns:
+    an object: a map of placeholders, as "kind:name" strings, to DFP IDs
+  """
+  names_by_kind = {}
+  for plan_ref in setup_plan.find_refs(plan):
+    kind, name = setup_plan.parse_ref({'$ref': plan_ref})
+    names_by_kind.setdefault(kind, set()).add(name)
+
+  ids = {}
+  def add_ids(kind, names, values):
+    for name, value in zip(names, values):
+      ids[u'{0}:{1}'.format(kind, name)] = value
+
+  for email in names_by_kind.get('user', []):
+    add_ids('user', [email], [dfp.get_users.get_user_id_by_email(email)])
+  for name in names_by_kind.get('advertiser', []):
+    add_ids('advertiser', [name], [dfp.get_advertisers.get_advertiser_id_by_name(name)])
+
+  placements = sorted(names_by_kind.get('placement', []))
+  if placements:
+    add_ids('placement', placements, dfp.get_placements.get_placement_ids_by_name(placements))
+  ad_units = sorted(names_by_kind.get('ad_unit', []))
+  if ad_units:
+    add_ids('ad_unit', ad_units, dfp.get_ad_units.get_ad_unit_ids_by_name(ad_units))
+
+  for key_name in names_by_kind.get('targeting_key', []):
+    add_ids('targeting_key', [key_name], [get_or_create_dfp_targeting_key(key_name)])
+
+  # Targeting values are named "<key name>:<value name>".
+  value_names_by_key = {}
+  for name in names_by_kind.get('targeting_value', []):
+    key_name, _, value_name = name.partition(':')
+    value_names_by_key.setdefault(key_name, []).append(value_name)
+  for key_name, value_names in value_names_by_key.items():
+    get_or_create_dfp_targeting_key(key_name)
+    value_ids = DFPValueIdGetter(key_name).get_value_ids(value_names)
+    add_ids('targeting_value', [u'{0}:{1}'.format(key_name, name) for name in value_names],
+            [value_ids[name] for name in value_names])
+
+  return ids
+
+def get_order_price_shards(prices):
+  """
+  Split the prices into groups small enough to fit in one order each.
+
+  Args:
+    prices (arr): an array of prices in micro-amounts
+  Returns:
+    an array of arrays: the prices for each order
+  """
+  max_line_items = getattr(settings, 'DFP_MAX_LINE_ITEMS_PER_ORDER', 450)
+  return split_into_batches(prices, max_line_items) or [prices]
+
+def get_order_shard_names(order_name, num_shards):
+  """
+  Get the name of each order when a partner's line items are split across
+  `num_shards` orders.
+
+  Args:
+    order_name (str)
+    num_shards (int)
+  Returns:
+    an array of strings
+  """
+  if num_shards <= 1:
+    return [order_name]
+  name_format = getattr(settings, 'DFP_ORDER_SHARD_NAME_FORMAT',
+    u'{order_name} ({shard}/{total})')
+  return [name_format.format(order_name=order_name, shard=shard, total=num_shards)
+    for shard in range(1, num_shards + 1)]
+
 class DFPValueIdGetter(object):
   """
   A class to bulk fetch DFP values by key and then create new values as needed.
@@ -116,21 +760,32 @@ class DFPValueIdGetter(object):
     """
     self.key_name = key_name
     self.key_id = dfp.get_custom_targeting.get_key_id_by_name(key_name)
-    self.existing_values = dfp.get_custom_targeting.get_targeting_by_key_name(
-      key_name)
+
+    # Index the values by name as their pages arrive, so each lookup is
+    # constant time, no matter how many values the key has accumulated, and
+    # the values are never all held at once. Keep the first ID seen for a
+    # name, as a scan of the values would.
+    self.value_ids_by_name = {}
+    if self.key_id is None:
+      logger.info(u'Key "{key_name}" does not exist in DFP.'.format(
+        key_name=key_name))
+    else:
+      num_values = 0
+      for value_obj in dfp.get_custom_targeting.iter_targeting_values(self.key_id):
+        self.value_ids_by_name.setdefault(value_obj['name'], value_obj['id'])
+        num_values += 1
+      logger.info(u'Key "{key_name}" exists and has {num} existing values.'.format(
+        key_name=key_name, num=num_values))
     super(DFPValueIdGetter, self).__init__(*args, **kwargs)
 
   def _get_value_id_from_cache(self, value_name):
-    val_id = None
-    for value_obj in self.existing_values:
-      if value_obj['name'] == value_name:
-        val_id = value_obj['id']
-        break
-    return val_id
+    return self.value_ids_by_name.get(value_name)
 
   def _create_value_and_return_id(self, value_name):
-    return dfp.create_custom_targeting.create_targeting_value(value_name,
+    val_id = dfp.create_custom_targeting.create_targeting_value(value_name,
       self.key_id)
+    self.value_ids_by_name[value_name] = val_id
+    return val_id
 
   def get_value_id(self, value_name):
     """
@@ -146,6 +801,32 @@ class DFPValueIdGetter(object):
       val_id = self._create_value_and_return_id(value_name)
     return val_id
 
+  def get_value_ids(self, value_names):
+    """
+    Get the DFP custom value IDs for many values at once, creating all the
+    missing ones in batched requests.
+
+    Args:
+      value_names (arr): an array of DFP value names
+    Returns:
+      an object: a map of every value name to the ID of the DFP value
+    Raises:
+      DFPObjectNotFound: listing every value DFP did not return under the
+        requested name, e.g. because it normalized the name
+    """
+    missing_names = [name for name in value_names
+      if not self._get_value_id_from_cache(name)]
+    if missing_names:
+      self.value_ids_by_name.update(
+        dfp.create_custom_targeting.create_targeting_values(missing_names,
+          self.key_id))
+      not_found = [name for name in missing_names
+        if name not in self.value_ids_by_name]
+      if not_found:
+        raise DFPObjectNotFound('No DFP {0} values found with names: {1}'.format(
+          self.key_name, ', '.join(not_found)))
+    return dict((name, self.value_ids_by_name[name]) for name in value_names)
+
 
 def get_or_create_dfp_targeting_key(name):
   """
@@ -184,34 +865,46 @@ def create_line_item_configs(prices, order_id, placement_ids, ad_unit_ids, bidde
     an array of objects: the array of DFP line item configurations
   """
 
-  # The DFP targeting value ID for this `hb_bidder` code.
-  hb_bidder_value_id = HBBidderValueGetter.get_value_id(bidder_code)
+  return list(iter_line_item_configs(prices, order_id, placement_ids, ad_unit_ids, bidder_code, sizes,
+                                     hb_bidder_key_id, hb_pb_key_id, currency_code, line_item_format,
+                                     HBBidderValueGetter, HBPBValueGetter, video_ad_type))
 
-  line_items_config = []
-  for price in prices:
+def iter_line_item_configs(prices, order_id, placement_ids, ad_unit_ids, bidder_code, sizes, hb_bidder_key_id,
+                           hb_pb_key_id, currency_code, line_item_format, HBBidderValueGetter, HBPBValueGetter,
+                           video_ad_type):
+  """
+  The same as `create_line_item_configs`, but returns a generator that
+  builds each config only as it is consumed, so `create_line_items` can send
+  them in batches without every config being in memory at once.
 
-    price_str = num_to_str(micro_amount_to_num(price))
+  The targeting values are looked up (and created) before this returns.
 
-    # Autogenerate the line item name.
-    line_item_name = line_item_format.format(
-      bidder_code=bidder_code,
-      price=price_str
-    )
+  Returns:
+    a generator of objects: the DFP line item configurations
+  """
 
-    # The DFP targeting value ID for this `hb_pb` price value.
-    hb_pb_value_id = HBPBValueGetter.get_value_id(price_str)
+  # The DFP targeting value ID for this `hb_bidder` code.
+  hb_bidder_value_id = HBBidderValueGetter.get_value_id(bidder_code)
+
+  price_table = prices if isinstance(prices, PriceTable) else PriceTable(prices)
+  price_strs = price_table.to_strs()
 
-    config = dfp.create_line_items.create_line_item_config(name=line_item_name, order_id=order_id,
-                                                           placement_ids=placement_ids, ad_unit_ids=ad_unit_ids,
-                                                           cpm_micro_amount=price, sizes=sizes,
-                                                           hb_bidder_key_id=hb_bidder_key_id, hb_pb_key_id=hb_pb_key_id,
-                                                           hb_bidder_value_id=hb_bidder_value_id,
-                                                           hb_pb_value_id=hb_pb_value_id, currency_code=currency_code,
-                                                           video_ad_type=video_ad_type)
+  # The DFP targeting value IDs for every `hb_pb` price value. Missing values
+  # are created in bulk up front rather than one request per price.
+  hb_pb_value_ids = HBPBValueGetter.get_value_ids(price_strs)
 
-    line_items_config.append(config)
+  # Only the name, price and `hb_pb` value differ between the line items.
+  template = dfp.create_line_items.LineItemConfigTemplate(order_id=order_id, placement_ids=placement_ids,
+                                                          ad_unit_ids=ad_unit_ids, sizes=sizes,
+                                                          hb_bidder_key_id=hb_bidder_key_id,
+                                                          hb_pb_key_id=hb_pb_key_id,
+                                                          hb_bidder_value_id=hb_bidder_value_id,
+                                                          currency_code=currency_code, video_ad_type=video_ad_type)
 
-  return line_items_config
+  # Autogenerate each line item name.
+  names = price_table.to_names(line_item_format, bidder_code)
+  return (template.create(name=name, cpm_micro_amount=price, hb_pb_value_id=hb_pb_value_ids[price_str])
+          for name, price, price_str in zip(names, price_table, price_strs))
 
 def check_price_buckets_validity(price_buckets):
   """
@@ -249,6 +942,41 @@ def check_price_buckets_validity(price_buckets):
     raise BadSettingException('The "increment" key in "PREBID_PRICE_BUCKETS" '
       'must be a number.')
 
+def get_prices_from_price_buckets(price_buckets):
+  """
+  Validate the price buckets setting and create its array of prices.
+
+  Args:
+    price_buckets (str, object or array): a Prebid price granularity preset
+      name, a Prebid custom price granularity object, an array of price
+      bucket ranges, or a single price bucket range
+  Returns:
+    a tuple: the array of prices in micro-amounts, and the largest precision
+      of the price bucket ranges
+  """
+
+  try:
+    price_bucket_ranges = get_price_bucket_ranges(price_buckets)
+  except KeyError:
+    raise BadSettingException('The setting "PREBID_PRICE_BUCKETS" must be '
+      'one of {0}, or a custom price bucket configuration.'.format(
+        ', '.join(sorted(PRICE_GRANULARITY_PRESETS))))
+  except (TypeError, ValueError):
+    raise BadSettingException('The setting "PREBID_PRICE_BUCKETS" '
+      'must be a string, an object, or an array of objects.')
+
+  if len(price_bucket_ranges) < 1:
+    raise BadSettingException('The setting "PREBID_PRICE_BUCKETS" '
+      'must contain at least one price bucket.')
+
+  for price_bucket_range in price_bucket_ranges:
+    check_price_buckets_validity(price_bucket_range)
+
+  prices = get_prices_array_from_ranges(price_bucket_ranges)
+  precision = max(price_bucket_range['precision']
+    for price_bucket_range in price_bucket_ranges)
+  return prices, precision
+
 class color:
    PURPLE = '\033[95m'
    CYAN = '\033[96m'
@@ -261,12 +989,25 @@ class color:
    UNDERLINE = '\033[4m'
    END = '\033[0m'
 
-def main():
+def main(resume=False, use_async=False, plan_file=None, apply_file=None, reconcile=False):
   """
   Validate the settings and ask for confirmation from the user. Then,
   start all necessary DFP tasks.
+
+  Args:
+    resume (bool): whether to resume an interrupted setup from its journal
+    use_async (bool): whether to run the setup with `setup_partner_async`
+    plan_file (str): if set, write the setup's plan to this file instead of
+      creating anything in DFP
+    apply_file (str): if set, create the objects in this saved plan instead
+      of setting up from the settings
+    reconcile (bool): whether to update an existing setup, creating only
+      what is missing
   """
 
+  if apply_file is not None:
+    return main_apply(apply_file)
+
   user_email = getattr(settings, 'DFP_USER_EMAIL_ADDRESS', None)
   if user_email is None:
     raise MissingSettingException('DFP_USER_EMAIL_ADDRESS')
@@ -321,11 +1062,13 @@ def main():
   if price_buckets is None:
     raise MissingSettingException('PREBID_PRICE_BUCKETS')
 
-  check_price_buckets_validity(price_buckets)
+  prices, precision = get_prices_from_price_buckets(price_buckets)
+  prices_summary = get_prices_summary_string(prices, precision)
 
-  prices = get_prices_array(price_buckets)
-  prices_summary = get_prices_summary_string(prices,
-    price_buckets['precision'])
+  num_orders = len(get_order_price_shards(prices))
+  order_summary = order_name
+  if num_orders > 1:
+    order_summary = u'{0} (split into {1} orders)'.format(order_name, num_orders)
 
   logger.info(
     u"""
@@ -341,7 +1084,7 @@ def main():
       {name_start_format}ad units{format_end} = {value_start_format}{ad_units}{format_end}
     """.format(
       num_line_items = len(prices),
-      order_name=order_name,
+      order_name=order_summary,
       advertiser=advertiser_name,
       user_email=user_email,
       prices_summary=prices_summary,
@@ -370,13 +1113,82 @@ def main():
 
     """)
 
+  if plan_file is not None:
+    plan = compile_plan(user_email, advertiser_name, order_name, placements or [], ad_units or [], sizes,
+                        bidder_code, prices, num_creatives, currency_code, line_item_format, video_ad_type,
+                        vast_redirect_url)
+    summary = setup_plan.write_plan(plan, plan_file)
+    logger.info(u'Wrote the plan to {0}.\n{1}'.format(plan_file, get_plan_summary_string(summary)))
+    return
+
+  ok = input('Is this correct? (y/n)\n')
+
+  if ok != 'y':
+    logger.info('Exiting.')
+    return
+
+  journal = get_setup_journal(order_name, resume=resume)
+  if use_async:
+    dfp.aio.run_until_complete(setup_partner_async(user_email, advertiser_name, order_name, placements, ad_units, sizes, bidder_code, prices, num_creatives, currency_code, line_item_format, video_ad_type, vast_redirect_url, journal=journal, reconcile=reconcile))
+  else:
+    setup_partner(user_email, advertiser_name, order_name, placements, ad_units, sizes, bidder_code, prices, num_creatives, currency_code, line_item_format, video_ad_type, vast_redirect_url, journal=journal, reconcile=reconcile)
+
+def main_apply(plan_file):
+  """
+  Summarize a saved plan and ask for confirmation from the user. Then,
+  create its objects in DFP.
+
+  Args:
+    plan_file (str): the path of a plan written with `--plan`
+  """
+  plan = setup_plan.load_plan(plan_file)
+  logger.info(u"""
+
+    Going to apply the plan in {name_start_format}{plan_file}{format_end}.
+      {name_start_format}Order{format_end}: {value_start_format}{order_name}{format_end}
+      {name_start_format}Bidder{format_end}: {value_start_format}{bidder_code}{format_end}
+{summary}
+    """.format(
+      plan_file=plan_file,
+      order_name=plan['order_name'],
+      bidder_code=plan['bidder_code'],
+      summary=get_plan_summary_string(setup_plan.get_plan_summary(plan)),
+      name_start_format=color.BOLD,
+      format_end=color.END,
+      value_start_format=color.BLUE,
+    ))
+
   ok = input('Is this correct? (y/n)\n')
 
   if ok != 'y':
     logger.info('Exiting.')
     return
 
-  setup_partner(user_email, advertiser_name, order_name, placements, ad_units, sizes, bidder_code, prices, num_creatives, currency_code, line_item_format, video_ad_type, vast_redirect_url)
+  apply_plan(plan)
+
+def get_plan_summary_string(summary):
+  """
+  Returns a line per section of a plan summary, e.g.
+  "      line_items: 450 (312.5 KB)".
+  """
+  return '\n'.join(u'      {section}: {count} ({kb:.1f} KB)'.format(
+      section=section, count=summary[section]['count'],
+      kb=summary[section]['bytes'] / 1024.0)
+    for section in setup_plan.PLAN_SECTIONS)
 
 if __name__ == '__main__':
-  main()
+  parser = argparse.ArgumentParser(description='Set up a new Prebid partner in DFP.')
+  parser.add_argument('--resume', action='store_true',
+    help='resume an interrupted setup from its journal')
+  parser.add_argument('--async', dest='use_async', action='store_true',
+    help='run independent lookups concurrently')
+  parser.add_argument('--reconcile', action='store_true',
+    help='update an existing setup, creating only missing line items and associations and fixing drifted CPMs')
+  plan_args = parser.add_mutually_exclusive_group()
+  plan_args.add_argument('--plan', metavar='FILE',
+    help='write every object the setup would create to FILE, without creating anything')
+  plan_args.add_argument('--apply', metavar='FILE',
+    help='create the objects in a plan written with --plan')
+  args = parser.parse_args()
+  main(resume=args.resume, use_async=args.use_async, plan_file=args.plan, apply_file=args.apply,
+       reconcile=args.reconcile)
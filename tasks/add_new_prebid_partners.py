@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+from builtins import input
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+import dfp.client
+import dfp.get_ad_units
+import dfp.get_advertisers
+import dfp.get_placements
+import dfp.get_users
+import dfp.instrumentation
+from dfp.exceptions import (
+  BadSettingException,
+  MissingSettingException
+)
+from tasks.add_new_prebid_partner import (
+  DFPValueIdGetter,
+  color,
+  create_partner_order,
+  get_or_create_dfp_targeting_key,
+  get_prices_from_price_buckets,
+)
+from tasks.price_utils import (
+  PriceTable,
+  get_prices_summary_string,
+)
+from tasks.setup_journal import get_setup_journal
+
+
+logger = logging.getLogger(__name__)
+
+# The settings each entry in `PREBID_BIDDER_CODES` may override.
+PARTNER_OVERRIDE_KEYS = [
+  'order_name',
+  'advertiser_name',
+  'price_buckets',
+  'num_creatives',
+  'currency_code',
+  'line_item_format',
+]
+
+def setup_partners(user_email, placements, ad_units, sizes, partners,
+                   video_ad_type=False, redirect_url='', max_workers=None,
+                   resume=False):
+  """
+  Call all necessary DFP tasks to set up many Prebid partners at once.
+
+  The user, placements, ad units, advertisers, targeting keys and targeting
+  values are resolved once and shared by every partner. Each partner's
+  order, creatives, line items and associations are then created
+  concurrently with the other partners'.
+
+  Args:
+    user_email (str)
+    placements (arr)
+    ad_units (arr)
+    sizes (arr)
+    partners (arr): an array of objects, one per partner, each with keys
+      "bidder_code", "order_name", "advertiser_name", "prices",
+      "num_creatives", "currency_code" and "line_item_format"
+    video_ad_type (bool)
+    redirect_url (str)
+    max_workers (int): how many partners to set up at the same time.
+      Defaults to the DFP_MAX_CONCURRENT_PARTNERS setting, or 2.
+    resume (bool): whether to resume each partner's interrupted setup from
+      its journal
+  Returns:
+    an object: a map of each bidder code to the IDs of its orders
+  """
+  if max_workers is None:
+    max_workers = getattr(settings, 'DFP_MAX_CONCURRENT_PARTNERS', 2)
+
+  with dfp.client.pooled(), dfp.instrumentation.instrumented() as metrics:
+    with dfp.instrumentation.phase('lookups'):
+      user_id = dfp.get_users.get_user_id_by_email(user_email)
+      placement_ids = dfp.get_placements.get_placement_ids_by_name(placements)
+      ad_unit_ids = dfp.get_ad_units.get_ad_unit_ids_by_name(ad_units)
+
+      advertiser_ids = {}
+      for partner in partners:
+        advertiser_name = partner['advertiser_name']
+        if advertiser_name not in advertiser_ids:
+          advertiser_ids[advertiser_name] = (
+            dfp.get_advertisers.get_advertiser_id_by_name(advertiser_name))
+
+      hb_bidder_key_id = get_or_create_dfp_targeting_key('hb_bidder')
+      hb_pb_key_id = get_or_create_dfp_targeting_key('hb_pb')
+
+      HBBidderValueGetter = DFPValueIdGetter('hb_bidder')
+      HBPBValueGetter = DFPValueIdGetter('hb_pb')
+
+    # Create every targeting value the partners need up front, so the
+    # partners only read from the getters while running in parallel.
+    with dfp.instrumentation.phase('targeting_values'):
+      HBBidderValueGetter.get_value_ids(
+        [partner['bidder_code'] for partner in partners])
+      # Format the prices as `iter_line_item_configs` does, so the partners
+      # find every value they look up.
+      HBPBValueGetter.get_value_ids(sorted(set(PriceTable(
+        price for partner in partners for price in partner['prices']).to_strs())))
+
+    def setup(partner):
+      return create_partner_order(user_id, advertiser_ids[partner['advertiser_name']], partner['order_name'],
+                                  placement_ids, ad_unit_ids, sizes, partner['bidder_code'], partner['prices'],
+                                  partner['num_creatives'], partner['currency_code'], partner['line_item_format'],
+                                  hb_bidder_key_id, hb_pb_key_id, HBBidderValueGetter, HBPBValueGetter,
+                                  video_ad_type, redirect_url,
+                                  get_setup_journal(partner['order_name'], resume=resume))
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+      futures = [(partner['bidder_code'], executor.submit(setup, partner))
+        for partner in partners]
+
+    order_ids = {}
+    failures = []
+    for bidder_code, future in futures:
+      try:
+        order_ids[bidder_code] = future.result()
+        logger.info(u'Finished setting up partner "{0}".'.format(bidder_code))
+      except Exception as e:
+        logger.error(u'Failed to set up partner "{0}": {1}'.format(
+          bidder_code, e))
+        failures.append(e)
+
+  dfp.instrumentation.report(metrics, logger)
+
+  if failures:
+    raise failures[0]
+
+  logger.info("""
+
+    Done! Set up {num} partners. Please review your orders, line items, and
+    creatives to make sure they are correct. Then, approve the orders in DFP.
+
+    Happy bidding!
+
+  """.format(num=len(order_ids)))
+
+  return order_ids
+
+def get_partners_from_settings(defaults):
+  """
+  Builds the partner configurations from the `PREBID_BIDDER_CODES` setting.
+
+  Args:
+    defaults (object): the value of each key in `PARTNER_OVERRIDE_KEYS`
+      for partners that do not override it
+  Returns:
+    an array of objects: one per partner, with the keys expected by
+      `setup_partners`
+  """
+  bidder_codes = getattr(settings, 'PREBID_BIDDER_CODES', None)
+  if bidder_codes is None:
+    raise MissingSettingException('PREBID_BIDDER_CODES')
+  elif len(bidder_codes) < 1:
+    raise BadSettingException('The setting "PREBID_BIDDER_CODES" '
+      'must contain at least one bidder code.')
+
+  partners = []
+  for entry in bidder_codes:
+    if not isinstance(entry, dict):
+      entry = {'bidder_code': entry}
+    if 'bidder_code' not in entry:
+      raise BadSettingException('Each partner in "PREBID_BIDDER_CODES" '
+        'must have a "bidder_code".')
+
+    unknown_keys = set(entry) - set(PARTNER_OVERRIDE_KEYS) - {'bidder_code'}
+    if unknown_keys:
+      raise BadSettingException('Unknown keys {0} for partner "{1}" in '
+        '"PREBID_BIDDER_CODES".'.format(sorted(unknown_keys),
+          entry['bidder_code']))
+
+    partner = dict(defaults)
+    partner.update(entry)
+    if 'order_name' not in entry:
+      partner['order_name'] = defaults['order_name'].format(
+        bidder_code=entry['bidder_code'])
+
+    partner['prices'], partner['precision'] = get_prices_from_price_buckets(
+      partner['price_buckets'])
+    partners.append(partner)
+
+  order_names = [partner['order_name'] for partner in partners]
+  if len(set(order_names)) < len(order_names):
+    raise BadSettingException('Each partner needs its own order. Include '
+      '"{bidder_code}" in "DFP_ORDER_NAME" or set "order_name" for each '
+      'partner in "PREBID_BIDDER_CODES".')
+
+  return partners
+
+def main(resume=False):
+  """
+  Validate the settings and ask for confirmation from the user. Then,
+  set up every partner in `PREBID_BIDDER_CODES`.
+
+  Args:
+    resume (bool): whether to resume interrupted setups from their journals
+  """
+
+  user_email = getattr(settings, 'DFP_USER_EMAIL_ADDRESS', None)
+  if user_email is None:
+    raise MissingSettingException('DFP_USER_EMAIL_ADDRESS')
+
+  advertiser_name = getattr(settings, 'DFP_ADVERTISER_NAME', None)
+  if advertiser_name is None:
+    raise MissingSettingException('DFP_ADVERTISER_NAME')
+
+  order_name = getattr(settings, 'DFP_ORDER_NAME', None)
+  if order_name is None:
+    raise MissingSettingException('DFP_ORDER_NAME')
+
+  placements = getattr(settings, 'DFP_TARGETED_PLACEMENT_NAMES', None) or []
+  ad_units = getattr(settings, 'DFP_TARGETED_AD_UNIT_NAMES', None) or []
+  if len(placements) < 1 and len(ad_units) < 1:
+    raise BadSettingException('The setting "DFP_TARGETED_PLACEMENT_NAMES" or "DFP_TARGETED_AD_UNIT_NAMES" '
+      'must contain at least one DFP placement or ad unit.')
+
+  video_ad_type = getattr(settings, 'DFP_VIDEO_AD_TYPE', False)
+  vast_redirect_url = getattr(settings, 'DFP_VAST_REDIRECT_URL', '')
+
+  if video_ad_type is True and len(vast_redirect_url) < 1:
+    raise BadSettingException('When setting "DFP_VIDEO_AD_TYPE" to "True", please also set "DFP_VAST_REDIRECT_URL".')
+
+  sizes = getattr(settings, 'DFP_PLACEMENT_SIZES', None)
+  if sizes is None:
+    raise MissingSettingException('DFP_PLACEMENT_SIZES')
+  elif len(sizes) < 1:
+    raise BadSettingException('The setting "DFP_PLACEMENT_SIZES" '
+      'must contain at least one size object.')
+
+  price_buckets = getattr(settings, 'PREBID_PRICE_BUCKETS', None)
+  if price_buckets is None:
+    raise MissingSettingException('PREBID_PRICE_BUCKETS')
+
+  partners = get_partners_from_settings({
+    'order_name': order_name,
+    'advertiser_name': advertiser_name,
+    'price_buckets': price_buckets,
+    'num_creatives': (
+      getattr(settings, 'DFP_NUM_CREATIVES_PER_LINE_ITEM', None) or
+      len(placements) + len(ad_units)
+    ),
+    'currency_code': getattr(settings, 'DFP_CURRENCY_CODE', 'USD'),
+    'line_item_format': getattr(settings, 'DFP_LINE_ITEM_FORMAT',
+      u'{bidder_code}: HB ${price}'),
+  })
+
+  partner_lines = u'\n'.join(
+    u'      {name_start_format}{bidder_code}{format_end}: {value_start_format}{num} line items '
+    u'in "{order_name}" for "{advertiser}" ({prices_summary}){format_end}'.format(
+      bidder_code=partner['bidder_code'],
+      num=len(partner['prices']),
+      order_name=partner['order_name'],
+      advertiser=partner['advertiser_name'],
+      prices_summary=get_prices_summary_string(partner['prices'],
+        partner['precision']),
+      name_start_format=color.BOLD,
+      format_end=color.END,
+      value_start_format=color.BLUE,
+    )
+    for partner in partners)
+
+  logger.info(
+    u"""
+
+    Going to set up {name_start_format}{num_partners}{format_end} partners with {name_start_format}{num_line_items}{format_end} new line items:
+{partner_lines}
+
+    Line items will have targeting:
+      {name_start_format}placements{format_end} = {value_start_format}{placements}{format_end}
+      {name_start_format}ad units{format_end} = {value_start_format}{ad_units}{format_end}
+
+    """.format(
+      num_partners=len(partners),
+      num_line_items=sum(len(partner['prices']) for partner in partners),
+      partner_lines=partner_lines,
+      placements=placements,
+      ad_units=ad_units,
+      name_start_format=color.BOLD,
+      format_end=color.END,
+      value_start_format=color.BLUE,
+    ))
+
+  ok = input('Is this correct? (y/n)\n')
+
+  if ok != 'y':
+    logger.info('Exiting.')
+    return
+
+  setup_partners(user_email, placements, ad_units, sizes, partners,
+    video_ad_type, vast_redirect_url, resume=resume)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Set up every Prebid partner in PREBID_BIDDER_CODES in DFP.')
+  parser.add_argument('--resume', action='store_true',
+    help='resume each partner\'s interrupted setup from its journal')
+  args = parser.parse_args()
+  main(resume=args.resume)
@@ -1,4 +1,8 @@
 
+import heapq
+from array import array
+
+
 def num_to_micro_amount(num, precision=2):
   """
   Converts a number into micro-amounts (multiplied by 1M), rounded to
@@ -39,17 +43,39 @@ def num_to_str(num, precision=2):
   """
   return '%.{0}f'.format(str(precision)) % num 
 
-def get_prices_array(price_bucket):
+# Prebid's price granularity presets, as range lists. See:
+# https://github.com/prebid/Prebid.js/blob/8fed3d7aaa814e67ca3efc103d7d306cab8c692c/src/cpmBucketManager.js
+PRICE_GRANULARITY_PRESETS = {
+  'low': [
+    {'precision': 2, 'min': 0, 'max': 5, 'increment': 0.5},
+  ],
+  'medium': [
+    {'precision': 2, 'min': 0, 'max': 20, 'increment': 0.1},
+  ],
+  'high': [
+    {'precision': 2, 'min': 0, 'max': 20, 'increment': 0.01},
+  ],
+  'auto': [
+    {'precision': 2, 'min': 0, 'max': 5, 'increment': 0.05},
+    {'precision': 2, 'min': 5, 'max': 10, 'increment': 0.1},
+    {'precision': 2, 'min': 10, 'max': 20, 'increment': 0.5},
+  ],
+  'dense': [
+    {'precision': 2, 'min': 0, 'max': 3, 'increment': 0.01},
+    {'precision': 2, 'min': 3, 'max': 8, 'increment': 0.05},
+    {'precision': 2, 'min': 8, 'max': 20, 'increment': 0.5},
+  ],
+}
+
+def iter_prices(price_bucket):
   """
-  Creates an array of price bucket cutoffs in micro-amounts
-  from a price_bucket configuration.
+  Yields the price bucket cutoffs in micro-amounts, in increasing order,
+  for a single price_bucket range.
 
   Args:
     price_bucket (object): the price bucket configuration
   Returns:
-    an array of integers: every price bucket cutoff from:
-      int(round(price_bucket['min'] * 10**6, precision)) to 
-      int(round(price_bucket['max'] * 10**6, precision))
+    a generator of integers
   """
   start_cpm = price_bucket['min'] if price_bucket['min'] >=0 else 0.00
   end_cpm =  price_bucket['max']
@@ -61,11 +87,75 @@ def get_prices_array(price_bucket):
   increment_micro_amount = num_to_micro_amount(increment, precision)
 
   current_cpm_micro_amount = start_cpm_micro_amount
-  prices = []
   while current_cpm_micro_amount <= end_cpm_micro_amount:
-    prices.append(current_cpm_micro_amount)
+    yield current_cpm_micro_amount
     current_cpm_micro_amount += increment_micro_amount
-    
+
+def get_prices_array(price_bucket):
+  """
+  Creates an array of price bucket cutoffs in micro-amounts
+  from a price_bucket configuration.
+
+  Args:
+    price_bucket (object): the price bucket configuration
+  Returns:
+    an array of integers: every price bucket cutoff from:
+      int(round(price_bucket['min'] * 10**6, precision)) to 
+      int(round(price_bucket['max'] * 10**6, precision))
+  """
+  return list(iter_prices(price_bucket))
+
+def get_price_bucket_ranges(price_buckets):
+  """
+  Normalizes a price bucket setting into a list of ranges. The setting may be
+  the name of a Prebid price granularity preset (e.g. 'dense'), a Prebid
+  custom granularity object (`{'buckets': [...]}`), a list of ranges, or a
+  single range.
+
+  In a list of ranges, "precision" defaults to 2 and "min" defaults to the
+  previous range's "max" (or 0 for the first range), as in Prebid.
+
+  Args:
+    price_buckets (str, object or array)
+  Returns:
+    an array of objects: each with keys "precision", "min", "max" and
+      "increment"
+  Raises:
+    KeyError: if price_buckets is an unknown preset name
+  """
+  if isinstance(price_buckets, str):
+    return [dict(bucket) for bucket in PRICE_GRANULARITY_PRESETS[price_buckets]]
+
+  if isinstance(price_buckets, dict):
+    if 'buckets' not in price_buckets:
+      return [price_buckets]
+    price_buckets = price_buckets['buckets']
+
+  ranges = []
+  previous_max = 0
+  for bucket in price_buckets:
+    bucket_range = {'precision': 2, 'min': previous_max}
+    bucket_range.update(bucket)
+    ranges.append(bucket_range)
+    previous_max = bucket_range.get('max', previous_max)
+  return ranges
+
+def get_prices_array_from_ranges(price_bucket_ranges):
+  """
+  Creates one sorted array of price bucket cutoffs in micro-amounts from
+  several price bucket ranges, merging the ranges in a single pass and
+  dropping cutoffs shared by overlapping ranges.
+
+  Args:
+    price_bucket_ranges (arr): an array of price bucket configurations
+  Returns:
+    an array of integers
+  """
+  prices = []
+  for price in heapq.merge(*[iter_prices(price_bucket)
+    for price_bucket in price_bucket_ranges]):
+    if not prices or prices[-1] != price:
+      prices.append(price)
   return prices
 
 def get_prices_summary_string(prices_array, precision=2):
@@ -94,3 +184,109 @@ def get_prices_summary_string(prices_array, precision=2):
       )
 
   return summary
+
+# The number of micro-amounts in one unit of currency.
+MICRO_AMOUNTS_PER_UNIT = 10 ** 6
+
+class PriceTable(object):
+  """
+  A column of price bucket cutoffs in micro-amounts, stored compactly in an
+  `array('q')`, that converts every price to a string or line item name at
+  once.
+
+  Conversions use integer arithmetic only, so prices too large or precise
+  to survive a round trip through a float (as in `micro_amount_to_num`)
+  still format exactly. The strings for each precision are built once and
+  shared by every bidder's names.
+
+  Args:
+    micro_amounts (iterable): the prices in micro-amounts
+  """
+
+  def __init__(self, micro_amounts):
+    self.micro_amounts = array('q', micro_amounts)
+    self._strs = {}
+
+  @classmethod
+  def from_ranges(cls, price_bucket_ranges):
+    """
+    Returns a PriceTable of the cutoffs of several price bucket ranges, like
+    `get_prices_array_from_ranges`.
+    """
+    return cls(get_prices_array_from_ranges(price_bucket_ranges))
+
+  def __len__(self):
+    return len(self.micro_amounts)
+
+  def __iter__(self):
+    return iter(self.micro_amounts)
+
+  def __getitem__(self, index):
+    return self.micro_amounts[index]
+
+  def to_strs(self, precision=2):
+    """
+    Returns every price as a string with `precision` decimal places, like
+    `num_to_str(micro_amount_to_num(price), precision)`. Prices finer than
+    the precision are rounded half to even.
+
+    Args:
+      precision (int)
+    Returns:
+      an array of strings
+    """
+    if precision not in self._strs:
+      self._strs[precision] = self._format(precision)
+    return self._strs[precision]
+
+  def to_names(self, line_item_format, bidder_code, precision=2):
+    """
+    Returns a line item name for every price, e.g.
+    `table.to_names(u'{bidder_code}: HB ${price}', 'appnexus')`.
+
+    Args:
+      line_item_format (str): the format of the names, with `{bidder_code}`
+        and `{price}` fields
+      bidder_code (str)
+      precision (int)
+    Returns:
+      an array of strings
+    """
+    format_name = line_item_format.format
+    return [format_name(bidder_code=bidder_code, price=price_str)
+            for price_str in self.to_strs(precision)]
+
+  def _format(self, precision):
+    # Scale the micro-amounts to whole units of the last decimal place.
+    if precision >= 6:
+      scale = 10 ** (precision - 6)
+      units = [micro_amount * scale for micro_amount in self.micro_amounts]
+    else:
+      divisor = 10 ** (6 - precision)
+      if any(micro_amount % divisor for micro_amount in self.micro_amounts):
+        units = [round_half_even(micro_amount, divisor)
+                 for micro_amount in self.micro_amounts]
+      else:
+        units = [micro_amount // divisor for micro_amount in self.micro_amounts]
+
+    if precision == 0:
+      return ['%d' % unit for unit in units]
+    base = 10 ** precision
+    return [('-' if unit < 0 else '') + '%d.%0*d' % (abs(unit) // base,
+              precision, abs(unit) % base)
+            for unit in units]
+
+def round_half_even(num, divisor):
+  """
+  Divides integers, rounding half to even.
+
+  Args:
+    num (int)
+    divisor (int): a positive integer
+  Returns:
+    an integer
+  """
+  quotient, remainder = divmod(num, divisor)
+  if remainder * 2 > divisor or (remainder * 2 == divisor and quotient % 2):
+    quotient += 1
+  return quotient
@@ -0,0 +1,184 @@
+
+import json
+import os
+import re
+import threading
+
+import settings
+
+
+class SetupJournal(object):
+  """
+  A checkpoint file recording what a partner setup has created so far, so an
+  interrupted setup can be resumed without redoing or duplicating work.
+
+  Each step appends one JSON record per line: an order's ID, the creative
+  IDs, the names and IDs of each batch of created line items, each batch of
+  created line item <> creative associations, and a final record once the
+  setup is done. Appending keeps saving cheap however many batches there
+  are, and a record cut short by a crash is ignored when resuming.
+  """
+
+  def __init__(self, path, resume=False):
+    """
+    Args:
+      path (str): the path of the journal file
+      resume (bool): whether to load the existing journal. Otherwise the
+        journal starts empty.
+    """
+    self.path = path
+    self.resuming = resume
+    self._lock = threading.Lock()
+    # A fresh journal replaces any old file on its first record.
+    self._started = False
+    self.state = {
+      'orders': {},
+      'creative_ids': [],
+      'line_items': {},
+      'licas': [],
+      'done': False,
+    }
+    if resume and os.path.exists(path):
+      self._load()
+      self._started = True
+
+  @classmethod
+  def for_order(cls, order_name, resume=False):
+    """
+    Returns the journal for a partner setup with the given order name, saved
+    in the DFP_SETUP_JOURNAL_DIR setting's directory.
+    """
+    journal_dir = getattr(settings, 'DFP_SETUP_JOURNAL_DIR',
+      os.path.join(settings.ROOT_DIR, 'journals'))
+    file_name = re.sub(r'[^\w.-]+', '_', order_name) + '.jsonl'
+    return cls(os.path.join(journal_dir, file_name), resume=resume)
+
+  def _load(self):
+    with open(self.path, 'r') as journal_file:
+      for line in journal_file:
+        try:
+          record = json.loads(line)
+        except ValueError:
+          # The last record was cut short by a crash.
+          break
+        self._apply(record)
+
+  def _apply(self, record):
+    if 'order' in record:
+      self.state['orders'][record['order']] = record['id']
+    if 'creative_ids' in record:
+      self.state['creative_ids'] = list(record['creative_ids'])
+    for name, line_item_id in record.get('line_items', []):
+      self.state['line_items'][name] = line_item_id
+    self.state['licas'].extend(record.get('licas', []))
+    if record.get('done'):
+      self.state['done'] = True
+
+  def _append(self, record):
+    self._apply(record)
+    journal_dir = os.path.dirname(self.path)
+    if journal_dir and not os.path.isdir(journal_dir):
+      os.makedirs(journal_dir)
+    with open(self.path, 'a' if self._started else 'w') as journal_file:
+      journal_file.write(json.dumps(record) + '\n')
+    self._started = True
+
+  def get_order_id(self, order_name):
+    return self.state['orders'].get(order_name)
+
+  def record_order(self, order_name, order_id):
+    with self._lock:
+      self._append({'order': order_name, 'id': order_id})
+
+  def get_creative_ids(self):
+    return list(self.state['creative_ids'])
+
+  def record_creatives(self, creative_ids):
+    with self._lock:
+      self._append({'creative_ids': list(creative_ids)})
+
+  def get_line_item_ids_by_name(self):
+    return dict(self.state['line_items'])
+
+  def record_line_items(self, line_items):
+    """
+    Args:
+      line_items (arr): an array of created DFP line items
+    """
+    with self._lock:
+      self._append({'line_items': [[line_item['name'], line_item['id']]
+        for line_item in line_items]})
+
+  def get_licas(self):
+    """
+    Returns:
+      a set of (line item ID, creative ID) pairs
+    """
+    return set(tuple(lica) for lica in self.state['licas'])
+
+  def record_licas(self, licas):
+    """
+    Args:
+      licas (arr): an array of created DFP line item creative associations
+    """
+    with self._lock:
+      self._append({'licas': [[lica['lineItemId'], lica['creativeId']]
+        for lica in licas]})
+
+  def is_done(self):
+    return self.state['done']
+
+  def mark_done(self):
+    with self._lock:
+      self._append({'done': True})
+
+def get_setup_journal(order_name, resume=False):
+  """
+  Returns the journal for a partner setup: its SetupJournal when resuming or
+  when the DFP_SETUP_JOURNAL setting is enabled, and otherwise a
+  NullSetupJournal, so a setup leaves no journal file behind.
+
+  Args:
+    order_name (str): the name of the setup's order
+    resume (bool): whether the setup is resumed
+  """
+  if resume or getattr(settings, 'DFP_SETUP_JOURNAL', False):
+    return SetupJournal.for_order(order_name, resume=resume)
+  return NullSetupJournal()
+
+class NullSetupJournal(object):
+  """
+  A journal that records nothing, for setups that are not checkpointed.
+  """
+
+  resuming = False
+
+  def get_order_id(self, order_name):
+    return None
+
+  def record_order(self, order_name, order_id):
+    pass
+
+  def get_creative_ids(self):
+    return []
+
+  def record_creatives(self, creative_ids):
+    pass
+
+  def get_line_item_ids_by_name(self):
+    return {}
+
+  def record_line_items(self, line_items):
+    pass
+
+  def get_licas(self):
+    return set()
+
+  def record_licas(self, licas):
+    pass
+
+  def is_done(self):
+    return False
+
+  def mark_done(self):
+    pass
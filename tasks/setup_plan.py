@@ -0,0 +1,120 @@
+
+import json
+import os
+
+from dfp.client import get_network_code
+from dfp.lookup_cache import get_lookup_cache
+
+
+# The sections of a plan holding the objects to create, in creation order.
+PLAN_SECTIONS = ['orders', 'creatives', 'line_items', 'licas']
+
+def ref(kind, name):
+  """
+  Returns a placeholder for an ID that is not known until the plan is
+  applied, e.g. `ref('order', 0)` for the ID of the plan's first order.
+  """
+  return {'$ref': u'{0}:{1}'.format(kind, name)}
+
+def is_ref(value):
+  return isinstance(value, dict) and len(value) == 1 and '$ref' in value
+
+def parse_ref(value):
+  """
+  Returns:
+    a tuple: the kind and name of a placeholder
+  """
+  kind, _, name = value['$ref'].partition(':')
+  return kind, name
+
+def find_refs(obj):
+  """
+  Returns the set of placeholders in an object, as "kind:name" strings.
+  """
+  refs = set()
+  pending = [obj]
+  while pending:
+    value = pending.pop()
+    if is_ref(value):
+      refs.add(value['$ref'])
+    elif isinstance(value, dict):
+      pending.extend(value.values())
+    elif isinstance(value, (list, tuple)):
+      pending.extend(value)
+  return refs
+
+def resolve(obj, ids):
+  """
+  Returns a copy of an object with each placeholder replaced by its ID.
+
+  Args:
+    obj: the object
+    ids (object): a map of "kind:name" strings to DFP IDs
+  """
+  if is_ref(obj):
+    try:
+      return ids[obj['$ref']]
+    except KeyError:
+      raise ValueError(u'The plan has no ID for {0}.'.format(obj['$ref']))
+  if isinstance(obj, dict):
+    return dict((key, resolve(value, ids)) for key, value in obj.items())
+  if isinstance(obj, (list, tuple)):
+    return [resolve(value, ids) for value in obj]
+  return obj
+
+def get_id_or_ref(object_type, name):
+  """
+  Returns the ID of a DFP object from the lookup cache, without calling
+  DFP or loading credentials, or a placeholder if it is not cached.
+  """
+  lookup_cache = get_lookup_cache()
+  if lookup_cache is not None:
+    value = lookup_cache.get(get_network_code(), object_type, name)
+    if value is not None:
+      return value
+  return ref(object_type, name)
+
+class PlanValueIdGetter(object):
+  """
+  Stands in for a DFPValueIdGetter while planning: returns a placeholder for
+  every targeting value instead of looking it up or creating it.
+  """
+
+  def __init__(self, key_name):
+    self.key_name = key_name
+
+  def get_value_id(self, value_name):
+    return ref('targeting_value', u'{0}:{1}'.format(self.key_name, value_name))
+
+  def get_value_ids(self, value_names):
+    return dict((name, self.get_value_id(name)) for name in value_names)
+
+def get_plan_summary(plan):
+  """
+  Returns the number of objects in each section of a plan, and the size of
+  each section in bytes of JSON.
+  """
+  return dict((section, {
+    'count': len(plan[section]),
+    'bytes': len(json.dumps(plan[section]).encode('utf-8')),
+  }) for section in PLAN_SECTIONS)
+
+def write_plan(plan, path):
+  """
+  Writes a plan to a JSON file, with its summary.
+
+  Returns:
+    the plan's summary
+  """
+  summary = get_plan_summary(plan)
+  plan = dict(plan, summary=summary)
+  plan_dir = os.path.dirname(path)
+  if plan_dir and not os.path.isdir(plan_dir):
+    os.makedirs(plan_dir)
+  with open(path, 'w') as plan_file:
+    json.dump(plan, plan_file)
+  return summary
+
+def load_plan(path):
+  with open(path, 'r') as plan_file:
+    return json.load(plan_file)
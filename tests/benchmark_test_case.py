@@ -0,0 +1,28 @@
+from unittest import TestCase
+
+
+class BenchmarkTestCase(TestCase):
+  """
+  Checks shared by the tests of the benchmarks in `benchmarks/`, each of
+  which runs a few cases and returns its measurements.
+  """
+
+  def assert_measured(self, results, metrics):
+    """
+    Asserts that every case of a benchmark run measured each metric.
+
+    Args:
+      results (arr or object): the cases, or a map of case names to cases
+      metrics (arr): the names of the metrics each case should measure
+    """
+    cases = results.values() if isinstance(results, dict) else results
+    for case in cases:
+      for metric in metrics:
+        self.assertGreater(case[metric], 0, metric)
+
+  def assert_formatted(self, table, labels):
+    """
+    Asserts that a benchmark's results table shows each label.
+    """
+    for label in labels:
+      self.assertIn(label, table)
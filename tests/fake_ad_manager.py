@@ -0,0 +1,372 @@
+
+import copy
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from googleads import errors
+from mock import patch
+
+import settings
+
+
+# The objects each service stores, and the collection name used in the
+# service's method names, e.g. `getCompaniesByStatement`.
+SERVICES = {
+  'UserService': ('user', 'Users'),
+  'CompanyService': ('company', 'Companies'),
+  'PlacementService': ('placement', 'Placements'),
+  'InventoryService': ('ad_unit', 'AdUnits'),
+  'OrderService': ('order', 'Orders'),
+  'CreativeService': ('creative', 'Creatives'),
+  'LineItemService': ('line_item', 'LineItems'),
+  'LineItemCreativeAssociationService': ('lica', 'LineItemCreativeAssociations'),
+}
+
+# CustomTargetingService stores both keys and values.
+CUSTOM_TARGETING_COLLECTIONS = {
+  'CustomTargetingKeys': 'targeting_key',
+  'CustomTargetingValues': 'targeting_value',
+}
+
+# The most results the API returns in one page, whatever the LIMIT.
+MAX_PAGE_SIZE = 500
+
+# DFP's limit on the number of line items in one order.
+MAX_LINE_ITEMS_PER_ORDER = 450
+
+STATEMENT_PATTERN = re.compile(
+  r'^\s*(?:WHERE\s+)?(.*?)\s*(?:LIMIT\s+(\d+))?\s*(?:OFFSET\s+(\d+))?\s*$',
+  re.IGNORECASE | re.DOTALL)
+CONDITION_PATTERN = re.compile(
+  r'^\s*(\w+)\s*(=|IN|LIKE)\s*(.+?)\s*$', re.IGNORECASE)
+
+def server_fault(error_string, message=None):
+  """
+  Returns a googleads server fault like the ones raised by the API.
+
+  Args:
+    error_string (str): the DFP error, e.g. "QuotaError.EXCEEDED_QUOTA"
+  """
+  error_type, _, reason = error_string.partition('.')
+  return errors.GoogleAdsServerFault(None,
+    errors=[{'errorString': error_string, 'reason': reason,
+      'ApiError.Type': error_type}],
+    message=message or u'[{0} @ ]'.format(error_string))
+
+def parse_statement(statement):
+  """
+  Parses the subset of PQL the tool sends: conditions joined by AND, each
+  comparing a field to a literal, a bind variable, or a list of them with
+  IN, or matching a pattern with LIKE, followed by LIMIT and OFFSET.
+
+  Args:
+    statement (obj): a statement, as returned by `ToStatement()`
+  Returns:
+    a tuple: (an array of (field, allowed values) tuples, limit, offset)
+  """
+  query = statement.get('query') or ''
+  bind_values = {}
+  for value in statement.get('values') or []:
+    bind_values[value['key']] = value['value']['value']
+
+  where, limit, offset = STATEMENT_PATTERN.match(query).groups()
+
+  conditions = []
+  if where:
+    for condition in re.split(r'\s+AND\s+', where, flags=re.IGNORECASE):
+      match = CONDITION_PATTERN.match(condition)
+      if match is None:
+        raise server_fault('PublisherQueryLanguageSyntaxError.UNPARSABLE')
+      field, operator, operand = match.groups()
+      if operator.upper() == 'LIKE':
+        conditions.append((field.lower(),
+          LikePattern(parse_operand(operand, bind_values))))
+        continue
+      if operator.upper() == 'IN':
+        operands = operand.strip('()').split(',')
+      else:
+        operands = [operand]
+      conditions.append((field.lower(), set(
+        parse_operand(operand.strip(), bind_values) for operand in operands)))
+
+  return (conditions, int(limit) if limit else MAX_PAGE_SIZE,
+    int(offset) if offset else 0)
+
+class LikePattern(object):
+  """
+  The values a PQL `LIKE` pattern allows, where `%` matches any text.
+  """
+
+  def __init__(self, pattern):
+    self._regex = re.compile('^{0}$'.format(
+      '.*'.join(re.escape(part) for part in pattern.split('%'))), re.DOTALL)
+
+  def __contains__(self, value):
+    return isinstance(value, str) and self._regex.match(value) is not None
+
+def parse_operand(operand, bind_values):
+  if operand.startswith(':'):
+    return bind_values[operand[1:]]
+  if operand.startswith("'"):
+    return operand.strip("'")
+  return int(operand)
+
+class FakeNetwork(object):
+  """
+  An in-memory Ad Manager network, with the services used by the tool.
+
+  Objects are stored as dictionaries. Statement queries are filtered and
+  paged like the API does, so the tool's paging loops run unchanged.
+
+  Args:
+    network_code (str): the network code of the fake client
+    latency (float): seconds each service call takes
+    latency_per_object (float): extra seconds per object a create call sends
+    error_rate (float): the chance of each call failing with a server fault
+    seed (int): seeds the random error injection
+  """
+
+  def __init__(self, network_code='12345678', latency=0,
+               latency_per_object=0, error_rate=0, seed=None):
+    self.network_code = network_code
+    self.latency = latency
+    self.latency_per_object = latency_per_object
+    self.error_rate = error_rate
+    self.calls = Counter()
+    self._random = random.Random(seed)
+    self._lock = threading.Lock()
+    self._next_id = 1000000
+    self._objects = {}
+    self._injected_errors = {}
+
+  def add(self, object_type, **fields):
+    """
+    Adds an object to the network, e.g.
+    `network.add('placement', name='My Placement')`.
+
+    Returns:
+      the stored object
+    """
+    with self._lock:
+      return self._add(object_type, fields)
+
+  def _add(self, object_type, fields):
+    obj = dict(fields)
+    if 'id' not in obj:
+      self._next_id += 1
+      obj['id'] = self._next_id
+    self._objects.setdefault(object_type, {})[obj['id']] = obj
+    return copy.deepcopy(obj)
+
+  def get_all(self, object_type):
+    """
+    Returns every stored object of a type, in creation order.
+    """
+    with self._lock:
+      return [copy.deepcopy(obj)
+        for obj in self._objects.get(object_type, {}).values()]
+
+  def inject_error(self, method_name, error='ServerError.SERVER_ERROR',
+                   times=1):
+    """
+    Makes the next `times` calls to a service method fail.
+
+    Args:
+      method_name (str): e.g. "createLineItems"
+      error (str or Exception): a DFP error string, or the exception to raise
+    """
+    if not isinstance(error, Exception):
+      error = server_fault(error)
+    with self._lock:
+      self._injected_errors.setdefault(method_name, []).extend([error] * times)
+
+  def call(self, method_name, handler, *args):
+    """
+    Runs a service method, simulating latency and failures.
+    """
+    num_objects = len(args[0]) if args and isinstance(args[0], list) else 0
+    delay = self.latency + self.latency_per_object * num_objects
+    if delay:
+      time.sleep(delay)
+
+    with self._lock:
+      self.calls[method_name] += 1
+      injected = self._injected_errors.get(method_name)
+      if injected:
+        raise injected.pop(0)
+      if self.error_rate and self._random.random() < self.error_rate:
+        raise server_fault('ServerError.SERVER_ERROR')
+      return handler(*args)
+
+  def get_by_statement(self, object_type, statement):
+    conditions, limit, offset = parse_statement(statement)
+    matches = [obj for obj in self._objects.get(object_type, {}).values()
+      if all(self._field(obj, field) in allowed
+        for field, allowed in conditions)]
+
+    response = {'totalResultSetSize': len(matches), 'startIndex': offset}
+    page = matches[offset:offset + min(limit, MAX_PAGE_SIZE)]
+    if page:
+      response['results'] = copy.deepcopy(page)
+    return response
+
+  def _field(self, obj, field):
+    for key, value in obj.items():
+      if key.lower() == field:
+        return value
+    return None
+
+  def create(self, object_type, objects):
+    validate = getattr(self, '_validate_{0}'.format(object_type), None)
+    if validate is not None:
+      validate(objects)
+    created = []
+    for obj in objects:
+      fields = copy.deepcopy(dict(obj))
+      fields.setdefault('status', self._initial_status(object_type))
+      created.append(self._add(object_type, fields))
+    return created
+
+  def update(self, object_type, objects):
+    stored = self._objects.get(object_type, {})
+    for obj in objects:
+      if obj['id'] not in stored:
+        raise server_fault('EntityNotFoundError.ENTITY_NOT_FOUND')
+    updated = []
+    for obj in objects:
+      stored[obj['id']] = copy.deepcopy(dict(obj))
+      updated.append(copy.deepcopy(stored[obj['id']]))
+    return updated
+
+  def _initial_status(self, object_type):
+    if object_type in ('order', 'line_item'):
+      return 'DRAFT'
+    return 'ACTIVE'
+
+  def _validate_order(self, orders):
+    names = set(obj['name'] for obj in self._objects.get('order', {}).values())
+    for order in orders:
+      if order['name'] in names:
+        raise server_fault('UniqueError.NOT_UNIQUE')
+      names.add(order['name'])
+
+  def _validate_line_item(self, line_items):
+    counts = Counter(obj['orderId']
+      for obj in self._objects.get('line_item', {}).values())
+    for line_item in line_items:
+      if line_item['orderId'] not in self._objects.get('order', {}):
+        raise server_fault('EntityNotFoundError.ENTITY_NOT_FOUND')
+      counts[line_item['orderId']] += 1
+      if counts[line_item['orderId']] > MAX_LINE_ITEMS_PER_ORDER:
+        raise server_fault('EntityLimitReachedError.LINE_ITEMS_LIMIT_REACHED')
+
+  def _validate_lica(self, licas):
+    pairs = set((obj['lineItemId'], obj['creativeId'])
+      for obj in self._objects.get('lica', {}).values())
+    for lica in licas:
+      if (lica['lineItemId'], lica['creativeId']) in pairs:
+        raise server_fault('CommonError.ALREADY_EXISTS')
+      pairs.add((lica['lineItemId'], lica['creativeId']))
+
+  def perform_order_action(self, action, statement):
+    statuses = {
+      'ArchiveOrders': 'ARCHIVED',
+      'ApproveOrders': 'APPROVED',
+    }
+    conditions, _, _ = parse_statement(statement)
+    num_changes = 0
+    for obj in self._objects.get('order', {}).values():
+      if all(self._field(obj, field) in allowed
+        for field, allowed in conditions):
+        obj['status'] = statuses[action['xsi_type']]
+        num_changes += 1
+    return {'numChanges': num_changes}
+
+class FakeService(object):
+  """
+  A stand-in for a googleads SOAP service proxy.
+  """
+
+  def __init__(self, network, service_name):
+    if service_name not in SERVICES and service_name != 'CustomTargetingService':
+      raise ValueError('FakeNetwork has no {0}.'.format(service_name))
+    self._network = network
+    self._service_name = service_name
+
+  def _object_type(self, collection):
+    if self._service_name == 'CustomTargetingService':
+      return CUSTOM_TARGETING_COLLECTIONS.get(collection)
+    object_type, service_collection = SERVICES[self._service_name]
+    if collection == service_collection:
+      return object_type
+    return None
+
+  def __getattr__(self, method_name):
+    handler = None
+    match = re.match(r'^get(\w+)ByStatement$', method_name)
+    if match and self._object_type(match.group(1)):
+      object_type = self._object_type(match.group(1))
+      handler = lambda statement: self._network.get_by_statement(
+        object_type, statement)
+    match = re.match(r'^create(\w+)$', method_name)
+    if match and self._object_type(match.group(1)):
+      object_type = self._object_type(match.group(1))
+      handler = lambda objects: self._network.create(object_type, objects)
+    match = re.match(r'^update(\w+)$', method_name)
+    if match and self._object_type(match.group(1)):
+      object_type = self._object_type(match.group(1))
+      handler = lambda objects: self._network.update(object_type, objects)
+    if method_name == 'performOrderAction' and self._service_name == 'OrderService':
+      handler = self._network.perform_order_action
+    if handler is None:
+      raise AttributeError('{0} has no method {1}.'.format(
+        self._service_name, method_name))
+    return lambda *args: self._network.call(method_name, handler, *args)
+
+class FakeAdManagerClient(object):
+  """
+  A stand-in for `googleads.ad_manager.AdManagerClient`.
+  """
+
+  def __init__(self, network):
+    self.network = network
+    self.network_code = network.network_code
+
+  def GetService(self, service_name, version=None):
+    return FakeService(self.network, service_name)
+
+@contextmanager
+def fake_ad_manager(network=None):
+  """
+  Routes every DFP call made inside the block to a fake network.
+
+  Args:
+    network (FakeNetwork): defaults to an empty network with no latency
+  Yields:
+    the FakeNetwork
+  """
+  network = network or FakeNetwork()
+  with patch('dfp.client._load_client',
+    return_value=FakeAdManagerClient(network)), patch.dict(
+    'dfp.client._network_codes',
+    {settings.GOOGLEADS_YAML_FILE: network.network_code}):
+    yield network
+
+def build_network(user_email, advertiser_name, placements=(), ad_units=(),
+                  **kwargs):
+  """
+  Returns a FakeNetwork with the user, advertiser, placements and ad units
+  a partner setup expects to find.
+  """
+  network = FakeNetwork(**kwargs)
+  network.add('user', email=user_email, name=user_email)
+  network.add('company', name=advertiser_name, type='ADVERTISER')
+  for placement in placements:
+    network.add('placement', name=placement)
+  for ad_unit in ad_units:
+    network.add('ad_unit', name=ad_unit)
+  return network
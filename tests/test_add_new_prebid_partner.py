@@ -1,15 +1,22 @@
 
+import os
+from concurrent.futures import ThreadPoolExecutor
 from unittest import TestCase
 
 from mock import MagicMock, patch
 
 import settings
 import tasks.add_new_prebid_partner
-from dfp.exceptions import BadSettingException, MissingSettingException
+from dfp.exceptions import (
+  BadSettingException,
+  DFPObjectNotFound,
+  MissingSettingException,
+)
 from tasks.add_new_prebid_partner import DFPValueIdGetter
 from tasks.price_utils import (
   get_prices_array,
 )
+from tasks.setup_journal import SetupJournal
 
 email = 'fakeuser@example.com'
 advertiser = 'My Advertiser'
@@ -155,6 +162,40 @@ class AddNewPrebidPartnerTests(TestCase):
     with self.assertRaises(BadSettingException):
       tasks.add_new_prebid_partner.main()
 
+  def test_price_bucket_validity_unknown_preset(self, mock_dfp_client):
+    """
+    It throws an exception for an unknown price granularity preset.
+    """
+    settings.PREBID_PRICE_BUCKETS = 'extra-dense'
+    with self.assertRaises(BadSettingException):
+      tasks.add_new_prebid_partner.main()
+
+  def test_price_bucket_validity_bad_range(self, mock_dfp_client):
+    """
+    It throws an exception if one of several ranges is malformed.
+    """
+    settings.PREBID_PRICE_BUCKETS = [
+      {'max': 5, 'increment': 0.05},
+      {'max': '$10', 'increment': 0.10}, # bad value type
+    ]
+    with self.assertRaises(BadSettingException):
+      tasks.add_new_prebid_partner.main()
+
+  @patch('tasks.add_new_prebid_partner.setup_partner')
+  @patch('tasks.add_new_prebid_partner.input', return_value='y')
+  def test_price_bucket_preset(self, mock_input, mock_setup_partners,
+    mock_dfp_client):
+    """
+    It creates prices from a Prebid price granularity preset.
+    """
+    settings.PREBID_PRICE_BUCKETS = 'dense'
+    tasks.add_new_prebid_partner.main()
+    args, kwargs = mock_setup_partners.call_args
+    prices = args[7]
+    self.assertEqual(len(prices), 425)
+    self.assertEqual(prices[:2], [0, 10000])
+    self.assertEqual(prices[-1], 20000000)
+
   @patch('tasks.add_new_prebid_partner.setup_partner')
   @patch('tasks.add_new_prebid_partner.input', return_value='n')
   def test_user_confirmation_rejected(self, mock_input, 
@@ -243,7 +284,7 @@ class AddNewPrebidPartnerTests(TestCase):
     num_creatives = args[8]
     self.assertEqual(num_creatives, len(ad_units))
 
-  @patch('tasks.add_new_prebid_partner.create_line_item_configs')
+  @patch('tasks.add_new_prebid_partner.iter_line_item_configs')
   @patch('tasks.add_new_prebid_partner.DFPValueIdGetter')
   @patch('tasks.add_new_prebid_partner.get_or_create_dfp_targeting_key')
   @patch('dfp.associate_line_items_and_creatives')
@@ -287,6 +328,172 @@ class AddNewPrebidPartnerTests(TestCase):
     mock_create_line_items.create_line_items.assert_called_once()
     mock_licas.make_licas.assert_called_once()
 
+  @patch('settings.DFP_MAX_LINE_ITEMS_PER_ORDER', 80, create=True)
+  @patch('tasks.add_new_prebid_partner.iter_line_item_configs')
+  @patch('dfp.associate_line_items_and_creatives')
+  @patch('dfp.create_creatives')
+  @patch('dfp.create_line_items')
+  @patch('dfp.create_orders')
+  def test_create_partner_order_sharded(self, mock_create_orders,
+    mock_create_line_items, mock_create_creatives, mock_licas,
+    mock_create_line_item_configs, mock_dfp_client):
+    """
+    It splits line items across orders when there are too many prices.
+    """
+    order_ids_by_name = {
+      order + ' (1/3)': 111,
+      order + ' (2/3)': 222,
+      order + ' (3/3)': 333,
+    }
+    mock_create_orders.create_order = MagicMock(
+      side_effect=lambda name, advertiser_id, user_id: order_ids_by_name[name])
+    mock_create_line_item_configs.side_effect = (
+      lambda shard_prices, order_id, *args: [
+        {'orderId': order_id, 'price': price} for price in shard_prices])
+
+    order_ids = tasks.add_new_prebid_partner.create_partner_order(
+      14523, 246810, order, [1234567], [], sizes, bidder_code, prices, 2,
+      'USD', u'{bidder_code}: HB ${price}', 999999, 888888, MagicMock(),
+      MagicMock())
+
+    self.assertEqual(order_ids, [111, 222, 333])
+    self.assertEqual(mock_create_orders.create_order.call_count, 3)
+    mock_create_orders.create_order.assert_any_call(order + ' (2/3)', 246810,
+      14523)
+
+    # Prices are routed to the order for their shard.
+    line_items_config = list(
+      mock_create_line_items.create_line_items.call_args[0][0])
+    self.assertEqual(len(line_items_config), len(prices))
+    self.assertEqual(line_items_config[0], {'orderId': 111, 'price': prices[0]})
+    self.assertEqual(line_items_config[80], {'orderId': 222, 'price': prices[80]})
+    self.assertEqual(line_items_config[-1], {'orderId': 333, 'price': prices[-1]})
+
+    # Creatives are shared by every shard.
+    mock_create_creatives.create_creatives.assert_called_once()
+    mock_licas.make_licas.assert_called_once()
+
+  @patch('settings.DFP_MAX_CONCURRENT_REQUESTS', 2, create=True)
+  @patch('settings.DFP_MAX_LINE_ITEMS_PER_ORDER', 10, create=True)
+  @patch('tasks.add_new_prebid_partner.ThreadPoolExecutor',
+    wraps=ThreadPoolExecutor)
+  @patch('tasks.add_new_prebid_partner.iter_line_item_configs')
+  @patch('dfp.associate_line_items_and_creatives')
+  @patch('dfp.create_creatives')
+  @patch('dfp.create_line_items')
+  @patch('dfp.create_orders')
+  def test_create_partner_order_shards_concurrency(self, mock_create_orders,
+    mock_create_line_items, mock_create_creatives, mock_licas,
+    mock_create_line_item_configs, mock_executor, mock_dfp_client):
+    """
+    The orders and creatives are created by no more threads than
+    DFP_MAX_CONCURRENT_REQUESTS, however many shards there are.
+    """
+    mock_create_orders.create_order = MagicMock(return_value=111)
+    mock_create_line_item_configs.return_value = []
+
+    order_ids = tasks.add_new_prebid_partner.create_partner_order(
+      14523, 246810, order, [1234567], [], sizes, bidder_code, prices, 2,
+      'USD', u'{bidder_code}: HB ${price}', 999999, 888888, MagicMock(),
+      MagicMock())
+
+    self.assertEqual(len(order_ids), 21)
+    mock_executor.assert_called_once_with(max_workers=2)
+
+  @patch('tasks.add_new_prebid_partner.iter_line_item_configs')
+  @patch('dfp.get_licas')
+  @patch('dfp.get_line_items')
+  @patch('dfp.get_orders')
+  @patch('dfp.associate_line_items_and_creatives')
+  @patch('dfp.create_creatives')
+  @patch('dfp.create_line_items')
+  @patch('dfp.create_orders')
+  def test_create_partner_order_resume(self, mock_create_orders,
+    mock_create_line_items, mock_create_creatives, mock_licas,
+    mock_get_orders, mock_get_line_items, mock_get_licas,
+    mock_create_line_item_configs, mock_dfp_client):
+    """
+    When resuming, it reuses what the journal and DFP already have and only
+    creates the remaining line items and associations.
+    """
+    journal = SetupJournal(os.path.join('unused', 'journal.jsonl'),
+      resume=True)
+    journal.state.update({
+      'orders': {order: 1357913},
+      'creative_ids': [11, 22],
+      'line_items': {'li-0': 100},
+      'licas': [[100, 11]],
+    })
+    journal._append = MagicMock(side_effect=journal._apply)
+
+    mock_create_line_item_configs.return_value = [
+      {'name': 'li-0'}, {'name': 'li-1'}, {'name': 'li-2'}]
+    # The line item created after the journal was last saved.
+    mock_get_line_items.get_line_items_for_orders = MagicMock(
+      return_value=[{'id': 101, 'name': 'li-1'}])
+    mock_get_licas.get_licas_for_line_items = MagicMock(
+      return_value=[{'lineItemId': 100, 'creativeId': 22}])
+    # Line item configs are streamed, so record the ones sent.
+    sent_line_items_config = []
+    def create_line_items(line_items_config, **kwargs):
+      sent_line_items_config.extend(line_items_config)
+      return [102]
+    mock_create_line_items.create_line_items = MagicMock(
+      side_effect=create_line_items)
+
+    order_ids = tasks.add_new_prebid_partner.create_partner_order(
+      14523, 246810, order, [1234567], [], sizes, bidder_code, prices[:3], 2,
+      'USD', u'{bidder_code}: HB ${price}', 999999, 888888, MagicMock(),
+      MagicMock(), journal=journal)
+
+    self.assertEqual(order_ids, [1357913])
+    mock_get_orders.get_order_by_name.assert_not_called()
+    mock_create_orders.create_order.assert_not_called()
+    mock_create_creatives.create_creatives.assert_not_called()
+    mock_get_line_items.get_line_items_for_orders.assert_called_once_with(
+      [1357913])
+    self.assertEqual(sent_line_items_config, [{'name': 'li-2'}])
+    mock_licas.make_licas.assert_called_once_with([100, 101, 102], [11, 22],
+      size_overrides=sizes, existing_licas={(100, 11), (100, 22)},
+      on_batch_created=journal.record_licas)
+    self.assertTrue(journal.state['done'])
+
+  @patch('dfp.create_line_items')
+  @patch('dfp.create_orders')
+  def test_create_partner_order_resume_done(self, mock_create_orders,
+    mock_create_line_items, mock_dfp_client):
+    """
+    When resuming a setup that already finished, it does nothing.
+    """
+    journal = SetupJournal(os.path.join('unused', 'journal.jsonl'),
+      resume=True)
+    journal.state.update({'orders': {order: 1357913}, 'done': True})
+
+    order_ids = tasks.add_new_prebid_partner.create_partner_order(
+      14523, 246810, order, [1234567], [], sizes, bidder_code, prices[:3], 2,
+      'USD', u'{bidder_code}: HB ${price}', 999999, 888888, MagicMock(),
+      MagicMock(), journal=journal)
+
+    self.assertEqual(order_ids, [1357913])
+    mock_create_orders.create_order.assert_not_called()
+    mock_create_line_items.create_line_items.assert_not_called()
+
+  def test_get_order_shard_names(self, mock_dfp_client):
+    """
+    It only renames orders when line items are split across orders.
+    """
+    self.assertEqual(
+      tasks.add_new_prebid_partner.get_order_shard_names('Prebid', 1),
+      ['Prebid'])
+    self.assertEqual(
+      tasks.add_new_prebid_partner.get_order_shard_names('Prebid', 2),
+      ['Prebid (1/2)', 'Prebid (2/2)'])
+    with patch('settings.DFP_ORDER_SHARD_NAME_FORMAT',
+      u'{order_name} #{shard}', create=True):
+      self.assertEqual(
+        tasks.add_new_prebid_partner.get_order_shard_names('Prebid', 2),
+        ['Prebid #1', 'Prebid #2'])
+
   def test_create_line_item_configs(self, mock_dfp_client):
     """
     It creates the expected line item configs.
@@ -344,7 +551,7 @@ class AddNewPrebidPartnerTests(TestCase):
     It returns the expected values from DFP.
     """
 
-    mock_get_targeting.get_targeting_by_key_name = MagicMock(
+    mock_get_targeting.iter_targeting_values = MagicMock(
       return_value=[
         {
           'customTargetingKeyId': 987654,
@@ -366,8 +573,7 @@ class AddNewPrebidPartnerTests(TestCase):
 
     getter = DFPValueIdGetter('some-key-name')
 
-    mock_get_targeting.get_targeting_by_key_name.assert_called_once_with(
-      'some-key-name')
+    mock_get_targeting.iter_targeting_values.assert_called_once_with(987654)
     mock_create_targeting.create_targeting_value.assert_not_called()
 
     # This targeting value already exists.
@@ -378,6 +584,119 @@ class AddNewPrebidPartnerTests(TestCase):
     mock_create_targeting.create_targeting_value.assert_called_once_with(
       '15.00', 987654)
 
+  @patch('dfp.create_custom_targeting')
+  @patch('dfp.get_custom_targeting')
+  def test_value_id_getter_caches_created_values(self, mock_get_targeting,
+    mock_create_targeting, mock_dfp_client):
+    """
+    It only creates a missing value once, and handles a key without values.
+    """
+
+    mock_get_targeting.iter_targeting_values = MagicMock(
+      return_value=[])
+    mock_get_targeting.get_key_id_by_name = MagicMock(return_value=987654)
+    mock_create_targeting.create_targeting_value = MagicMock(
+      return_value=44445555)
+
+    getter = DFPValueIdGetter('some-key-name')
+
+    self.assertEqual(getter.get_value_id('15.00'), 44445555)
+    self.assertEqual(getter.get_value_id('15.00'), 44445555)
+    mock_create_targeting.create_targeting_value.assert_called_once_with(
+      '15.00', 987654)
+
+  @patch('dfp.create_custom_targeting')
+  @patch('dfp.get_custom_targeting')
+  def test_value_id_getter_does_not_scan(self, mock_get_targeting,
+    mock_create_targeting, mock_dfp_client):
+    """
+    It reads the existing values once, however many lookups follow.
+    """
+
+    class ValueList(list):
+      num_iterations = 0
+
+      def __iter__(self):
+        ValueList.num_iterations += 1
+        return super(ValueList, self).__iter__()
+
+    values = ValueList({
+      'customTargetingKeyId': 987654,
+      'displayName': str(i),
+      'id': 1000000 + i,
+      'name': str(i),
+    } for i in range(1000))
+    mock_get_targeting.iter_targeting_values = MagicMock(
+      return_value=values)
+    mock_get_targeting.get_key_id_by_name = MagicMock(return_value=987654)
+
+    getter = DFPValueIdGetter('some-key-name')
+    for i in range(1000):
+      self.assertEqual(getter.get_value_id(str(i)), 1000000 + i)
+    self.assertEqual(getter.get_value_ids(['5', '999']),
+      {'5': 1000005, '999': 1000999})
+
+    self.assertEqual(ValueList.num_iterations, 1)
+    mock_create_targeting.create_targeting_value.assert_not_called()
+    mock_create_targeting.create_targeting_values.assert_not_called()
+
+  @patch('dfp.create_custom_targeting')
+  @patch('dfp.get_custom_targeting')
+  def test_value_id_getter_bulk(self, mock_get_targeting,
+    mock_create_targeting, mock_dfp_client):
+    """
+    It creates all missing values in one bulk call and returns every ID.
+    """
+
+    mock_get_targeting.iter_targeting_values = MagicMock(
+      return_value=[
+        {
+          'customTargetingKeyId': 987654,
+          'displayName': '12.50',
+          'id': 1324354657,
+          'name': '12.50'
+        }
+      ]
+    )
+    mock_get_targeting.get_key_id_by_name = MagicMock(return_value=987654)
+    mock_create_targeting.create_targeting_values = MagicMock(
+      return_value={'15.00': 44445555, '17.50': 66667777})
+
+    getter = DFPValueIdGetter('some-key-name')
+    value_ids = getter.get_value_ids(['12.50', '15.00', '17.50'])
+
+    self.assertEqual(value_ids, {
+      '12.50': 1324354657,
+      '15.00': 44445555,
+      '17.50': 66667777,
+    })
+    mock_create_targeting.create_targeting_values.assert_called_once_with(
+      ['15.00', '17.50'], 987654)
+    mock_create_targeting.create_targeting_value.assert_not_called()
+
+    # Values created in bulk are cached.
+    self.assertEqual(getter.get_value_id('17.50'), 66667777)
+    mock_create_targeting.create_targeting_value.assert_not_called()
+
+  @patch('dfp.create_custom_targeting')
+  @patch('dfp.get_custom_targeting')
+  def test_value_id_getter_bulk_renamed(self, mock_get_targeting,
+    mock_create_targeting, mock_dfp_client):
+    """
+    It lists the created values DFP returned under another name.
+    """
+
+    mock_get_targeting.iter_targeting_values = MagicMock(return_value=[])
+    mock_get_targeting.get_key_id_by_name = MagicMock(return_value=987654)
+    mock_create_targeting.create_targeting_values = MagicMock(
+      return_value={'15.00': 44445555, '17.5': 66667777, 'abc': 88889999})
+
+    getter = DFPValueIdGetter('some-key-name')
+    with self.assertRaises(DFPObjectNotFound) as context:
+      getter.get_value_ids(['15.00', '17.50', 'ABC'])
+
+    self.assertIn('17.50, ABC', str(context.exception))
+
   @patch('dfp.create_custom_targeting')
   @patch('dfp.get_custom_targeting')
   def test_get_or_create_dfp_targeting_key_does_not_exist(self,
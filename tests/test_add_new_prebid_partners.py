@@ -0,0 +1,211 @@
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+import settings
+import tasks.add_new_prebid_partners
+from dfp.exceptions import BadSettingException, MissingSettingException
+from tasks.price_utils import get_prices_array
+from tests.fake_ad_manager import build_network, fake_ad_manager
+
+email = 'fakeuser@example.com'
+advertiser = 'My Advertiser'
+placements = ['My Site Leaderboard', 'Another Placement']
+ad_units = ['Leaderboard Ad Unit']
+sizes = [
+  {
+    'width': '300',
+    'height': '250'
+  },
+]
+price_buckets = {
+  'precision': 2,
+  'min' : 0,
+  'max' : 1,
+  'increment': 0.50,
+}
+
+@patch.multiple('settings',
+  DFP_USER_EMAIL_ADDRESS=email,
+  DFP_ADVERTISER_NAME=advertiser,
+  DFP_ORDER_NAME='Prebid: {bidder_code}',
+  DFP_TARGETED_PLACEMENT_NAMES=placements,
+  DFP_TARGETED_AD_UNIT_NAMES=ad_units,
+  DFP_PLACEMENT_SIZES=sizes,
+  PREBID_PRICE_BUCKETS=price_buckets,
+  PREBID_BIDDER_CODES=['partner1', {'bidder_code': 'partner2',
+    'advertiser_name': 'Other Advertiser', 'num_creatives': 5}],
+  create=True)
+class AddNewPrebidPartnersTests(TestCase):
+
+  def test_missing_bidder_codes_setting(self):
+    """
+    It throws an exception with a missing setting.
+    """
+    settings.PREBID_BIDDER_CODES = None
+    with self.assertRaises(MissingSettingException):
+      tasks.add_new_prebid_partners.main()
+
+  def test_duplicate_order_names(self):
+    """
+    It throws an exception when partners would share an order.
+    """
+    settings.DFP_ORDER_NAME = 'Prebid'
+    with self.assertRaises(BadSettingException):
+      tasks.add_new_prebid_partners.main()
+
+  def test_unknown_override(self):
+    """
+    It throws an exception for an unknown per-partner setting.
+    """
+    settings.PREBID_BIDDER_CODES = [{'bidder_code': 'a', 'colour': 'red'}]
+    with self.assertRaises(BadSettingException):
+      tasks.add_new_prebid_partners.main()
+
+  @patch('tasks.add_new_prebid_partners.setup_partners')
+  @patch('tasks.add_new_prebid_partners.input', return_value='y')
+  def test_partners_from_settings(self, mock_input, mock_setup_partners):
+    """
+    It applies defaults and per-partner overrides.
+    """
+    tasks.add_new_prebid_partners.main()
+    args, kwargs = mock_setup_partners.call_args
+    partners = args[4]
+
+    self.assertEqual(len(partners), 2)
+    self.assertEqual(partners[0]['bidder_code'], 'partner1')
+    self.assertEqual(partners[0]['order_name'], 'Prebid: partner1')
+    self.assertEqual(partners[0]['advertiser_name'], advertiser)
+    self.assertEqual(partners[0]['num_creatives'], 3)
+    self.assertEqual(partners[0]['prices'], [0, 500000, 1000000])
+    self.assertEqual(partners[1]['order_name'], 'Prebid: partner2')
+    self.assertEqual(partners[1]['advertiser_name'], 'Other Advertiser')
+    self.assertEqual(partners[1]['num_creatives'], 5)
+
+  @patch('tasks.add_new_prebid_partners.setup_partners')
+  @patch('tasks.add_new_prebid_partners.input', return_value='n')
+  def test_user_confirmation_rejected(self, mock_input, mock_setup_partners):
+    """
+    Make sure we exit when the user rejects the confirmation.
+    """
+    tasks.add_new_prebid_partners.main()
+    mock_setup_partners.assert_not_called()
+
+  @patch('tasks.add_new_prebid_partners.create_partner_order')
+  @patch('tasks.add_new_prebid_partners.DFPValueIdGetter')
+  @patch('tasks.add_new_prebid_partners.get_or_create_dfp_targeting_key')
+  @patch('dfp.get_advertisers')
+  @patch('dfp.get_ad_units')
+  @patch('dfp.get_placements')
+  @patch('dfp.get_users')
+  def test_setup_partners_shares_lookups(self, mock_get_users,
+    mock_get_placements, mock_get_ad_units, mock_get_advertisers,
+    mock_get_or_create_dfp_targeting_key, mock_dfp_value_id_getter,
+    mock_create_partner_order):
+    """
+    It resolves shared objects once and creates an order per partner.
+    """
+    mock_get_advertisers.get_advertiser_id_by_name = MagicMock(
+      side_effect=lambda name: {advertiser: 246810, 'Other': 135791}[name])
+    mock_create_partner_order.side_effect = (
+      lambda *args: {'partner1': 11, 'partner2': 22, 'partner3': 33}[args[6]])
+
+    prices = get_prices_array(price_buckets)
+    partners = [
+      {
+        'bidder_code': bidder_code,
+        'order_name': 'Prebid: ' + bidder_code,
+        'advertiser_name': advertiser_name,
+        'prices': prices,
+        'num_creatives': 2,
+        'currency_code': 'USD',
+        'line_item_format': u'{bidder_code}: HB ${price}',
+      }
+      for bidder_code, advertiser_name in [('partner1', advertiser),
+        ('partner2', advertiser), ('partner3', 'Other')]
+    ]
+
+    order_ids = tasks.add_new_prebid_partners.setup_partners(email,
+      placements, ad_units, sizes, partners, max_workers=2)
+
+    self.assertEqual(order_ids, {'partner1': 11, 'partner2': 22,
+      'partner3': 33})
+    mock_get_users.get_user_id_by_email.assert_called_once_with(email)
+    mock_get_placements.get_placement_ids_by_name.assert_called_once_with(
+      placements)
+    mock_get_ad_units.get_ad_unit_ids_by_name.assert_called_once_with(
+      ad_units)
+    self.assertEqual(
+      mock_get_advertisers.get_advertiser_id_by_name.call_count, 2)
+    self.assertEqual(mock_get_or_create_dfp_targeting_key.call_count, 2)
+    self.assertEqual(mock_create_partner_order.call_count, 3)
+
+    # Targeting values for every partner are created in one pass.
+    value_getter = mock_dfp_value_id_getter.return_value
+    value_getter.get_value_ids.assert_any_call(
+      ['partner1', 'partner2', 'partner3'])
+    value_getter.get_value_ids.assert_any_call(['0.00', '0.50', '1.00'])
+
+  @patch('tasks.add_new_prebid_partners.create_partner_order')
+  @patch('tasks.add_new_prebid_partners.DFPValueIdGetter')
+  @patch('tasks.add_new_prebid_partners.get_or_create_dfp_targeting_key')
+  @patch('dfp.get_advertisers')
+  @patch('dfp.get_ad_units')
+  @patch('dfp.get_placements')
+  @patch('dfp.get_users')
+  def test_setup_partners_failure(self, mock_get_users,
+    mock_get_placements, mock_get_ad_units, mock_get_advertisers,
+    mock_get_or_create_dfp_targeting_key, mock_dfp_value_id_getter,
+    mock_create_partner_order):
+    """
+    It finishes the other partners before raising a partner's failure.
+    """
+    mock_create_partner_order.side_effect = [ValueError('oops'), 22]
+    partners = [
+      {
+        'bidder_code': bidder_code,
+        'order_name': 'Prebid: ' + bidder_code,
+        'advertiser_name': advertiser,
+        'prices': [0],
+        'num_creatives': 2,
+        'currency_code': 'USD',
+        'line_item_format': u'{bidder_code}: HB ${price}',
+      }
+      for bidder_code in ['partner1', 'partner2']
+    ]
+
+    with self.assertRaises(ValueError):
+      tasks.add_new_prebid_partners.setup_partners(email, placements,
+        ad_units, sizes, partners, max_workers=1)
+    self.assertEqual(mock_create_partner_order.call_count, 2)
+
+  def test_setup_partners_sub_cent_prices(self):
+    """
+    The hb_pb values created up front are the ones the partners look up,
+    even for prices finer than a cent.
+    """
+    network = build_network(email, advertiser, placements=placements,
+      ad_units=ad_units)
+    partners = [
+      {
+        'bidder_code': bidder_code,
+        'order_name': 'Prebid: ' + bidder_code,
+        'advertiser_name': advertiser,
+        'prices': [5000, 15000, 25000],
+        'num_creatives': 1,
+        'currency_code': 'USD',
+        'line_item_format': u'{bidder_code}: HB ${price}',
+      }
+      for bidder_code in ['partner1', 'partner2']
+    ]
+
+    with fake_ad_manager(network):
+      tasks.add_new_prebid_partners.setup_partners(email, placements,
+        ad_units, sizes, partners, max_workers=2)
+
+    hb_pb_key_id = [key['id'] for key in network.get_all('targeting_key')
+      if key['name'] == 'hb_pb'][0]
+    self.assertEqual(sorted(value['name']
+      for value in network.get_all('targeting_value')
+      if value['customTargetingKeyId'] == hb_pb_key_id), ['0.00', '0.02'])
+    self.assertEqual(network.calls['createCustomTargetingValues'], 2)
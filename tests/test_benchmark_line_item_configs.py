@@ -0,0 +1,29 @@
+
+from benchmarks.line_item_configs import (
+  build_from_template,
+  build_per_price,
+  format_results,
+  run,
+)
+from tests.benchmark_test_case import BenchmarkTestCase
+
+
+class BenchmarkLineItemConfigsTests(BenchmarkTestCase):
+
+  def test_builders_match(self):
+    """
+    Both builders produce the same configs.
+    """
+    prices = [10000, 20000, 30000]
+    self.assertEqual(build_from_template(prices), build_per_price(prices))
+
+  def test_run(self):
+    """
+    Templated configs share their invariant parts.
+    """
+    results = run(200)
+    self.assert_measured(results, ['prices', 'us_per_config',
+      'bytes_per_config'])
+    self.assertLess(results['template']['bytes_per_config'],
+      results['per_price']['bytes_per_config'])
+    self.assert_formatted(format_results(results), ['per_price', 'template'])
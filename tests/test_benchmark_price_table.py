@@ -0,0 +1,33 @@
+
+from benchmarks.price_table import (
+  format_results,
+  format_scalar,
+  format_table,
+  run,
+)
+from tasks.price_utils import get_price_bucket_ranges
+from tests.benchmark_test_case import BenchmarkTestCase
+
+
+class BenchmarkPriceTableTests(BenchmarkTestCase):
+
+  def test_formatters_match(self):
+    """
+    Both formatters produce the same prices and names.
+    """
+    ranges = get_price_bucket_ranges('auto')
+    scalar_prices, scalar_names = format_scalar(ranges, ['a', 'b'])
+    table, table_names = format_table(ranges, ['a', 'b'])
+    self.assertEqual(list(table), scalar_prices)
+    self.assertEqual(table_names, scalar_names)
+
+  def test_run(self):
+    """
+    The table holds 8-byte ints instead of int objects.
+    """
+    results = run(2, 'low')
+    self.assertEqual(results['table']['names'], 22)
+    self.assert_measured(results, ['names', 'us_per_name', 'bytes_per_price'])
+    self.assertLess(results['table']['bytes_per_price'],
+      results['scalar']['bytes_per_price'])
+    self.assert_formatted(format_results(results), ['scalar', 'table'])
@@ -0,0 +1,35 @@
+
+from benchmarks.setup_partner import format_results, run_sweep
+from tests.benchmark_test_case import BenchmarkTestCase
+
+
+class BenchmarkSetupPartnerTests(BenchmarkTestCase):
+
+  def test_run_sweep(self):
+    """
+    It measures every phase of every case.
+    """
+    results = run_sweep([20, 500], [1], [2], [0])
+
+    self.assertEqual([result['line_items'] for result in results], [20, 500])
+    self.assert_measured(results, ['wall_time', 'api_calls', 'peak_memory'])
+    for result in results:
+      self.assertEqual(sorted(result['phases']), sorted(['lookups', 'orders',
+        'creatives', 'line_item_configs', 'line_items', 'licas']))
+      self.assertEqual(result['calls_by_method']['createOrders'],
+        1 if result['line_items'] <= 450 else 2)
+      self.assertEqual(result['api_calls'],
+        sum(phase['api_calls'] for phase in result['phases'].values()))
+      self.assert_measured([result['phases']['line_items']],
+        ['wall_time', 'peak_memory'])
+
+  def test_format_results_with_baseline(self):
+    """
+    It compares wall times with a baseline run of the same case.
+    """
+    results = run_sweep([20], [1], [1], [0])
+    baseline = {'results': [dict(results[0],
+      wall_time=results[0]['wall_time'] * 2)]}
+
+    self.assert_formatted(format_results(results, baseline),
+      ['vs baseline', '0.50x'])
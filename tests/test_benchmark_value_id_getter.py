@@ -0,0 +1,15 @@
+
+from benchmarks.value_id_getter import format_results, run
+from tests.benchmark_test_case import BenchmarkTestCase
+
+
+class BenchmarkValueIdGetterTests(BenchmarkTestCase):
+
+  def test_run(self):
+    """
+    It times lookups against each number of values.
+    """
+    results = run([10, 100])
+    self.assertEqual([result['values'] for result in results], [10, 100])
+    self.assert_measured(results, ['values', 'lookups', 'us_per_lookup'])
+    self.assert_formatted(format_results(results), ['values', 'us/lookup'])
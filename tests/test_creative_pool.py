@@ -0,0 +1,117 @@
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import patch
+
+import dfp.create_creatives
+import tasks.add_new_prebid_partner
+from tests.fake_ad_manager import build_network, fake_ad_manager
+
+
+EMAIL = 'fakeuser@example.com'
+ADVERTISER = 'My Advertiser'
+PLACEMENTS = ['My Placement']
+
+def setup_partner(bidder_code, video_ad_type=False):
+  tasks.add_new_prebid_partner.setup_partner(EMAIL, ADVERTISER,
+    'Prebid: {0}'.format(bidder_code), PLACEMENTS, [],
+    [{'width': '300', 'height': '250'}], bidder_code, [100000, 200000], 4,
+    'USD', u'{bidder_code}: HB ${price}', video_ad_type=video_ad_type,
+    redirect_url='https://vast.example' if video_ad_type else '')
+
+class CreativePoolTests(TestCase):
+
+  def setUp(self):
+    self.network = build_network(EMAIL, ADVERTISER, placements=PLACEMENTS)
+    patcher = patch('settings.DFP_REUSE_CREATIVES', True, create=True)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def test_reuses_creatives_across_bidders(self):
+    """
+    Partners with the same snippet share one set of creatives.
+    """
+    with fake_ad_manager(self.network):
+      setup_partner('appnexus')
+      setup_partner('rubicon')
+
+    self.assertEqual(len(self.network.get_all('creative')), 4)
+    self.assertEqual(self.network.calls['createCreatives'], 1)
+    # Each partner's 2 line items have all 4 creatives.
+    self.assertEqual(len(self.network.get_all('lica')), 16)
+
+  def test_creates_shortfall(self):
+    """
+    It reuses the matching creatives there are and creates the rest,
+    ignoring other snippets and names.
+    """
+    advertiser_id = self.network.get_all('company')[0]['id']
+    snippet = dfp.create_creatives.get_snippet('appnexus')
+    reused = self.network.add('creative', advertiserId=advertiser_id,
+      name='other: HB Old order, #1', snippet=snippet)
+    self.network.add('creative', advertiserId=advertiser_id,
+      name='other: HB Old order, #2', snippet='<script>other</script>')
+    self.network.add('creative', advertiserId=advertiser_id,
+      name='Hand made creative', snippet=snippet)
+
+    with fake_ad_manager(self.network):
+      creative_ids = dfp.create_creatives.get_pooled_creative_ids('appnexus',
+        'Prebid: appnexus', advertiser_id, 3)
+
+    self.assertEqual(creative_ids[0], reused['id'])
+    self.assertEqual(len(set(creative_ids)), 3)
+    created = self.network.get_all('creative')[3:]
+    self.assertEqual([creative['name'] for creative in created],
+      ['appnexus: HB Prebid: appnexus, #2',
+       'appnexus: HB Prebid: appnexus, #3'])
+
+  def test_bidder_snippets_not_shared(self):
+    """
+    A bidder with its own snippet does not reuse other bidders' creatives.
+    """
+    snippet_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, snippet_dir)
+    snippet_path = os.path.join(snippet_dir, 'rubicon.html')
+    with open(snippet_path, 'w') as snippet_file:
+      snippet_file.write('<script>rubicon</script>')
+
+    with fake_ad_manager(self.network), patch(
+      'settings.DFP_CREATIVE_SNIPPET_FILES', {'rubicon': snippet_path},
+      create=True):
+      setup_partner('appnexus')
+      setup_partner('rubicon')
+
+    self.assertEqual(len(self.network.get_all('creative')), 8)
+
+  def test_video_creatives_not_pooled(self):
+    """
+    Video creatives are always created.
+    """
+    with fake_ad_manager(self.network):
+      setup_partner('appnexus', video_ad_type=True)
+      setup_partner('rubicon', video_ad_type=True)
+
+    self.assertEqual(len(self.network.get_all('creative')), 8)
+    self.assertEqual(self.network.calls['getCreativesByStatement'], 0)
+
+  def test_stops_paging_when_found(self):
+    """
+    It stops reading the pool once it has found enough creatives.
+    """
+    advertiser_id = self.network.get_all('company')[0]['id']
+    snippet = dfp.create_creatives.get_snippet('appnexus')
+    for i in range(1200):
+      self.network.add('creative', advertiserId=advertiser_id,
+        name='other: HB Old order, #{0}'.format(i), snippet=snippet)
+    self.network.calls.clear()
+
+    with fake_ad_manager(self.network):
+      creative_ids = dfp.create_creatives.get_pooled_creative_ids('appnexus',
+        'Prebid: appnexus', advertiser_id, num_creatives=4)
+
+    self.assertEqual(len(creative_ids), 4)
+    self.assertEqual(self.network.calls['getCreativesByStatement'], 1)
+    self.assertEqual(self.network.calls['createCreatives'], 0)
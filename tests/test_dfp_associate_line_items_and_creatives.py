@@ -127,3 +127,66 @@ class DFPCreateLICAsTests(TestCase):
       .GetService.return_value
       .createLineItemCreativeAssociations.assert_called_once_with(expected_arg)
       )
+
+  def test_association_in_concurrent_batches(self, mock_dfp_client):
+    """
+    Ensure associations are split into batches and created counts are
+    summed across batches.
+    """
+
+    mock_dfp_client.return_value = MagicMock()
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .createLineItemCreativeAssociations) = MagicMock(
+        side_effect=lambda licas: licas)
+
+    line_item_ids = list(range(1000, 1010))
+    num_created = dfp.associate_line_items_and_creatives.make_licas(
+      line_item_ids, [111222, 223344], batch_size=6, max_workers=3)
+
+    self.assertEqual(num_created, 20)
+
+    create_mock = (mock_dfp_client.return_value
+      .GetService.return_value
+      .createLineItemCreativeAssociations)
+    self.assertEqual(create_mock.call_count, 4)
+    created = [lica for call in create_mock.call_args_list
+      for lica in call[0][0]]
+    self.assertEqual(
+      sorted((lica['lineItemId'], lica['creativeId']) for lica in created),
+      [(line_item_id, creative_id) for line_item_id in line_item_ids
+        for creative_id in [111222, 223344]])
+
+  def test_association_skips_existing(self, mock_dfp_client):
+    """
+    Ensure existing associations are skipped and created batches are
+    reported to the callback.
+    """
+
+    mock_dfp_client.return_value = MagicMock()
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .createLineItemCreativeAssociations) = MagicMock(
+        side_effect=lambda licas: licas)
+    on_batch_created = MagicMock()
+
+    num_created = dfp.associate_line_items_and_creatives.make_licas(
+      [1000, 1001], [111222, 223344],
+      existing_licas={(1000, 111222), (1001, 223344)},
+      on_batch_created=on_batch_created)
+
+    self.assertEqual(num_created, 2)
+    created = on_batch_created.call_args[0][0]
+    self.assertEqual(
+      [(lica['lineItemId'], lica['creativeId']) for lica in created],
+      [(1000, 223344), (1001, 111222)])
+
+  def test_iter_lica_configs_is_lazy(self, mock_dfp_client):
+    """
+    Ensure association configs are built one at a time.
+    """
+    licas = dfp.associate_line_items_and_creatives.iter_lica_configs(
+      range(10 ** 9), [111222, 223344])
+    self.assertEqual(next(licas),
+      {'lineItemId': 0, 'creativeId': 111222, 'sizes': []})
+    self.assertEqual(next(licas)['creativeId'], 223344)
@@ -0,0 +1,73 @@
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.batches
+
+
+class DFPBatchesTests(TestCase):
+
+  def test_split_into_batches(self):
+    """
+    Ensure arrays are split into consecutive batches.
+    """
+    self.assertEqual(dfp.batches.split_into_batches([1, 2, 3, 4, 5], 2),
+      [[1, 2], [3, 4], [5]])
+    self.assertEqual(dfp.batches.split_into_batches([], 2), [])
+
+  def test_submit_batches_keeps_order(self):
+    """
+    Ensure results are returned in batch order.
+    """
+    results = dfp.batches.submit_batches(sum, [[1, 2], [3, 4], [5]],
+      max_workers=3)
+    self.assertEqual(results, [3, 7, 5])
+
+  @patch('settings.DFP_MAX_CONCURRENT_REQUESTS', 1, create=True)
+  @patch('dfp.batches.ThreadPoolExecutor')
+  def test_submit_batches_serially(self, mock_executor):
+    """
+    Ensure no thread pool is used when concurrency is disabled.
+    """
+    results = dfp.batches.submit_batches(sum, [[1, 2], [3, 4]])
+    self.assertEqual(results, [3, 7])
+    mock_executor.assert_not_called()
+
+  def test_submit_batches_raises(self):
+    """
+    Ensure an exception in a batch is raised to the caller.
+    """
+    submit_batch = MagicMock(side_effect=[1, ValueError('bad batch'), 3])
+    with self.assertRaises(ValueError):
+      dfp.batches.submit_batches(submit_batch, [[1], [2], [3]],
+        max_workers=1)
+
+  def test_iter_batches(self):
+    """
+    Ensure any iterable is split into consecutive batches.
+    """
+    self.assertEqual(list(dfp.batches.iter_batches(iter(range(5)), 2)),
+      [[0, 1], [2, 3], [4]])
+    self.assertEqual(list(dfp.batches.iter_batches([], 2)), [])
+
+  def test_submit_batches_streams_generators(self):
+    """
+    Ensure batches are taken from a generator only as workers free up.
+    """
+    max_pulled_ahead = [0]
+    pulled = [0]
+    submitted = [0]
+
+    def batches():
+      for i in range(20):
+        pulled[0] += 1
+        max_pulled_ahead[0] = max(max_pulled_ahead[0], pulled[0] - submitted[0])
+        yield [i]
+
+    def submit_batch(batch):
+      submitted[0] += 1
+      return batch[0]
+
+    results = dfp.batches.submit_batches(submit_batch, batches(),
+      max_workers=2)
+    self.assertEqual(results, list(range(20)))
+    self.assertLessEqual(max_pulled_ahead[0], 3)
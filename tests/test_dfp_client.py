@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.retry
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+class DFPClientTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_pool_stats()
+
+  def test_get_service_not_pooled(self, mock_dfp_client):
+    """
+    Ensure credentials are loaded on every call outside of a pool.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    dfp.client.get_service('OrderService', version='v202008')
+    dfp.client.get_service('OrderService', version='v202008')
+
+    self.assertEqual(mock_dfp_client.call_count, 2)
+    self.assertEqual(mock_dfp_client.return_value.GetService.call_count, 2)
+
+  def test_get_service_pooled(self, mock_dfp_client):
+    """
+    Ensure the client and services are built once inside a pool.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    with dfp.client.pooled():
+      first = dfp.client.get_service('OrderService', version='v202008')
+      second = dfp.client.get_service('OrderService', version='v202008')
+      dfp.client.get_service('LineItemService', version='v202008')
+
+    # Each call gets its own retrying wrapper around the pooled service.
+    self.assertIs(first._service, second._service)
+    mock_dfp_client.assert_called_once()
+    self.assertEqual(mock_dfp_client.return_value.GetService.call_count, 2)
+    self.assertEqual(dfp.client.get_pool_stats(), {
+      'client_hits': 1,
+      'client_misses': 1,
+      'service_hits': 1,
+      'service_misses': 2,
+    })
+
+  def test_pool_is_dropped_on_exit(self, mock_dfp_client):
+    """
+    Ensure a new pool loads a fresh client.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    with dfp.client.pooled():
+      dfp.client.get_service('OrderService', version='v202008')
+    with dfp.client.pooled():
+      dfp.client.get_service('OrderService', version='v202008')
+
+    self.assertEqual(mock_dfp_client.call_count, 2)
+
+  def test_nested_pools(self, mock_dfp_client):
+    """
+    Ensure nested pools share the outer pool's cache.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    with dfp.client.pooled():
+      dfp.client.get_service('OrderService', version='v202008')
+      with dfp.client.pooled():
+        dfp.client.get_service('OrderService', version='v202008')
+      dfp.client.get_service('OrderService', version='v202008')
+
+    mock_dfp_client.assert_called_once()
+    mock_dfp_client.return_value.GetService.assert_called_once()
+
+  def test_service_per_thread(self, mock_dfp_client):
+    """
+    Ensure each thread gets its own service proxy from one shared client.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    mock_dfp_client.return_value.GetService.side_effect = (
+      lambda *args, **kwargs: MagicMock())
+
+    services = []
+    def fetch_service():
+      services.append(
+        dfp.client.get_service('OrderService', version='v202008'))
+
+    with dfp.client.pooled():
+      fetch_service()
+      thread = threading.Thread(target=fetch_service)
+      thread.start()
+      thread.join()
+
+    self.assertIsNot(services[0], services[1])
+    mock_dfp_client.assert_called_once()
+
+  def test_get_network_code(self, mock_dfp_client):
+    """
+    Ensure the network code is read from the YAML file once, without
+    loading a client.
+    """
+    yaml_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, yaml_dir)
+    yaml_file = os.path.join(yaml_dir, 'googleads.yaml')
+    with open(yaml_file, 'w') as f:
+      f.write('ad_manager:\n  application_name: test\n  network_code: 1234\n')
+
+    with patch('settings.GOOGLEADS_YAML_FILE', yaml_file), patch(
+      'dfp.client.open', wraps=open, create=True) as mock_open:
+      self.assertEqual(dfp.client.get_network_code(), 1234)
+      self.assertEqual(dfp.client.get_network_code(), 1234)
+
+    mock_open.assert_called_once()
+    mock_dfp_client.assert_not_called()
+
+  def test_pool_stats_per_run(self, mock_dfp_client):
+    """
+    Ensure each outermost pool reports only the retries made inside it.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    dfp.retry.record('retries', 5)
+
+    with patch('dfp.client.logger') as mock_logger:
+      with dfp.client.pooled():
+        with dfp.client.pooled():
+          dfp.retry.record('retries')
+        dfp.client.get_service('OrderService', version='v202008')
+
+    self.assertIn('1 retries', mock_logger.info.call_args[0][0])
+    self.assertEqual(dfp.client.get_pool_stats()['client_misses'], 1)
@@ -1,5 +1,7 @@
 
 import os
+import shutil
+import tempfile
 from unittest import TestCase
 from mock import MagicMock, Mock, patch
 
@@ -183,3 +185,79 @@ class DFPCreateCreativesTests(TestCase):
       ]
     )
 
+
+class DFPCreativeSnippetTests(TestCase):
+
+  def setUp(self):
+    self.dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.dir)
+
+  def write_snippet(self, name, contents, mtime):
+    path = os.path.join(self.dir, name)
+    with open(path, 'w') as snippet_file:
+      snippet_file.write(contents)
+    os.utime(path, (mtime, mtime))
+    return path
+
+  def test_load_snippet_cached_by_mtime(self):
+    """
+    It reads a snippet file once, and again only after it is modified.
+    """
+    path = self.write_snippet('snippet.html', 'first', 1000)
+    self.assertEqual(dfp.create_creatives.load_snippet(path), 'first')
+
+    with patch('builtins.open') as mock_open:
+      self.assertEqual(dfp.create_creatives.load_snippet(path), 'first')
+    mock_open.assert_not_called()
+
+    self.write_snippet('snippet.html', 'second', 2000)
+    self.assertEqual(dfp.create_creatives.load_snippet(path), 'second')
+
+  def test_get_snippet_per_bidder(self):
+    """
+    It uses the bidder's own snippet file if it has one and fills in the
+    bidder code.
+    """
+    default_path = self.write_snippet('default.html',
+      'var x = {bidder: "${bidder_code}"};', 1000)
+    bidder_path = self.write_snippet('bidder.html', 'custom ${bidder_code}',
+      1000)
+
+    with patch('settings.DFP_CREATIVE_SNIPPET_FILE', default_path,
+      create=True), patch('settings.DFP_CREATIVE_SNIPPET_FILES',
+      {'appnexus': bidder_path}, create=True):
+      self.assertEqual(dfp.create_creatives.get_snippet('appnexus'),
+        'custom appnexus')
+      self.assertEqual(dfp.create_creatives.get_snippet('rubicon'),
+        'var x = {bidder: "rubicon"};')
+
+  def test_get_snippet_keeps_literal_dollars(self):
+    """
+    It only replaces the bidder code placeholder, leaving other `$` as is.
+    """
+    path = self.write_snippet('snippet.html',
+      'var price = "$" + $$.pb; $(el); ${bidder_code} $bidder_code', 1000)
+
+    with patch('settings.DFP_CREATIVE_SNIPPET_FILE', path, create=True):
+      self.assertEqual(dfp.create_creatives.get_snippet('appnexus'),
+        'var price = "$" + $$.pb; $(el); appnexus $bidder_code')
+
+  @patch('dfp.create_creatives.get_snippet')
+  def test_duplicate_configs_share_snippet(self, mock_get_snippet):
+    """
+    It gets the snippet once for all of a bidder's creatives, and not at all
+    for video creatives.
+    """
+    mock_get_snippet.return_value = 'the snippet'
+
+    configs = dfp.create_creatives.create_duplicate_creative_configs(
+      'somebidder', 'An order', 12345, 3)
+    mock_get_snippet.assert_called_once_with('somebidder')
+    self.assertEqual([config['snippet'] for config in configs],
+      ['the snippet'] * 3)
+
+    mock_get_snippet.reset_mock()
+    dfp.create_creatives.create_duplicate_creative_configs(
+      'somebidder', 'An order', 12345, 3, video_ad_type=True,
+      redirect_url='redirectme')
+    mock_get_snippet.assert_not_called()
@@ -111,3 +111,56 @@ class DFPCreateCustomTargetingTests(TestCase):
       )
     
     self.assertEqual(response, 555666777)
+
+  def test_create_targeting_values_in_batches(self, mock_dfp_client):
+    """
+    Ensure it creates values in batches and returns a name-to-ID map.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    # Mock response from DFP, echoing each requested value with an ID.
+    def create_values(values_config):
+      return [
+        {
+          'customTargetingKeyId': value['customTargetingKeyId'],
+          'id': 1000 + int(float(value['name']) * 100),
+          'name': value['name'],
+          'displayName': value['displayName'],
+          'matchType': 'EXACT',
+          'status': 'ACTIVE',
+        }
+        for value in values_config
+      ]
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .createCustomTargetingValues) = MagicMock(side_effect=create_values)
+
+    response = dfp.create_custom_targeting.create_targeting_values(
+      ['0.10', '0.20', '0.30', '0.20', '0.40', '0.50'], 2468, batch_size=2)
+
+    create_values_mock = (mock_dfp_client.return_value
+      .GetService.return_value
+      .createCustomTargetingValues)
+    self.assertEqual(create_values_mock.call_count, 3)
+    self.assertEqual(create_values_mock.call_args_list[0][0][0], [
+      {
+        'customTargetingKeyId': 2468,
+        'displayName': '0.10',
+        'name': '0.10',
+        'matchType': 'EXACT'
+      },
+      {
+        'customTargetingKeyId': 2468,
+        'displayName': '0.20',
+        'name': '0.20',
+        'matchType': 'EXACT'
+      },
+    ])
+
+    self.assertEqual(response, {
+      '0.10': 1010,
+      '0.20': 1020,
+      '0.30': 1030,
+      '0.40': 1040,
+      '0.50': 1050,
+    })
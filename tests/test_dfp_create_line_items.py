@@ -1,4 +1,5 @@
 
+import time
 from unittest import TestCase
 from mock import MagicMock, patch
 
@@ -32,6 +33,54 @@ class DFPCreateLineItemsTests(TestCase):
       .createLineItems.assert_called_once_with(line_items_config)
       )
 
+  def test_create_line_items_in_batches(self, mock_dfp_client):
+    """
+    Ensure it splits line items into batches and returns IDs in input order,
+    even when later batches finish first.
+    """
+
+    mock_dfp_client.return_value = MagicMock()
+
+    def create_line_items(line_items):
+      # Make earlier batches slower so they complete last.
+      time.sleep(0.01 * (10 - line_items[0]['id'] // 10))
+      return line_items
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .createLineItems) = MagicMock(side_effect=create_line_items)
+
+    line_items_config = [{'id': i, 'name': str(i)} for i in range(25)]
+
+    ids = dfp.create_line_items.create_line_items(line_items_config,
+      batch_size=10, max_workers=3)
+
+    self.assertEqual(ids, list(range(25)))
+    create_mock = (mock_dfp_client.return_value
+      .GetService.return_value
+      .createLineItems)
+    self.assertEqual(create_mock.call_count, 3)
+    self.assertEqual(
+      sorted(len(call[0][0]) for call in create_mock.call_args_list),
+      [5, 10, 10])
+
+  def test_create_line_items_reports_batches(self, mock_dfp_client):
+    """
+    Ensure each created batch is passed to the callback.
+    """
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .createLineItems) = MagicMock(side_effect=lambda line_items: line_items)
+    on_batch_created = MagicMock()
+
+    line_items_config = [{'id': i, 'name': str(i)} for i in range(5)]
+    dfp.create_line_items.create_line_items(line_items_config, batch_size=2,
+      max_workers=1, on_batch_created=on_batch_created)
+
+    self.assertEqual([call[0][0] for call in on_batch_created.call_args_list],
+      [line_items_config[0:2], line_items_config[2:4], line_items_config[4:]])
+
   def test_create_line_item_config(self, mock_dfp_client):
     """
     Ensure the line item config is created as expected.
@@ -299,3 +348,27 @@ class DFPCreateLineItemsTests(TestCase):
       [16273849, 444555666, 999888777]
     )
 
+
+  def test_line_item_config_template(self, mock_dfp_client):
+    """
+    Ensure a template builds the same configs as create_line_item_config,
+    sharing the parts that don't vary by price.
+    """
+    sizes = [{'width': '300', 'height': '250'}]
+    template = dfp.create_line_items.LineItemConfigTemplate(order_id=1234567, placement_ids=[1, 2],
+                                                            ad_unit_ids=[3], sizes=sizes, hb_bidder_key_id=999999,
+                                                            hb_pb_key_id=888888, hb_bidder_value_id=222222,
+                                                            currency_code='EUR', video_ad_type=True)
+    first = template.create(name='HB $0.10', cpm_micro_amount=100000, hb_pb_value_id=111111)
+    second = template.create(name='HB $0.20', cpm_micro_amount=200000, hb_pb_value_id=111112)
+
+    self.assertEqual(first,
+      dfp.create_line_items.create_line_item_config(name='HB $0.10', order_id=1234567, placement_ids=[1, 2],
+                                                    ad_unit_ids=[3], cpm_micro_amount=100000, sizes=sizes,
+                                                    hb_bidder_key_id=999999, hb_pb_key_id=888888,
+                                                    hb_bidder_value_id=222222, hb_pb_value_id=111111,
+                                                    currency_code='EUR', video_ad_type=True))
+    self.assertEqual(second['costPerUnit']['microAmount'], 200000)
+    self.assertEqual(second['targeting']['customTargeting']['children'][1]['valueIds'], [111112])
+    self.assertIs(first['creativePlaceholders'], second['creativePlaceholders'])
+    self.assertIs(first['targeting']['inventoryTargeting'], second['targeting']['inventoryTargeting'])
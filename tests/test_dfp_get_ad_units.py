@@ -204,131 +204,139 @@ class DFPGetAdUnitsTests(TestCase):
       ad_unit = dfp.get_ad_units.get_ad_unit_by_name(
         'Not_an_Existing_Ad_Unit')
 
-  @patch('dfp.get_ad_units.get_ad_unit_by_name')
-  def test_get_ad_unit_ids_by_name(self, mock_get_ad_unit_id_by_name,
-    mock_dfp_client):
+  def test_get_ad_unit_ids_by_name(self, mock_dfp_client):
     """
     Ensures we return ad unit IDs.
     """
 
-    # Fake returned ad unit. Return a different one each time
-    # it is called.
-    mock_get_ad_unit_id_by_name.side_effect = [
-      {
-        'id': '11122233344',
-        'parentId': '12345678',
-        'hasChildren': False,
-        'parentPath': [
-          {
-            'id': '12345678',
-            'name': 'ca-pub-0000000000000000',
-            'adUnitCode': 'ca-pub-0000000000000000'
-          }
-        ],
-        'name': 'Ad_Unit_One',
-        'description': None,
-        'targetWindow': 'BLANK',
-        'status': 'ACTIVE',
-        'adUnitCode': 'Ad_Unit_One',
-        'adUnitSizes': [
-          {
-            'size': {
-              'width': 300,
-              'height': 250,
-              'isAspectRatio': False
-            },
-            'environmentType': 'BROWSER',
-            'companions': [],
-            'fullDisplayString': '300x250'
-          }
-        ],
-        'isInterstitial': False,
-        'isNative': False,
-        'isFluid': False,
-        'explicitlyTargeted': False,
-        'adSenseSettings': {
-          'adSenseEnabled': False,
-          'borderColor': 'FFFFFF',
-          'titleColor': '0000FF',
-          'backgroundColor': 'FFFFFF',
-          'textColor': '000000',
-          'urlColor': '008000',
-          'adType': 'TEXT_AND_IMAGE',
-          'borderStyle': 'DEFAULT',
-          'fontFamily': 'DEFAULT',
-          'fontSize': 'DEFAULT'
-        },
-        'adSenseSettingsSource': 'PARENT',
-        'appliedLabelFrequencyCaps': [],
-        'effectiveLabelFrequencyCaps': [],
-        'appliedLabels': [],
-        'effectiveAppliedLabels': [],
-        'effectiveTeamIds': [],
-        'appliedTeamIds': [],
-        'lastModifiedDateTime': {},
-        'smartSizeMode': 'NONE',
-        'refreshRate': None,
-        'externalSetTopBoxChannelId': None,
-        'isSetTopBoxEnabled': False
-      },
-      {
-        'id': '22233344455',
-        'parentId': '12345678',
-        'hasChildren': False,
-        'parentPath': [
-          {
-            'id': '12345678',
-            'name': 'ca-pub-0000000000000000',
-            'adUnitCode': 'ca-pub-0000000000000000'
-          }
-        ],
-        'name': 'Ad_Unit_Two',
-        'description': None,
-        'targetWindow': 'BLANK',
-        'status': 'ACTIVE',
-        'adUnitCode': 'Ad_Unit_Two',
-        'adUnitSizes': [
-          {
-            'size': {
-              'width': 300,
-              'height': 250,
-              'isAspectRatio': False
-            },
-            'environmentType': 'BROWSER',
-            'companions': [],
-            'fullDisplayString': '300x250'
-          }
-        ],
-        'isInterstitial': False,
-        'isNative': False,
-        'isFluid': False,
-        'explicitlyTargeted': False,
-        'adSenseSettings': {
-          'adSenseEnabled': False,
-          'borderColor': 'FFFFFF',
-          'titleColor': '0000FF',
-          'backgroundColor': 'FFFFFF',
-          'textColor': '000000',
-          'urlColor': '008000',
-          'adType': 'TEXT_AND_IMAGE',
-          'borderStyle': 'DEFAULT',
-          'fontFamily': 'DEFAULT',
-          'fontSize': 'DEFAULT'
+    mock_dfp_client.return_value = MagicMock()
+
+    # Response from DFP: one page of results for both names.
+    first_page = {
+      'totalResultSetSize': 2,
+      'startIndex': 0,
+      'results': [
+        {
+          'id': '11122233344',
+          'parentId': '12345678',
+          'hasChildren': False,
+          'parentPath': [
+            {
+              'id': '12345678',
+              'name': 'ca-pub-0000000000000000',
+              'adUnitCode': 'ca-pub-0000000000000000'
+            }
+          ],
+          'name': 'Ad_Unit_One',
+          'description': None,
+          'targetWindow': 'BLANK',
+          'status': 'ACTIVE',
+          'adUnitCode': 'Ad_Unit_One',
+          'adUnitSizes': [
+            {
+              'size': {
+                'width': 300,
+                'height': 250,
+                'isAspectRatio': False
+              },
+              'environmentType': 'BROWSER',
+              'companions': [],
+              'fullDisplayString': '300x250'
+            }
+          ],
+          'isInterstitial': False,
+          'isNative': False,
+          'isFluid': False,
+          'explicitlyTargeted': False,
+          'adSenseSettings': {
+            'adSenseEnabled': False,
+            'borderColor': 'FFFFFF',
+            'titleColor': '0000FF',
+            'backgroundColor': 'FFFFFF',
+            'textColor': '000000',
+            'urlColor': '008000',
+            'adType': 'TEXT_AND_IMAGE',
+            'borderStyle': 'DEFAULT',
+            'fontFamily': 'DEFAULT',
+            'fontSize': 'DEFAULT'
+          },
+          'adSenseSettingsSource': 'PARENT',
+          'appliedLabelFrequencyCaps': [],
+          'effectiveLabelFrequencyCaps': [],
+          'appliedLabels': [],
+          'effectiveAppliedLabels': [],
+          'effectiveTeamIds': [],
+          'appliedTeamIds': [],
+          'lastModifiedDateTime': {},
+          'smartSizeMode': 'NONE',
+          'refreshRate': None,
+          'externalSetTopBoxChannelId': None,
+          'isSetTopBoxEnabled': False
         },
-        'adSenseSettingsSource': 'PARENT',
-        'appliedLabelFrequencyCaps': [],
-        'effectiveLabelFrequencyCaps': [],
-        'appliedLabels': [],
-        'effectiveAppliedLabels': [],
-        'effectiveTeamIds': [],
-        'appliedTeamIds': [],
-        'lastModifiedDateTime': {},
-        'smartSizeMode': 'NONE',
-        'refreshRate': None,
-        'externalSetTopBoxChannelId': None,
-        'isSetTopBoxEnabled': False
-      }
-    ]
+        {
+          'id': '22233344455',
+          'parentId': '12345678',
+          'hasChildren': False,
+          'parentPath': [
+            {
+              'id': '12345678',
+              'name': 'ca-pub-0000000000000000',
+              'adUnitCode': 'ca-pub-0000000000000000'
+            }
+          ],
+          'name': 'Ad_Unit_Two',
+          'description': None,
+          'targetWindow': 'BLANK',
+          'status': 'ACTIVE',
+          'adUnitCode': 'Ad_Unit_Two',
+          'adUnitSizes': [
+            {
+              'size': {
+                'width': 300,
+                'height': 250,
+                'isAspectRatio': False
+              },
+              'environmentType': 'BROWSER',
+              'companions': [],
+              'fullDisplayString': '300x250'
+            }
+          ],
+          'isInterstitial': False,
+          'isNative': False,
+          'isFluid': False,
+          'explicitlyTargeted': False,
+          'adSenseSettings': {
+            'adSenseEnabled': False,
+            'borderColor': 'FFFFFF',
+            'titleColor': '0000FF',
+            'backgroundColor': 'FFFFFF',
+            'textColor': '000000',
+            'urlColor': '008000',
+            'adType': 'TEXT_AND_IMAGE',
+            'borderStyle': 'DEFAULT',
+            'fontFamily': 'DEFAULT',
+            'fontSize': 'DEFAULT'
+          },
+          'adSenseSettingsSource': 'PARENT',
+          'appliedLabelFrequencyCaps': [],
+          'effectiveLabelFrequencyCaps': [],
+          'appliedLabels': [],
+          'effectiveAppliedLabels': [],
+          'effectiveTeamIds': [],
+          'appliedTeamIds': [],
+          'lastModifiedDateTime': {},
+          'smartSizeMode': 'NONE',
+          'refreshRate': None,
+          'externalSetTopBoxChannelId': None,
+          'isSetTopBoxEnabled': False
+        }
+      ]
+    }
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getAdUnitsByStatement) = MagicMock(
+        side_effect=[first_page, {'totalResultSetSize': 2, 'startIndex': 2}])
+
     ad_unit_ids = dfp.get_ad_units.get_ad_unit_ids_by_name(
       ['Ad_Unit_One', 'Ad_Unit_Two'])
     self.assertEqual(ad_unit_ids, ['11122233344', '22233344455'])
@@ -0,0 +1,82 @@
+from unittest import TestCase
+from mock import MagicMock
+
+import dfp.get_by_names
+from dfp.exceptions import DFPObjectNotFound
+
+
+class DFPGetByNamesTests(TestCase):
+
+  def test_get_objects_by_names_query(self):
+    """
+    Ensure names are queried with one IN statement per chunk.
+    """
+    get_by_statement = MagicMock(side_effect=[
+      {
+        'totalResultSetSize': 2,
+        'startIndex': 0,
+        'results': [
+          {'id': 2, 'name': 'Two'},
+          {'id': 1, 'name': 'One'},
+        ]
+      },
+      {
+        'totalResultSetSize': 1,
+        'startIndex': 0,
+        'results': [{'id': 3, 'name': 'Three'}]
+      },
+    ])
+
+    objects = dfp.get_by_names.get_objects_by_names(get_by_statement,
+      ['One', 'Two', 'Three', 'One'], 'placement', names_per_query=2)
+
+    self.assertEqual(objects['One']['id'], 1)
+    self.assertEqual(objects['Two']['id'], 2)
+    self.assertEqual(objects['Three']['id'], 3)
+    # A short page is the last, so each chunk takes one request.
+    self.assertEqual(get_by_statement.call_count, 2)
+    self.assertEqual(get_by_statement.call_args_list[0][0][0], {
+      'query': 'WHERE name IN (:name0, :name1) LIMIT 500 OFFSET 0',
+      'values': [
+        {'key': 'name0', 'value': {'xsi_type': 'TextValue', 'value': 'One'}},
+        {'key': 'name1', 'value': {'xsi_type': 'TextValue', 'value': 'Two'}},
+      ]
+    })
+    self.assertEqual(get_by_statement.call_args_list[1][0][0]['query'],
+      'WHERE name IN (:name0) LIMIT 500 OFFSET 0')
+
+  def test_get_objects_by_names_missing(self):
+    """
+    Ensure every missing name is reported at once.
+    """
+    get_by_statement = MagicMock(side_effect=[
+      {
+        'totalResultSetSize': 1,
+        'startIndex': 0,
+        'results': [{'id': 2, 'name': 'Two'}]
+      },
+    ])
+
+    with self.assertRaises(DFPObjectNotFound) as context:
+      dfp.get_by_names.get_objects_by_names(get_by_statement,
+        ['One', 'Two', 'Three'], 'placement')
+    self.assertIn('One, Three', str(context.exception))
+
+  def test_get_objects_by_names_full_pages(self):
+    """
+    Ensure it keeps paging while pages are full.
+    """
+    first_page = [{'id': i, 'name': 'Name {0}'.format(i)} for i in range(500)]
+    get_by_statement = MagicMock(side_effect=[
+      {'totalResultSetSize': 501, 'startIndex': 0, 'results': first_page},
+      {'totalResultSetSize': 501, 'startIndex': 500,
+       'results': [{'id': 500, 'name': 'Name 500'}]},
+    ])
+
+    objects = dfp.get_by_names.get_objects_by_names(get_by_statement,
+      ['Name 0', 'Name 500'], 'placement')
+
+    self.assertEqual(objects['Name 500']['id'], 500)
+    self.assertEqual(get_by_statement.call_count, 2)
+    self.assertEqual(get_by_statement.call_args_list[1][0][0]['query'],
+      'WHERE name IN (:name0, :name1) LIMIT 500 OFFSET 500')
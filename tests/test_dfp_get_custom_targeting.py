@@ -98,12 +98,12 @@ class DFPGetCustomTargetingTests(TestCase):
       .getCustomTargetingKeysByStatement.assert_called_once()
       )
 
-    # It should not fetch values because the key does not exist.
+    # The first page holds every value, so no more pages are fetched.
     self.assertEqual(
       mock_dfp_client.return_value
         .GetService.return_value
         .getCustomTargetingValuesByStatement.call_count,
-      2
+      1
     )
 
     self.assertEqual(response,
@@ -167,3 +167,48 @@ class DFPGetCustomTargetingTests(TestCase):
     response = dfp.get_custom_targeting.get_key_id_by_name('hb_pb')
 
     self.assertEqual(response, None)
+
+  def test_get_targeting_by_key_name_with_key_id(self, mock_dfp_client):
+    """
+    Ensure it reuses a known key ID instead of looking the key up again.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getCustomTargetingValuesByStatement) = MagicMock(
+        return_value={'totalResultSetSize': 0, 'startIndex': 0})
+
+    response = dfp.get_custom_targeting.get_targeting_by_key_name('hb_pb',
+      key_id=987654)
+
+    self.assertEqual(response, [])
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getCustomTargetingKeysByStatement.assert_not_called())
+
+  def test_iter_targeting_values_pages_concurrently(self, mock_dfp_client):
+    """
+    Ensure pages after the first are fetched by offset and yielded in order.
+    """
+    def get_values(statement):
+      offset = int(statement['query'].split('OFFSET ')[1])
+      return {
+        'totalResultSetSize': 7,
+        'startIndex': offset,
+        'results': [{'id': i, 'name': str(i), 'displayName': str(i),
+          'customTargetingKeyId': 987654} for i in range(offset, min(offset + 2, 7))],
+      }
+    mock_dfp_client.return_value = MagicMock()
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getCustomTargetingValuesByStatement) = MagicMock(side_effect=get_values)
+
+    values = list(dfp.get_custom_targeting.iter_targeting_values(987654,
+      max_workers=3, page_size=2))
+
+    self.assertEqual([value['id'] for value in values], list(range(7)))
+    self.assertEqual(
+      mock_dfp_client.return_value
+        .GetService.return_value
+        .getCustomTargetingValuesByStatement.call_count,
+      4)
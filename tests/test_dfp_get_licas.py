@@ -0,0 +1,46 @@
+
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.get_licas
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+class DFPGetLicasTests(TestCase):
+
+  @patch('dfp.get_licas.LINE_ITEM_IDS_PER_QUERY', 2)
+  def test_get_licas_for_line_items(self, mock_dfp_client):
+    """
+    It queries line item IDs in chunks and pages through each chunk.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getLineItemCreativeAssociationsByStatement) = MagicMock(side_effect=[
+        {'results': [{'lineItemId': 1, 'creativeId': 11}]},
+        {'results': [{'lineItemId': 2, 'creativeId': 11}]},
+        {},
+        {'results': [{'lineItemId': 3, 'creativeId': 11}]},
+        {},
+      ])
+
+    licas = dfp.get_licas.get_licas_for_line_items([1, 2, 3])
+
+    self.assertEqual([lica['lineItemId'] for lica in licas], [1, 2, 3])
+    get_mock = (mock_dfp_client.return_value
+      .GetService.return_value
+      .getLineItemCreativeAssociationsByStatement)
+    self.assertEqual([call[0][0]['query'] for call in get_mock.call_args_list], [
+      'WHERE lineItemId IN (1, 2) LIMIT 500 OFFSET 0',
+      'WHERE lineItemId IN (1, 2) LIMIT 500 OFFSET 500',
+      'WHERE lineItemId IN (1, 2) LIMIT 500 OFFSET 1000',
+      'WHERE lineItemId IN (3) LIMIT 500 OFFSET 0',
+      'WHERE lineItemId IN (3) LIMIT 500 OFFSET 500',
+    ])
+
+  def test_get_licas_for_no_line_items(self, mock_dfp_client):
+    """
+    It does not call DFP without line items.
+    """
+    self.assertEqual(dfp.get_licas.get_licas_for_line_items([]), [])
+    mock_dfp_client.assert_not_called()
@@ -118,45 +118,53 @@ class DFPGetPlacementsTests(TestCase):
       placement = dfp.get_placements.get_placement_by_name(
         'Not an Existing Placement')
 
-  @patch('dfp.get_placements.get_placement_by_name')
-  def test_get_placement_ids_by_name(self, mock_get_placement_by_name, 
-    mock_dfp_client):
+  def test_get_placement_ids_by_name(self, mock_dfp_client):
     """
     Ensures we return placement IDs.
     """
 
-    # Fake returned placement. Return a different one each time
-    # it is called.
-    mock_get_placement_by_name.side_effect = [
-      {
-        'targetingDescription': None,
-        'targetingSiteName': None,
-        'targetingAdLocation': None,
-        'id': 9988776655,
-        'name': 'Placement One.',
-        'description': None,
-        'placementCode': "111222333444555666",
-        'status': "ACTIVE",
-        'isAdSenseTargetingEnabled': False,
-        'adSenseTargetingLocale': "und",
-        'targetedAdUnitIds': ['123456789'],
-        'lastModifiedDateTime': {},
-      },
-      {
-        'targetingDescription': None,
-        'targetingSiteName': None,
-        'targetingAdLocation': None,
-        'id': 13571357,
-        'name': 'Placement Two.',
-        'description': None,
-        'placementCode': "111222333444555666",
-        'status': "ACTIVE",
-        'isAdSenseTargetingEnabled': False,
-        'adSenseTargetingLocale': "und",
-        'targetedAdUnitIds': ['123456789'],
-        'lastModifiedDateTime': {},
-      }
-    ]
+    mock_dfp_client.return_value = MagicMock()
+
+    # Response from DFP: one page of results for both names.
+    first_page = {
+      'totalResultSetSize': 2,
+      'startIndex': 0,
+      'results': [
+        {
+          'targetingDescription': None,
+          'targetingSiteName': None,
+          'targetingAdLocation': None,
+          'id': 9988776655,
+          'name': 'Placement One.',
+          'description': None,
+          'placementCode': "111222333444555666",
+          'status': "ACTIVE",
+          'isAdSenseTargetingEnabled': False,
+          'adSenseTargetingLocale': "und",
+          'targetedAdUnitIds': ['123456789'],
+          'lastModifiedDateTime': {},
+        },
+        {
+          'targetingDescription': None,
+          'targetingSiteName': None,
+          'targetingAdLocation': None,
+          'id': 13571357,
+          'name': 'Placement Two.',
+          'description': None,
+          'placementCode': "111222333444555666",
+          'status': "ACTIVE",
+          'isAdSenseTargetingEnabled': False,
+          'adSenseTargetingLocale': "und",
+          'targetedAdUnitIds': ['123456789'],
+          'lastModifiedDateTime': {},
+        }
+      ]
+    }
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getPlacementsByStatement) = MagicMock(
+        side_effect=[first_page, {'totalResultSetSize': 2, 'startIndex': 2}])
+
     placement_ids = dfp.get_placements.get_placement_ids_by_name(
       ['Placement One.', 'Placement Two.'])
     self.assertEqual(placement_ids, [9988776655, 13571357])
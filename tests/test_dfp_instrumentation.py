@@ -0,0 +1,138 @@
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+from googleads import errors
+from mock import patch
+
+import dfp.create_line_items
+import dfp.instrumentation
+import tasks.add_new_prebid_partner
+from tests.fake_ad_manager import FakeNetwork, build_network, fake_ad_manager
+
+
+email = 'fakeuser@example.com'
+advertiser = 'My Advertiser'
+placements = ['My Site Leaderboard']
+
+class DFPInstrumentationTests(TestCase):
+
+  def setUp(self):
+    self.metrics_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.metrics_dir)
+
+  def calls_by_phase(self, metrics):
+    calls = {}
+    for (phase, _, method_name), stats in metrics.calls.items():
+      calls.setdefault(phase, {})[method_name] = stats['calls']
+    return calls
+
+  def test_setup_partner_phases(self):
+    """
+    Calls are attributed to the phase they were made in, including calls
+    made from other threads.
+    """
+    network = build_network(email, advertiser, placements=placements)
+    prices = [i * 10000 for i in range(1, 601)]
+    metrics_file = os.path.join(self.metrics_dir, 'metrics.json')
+
+    with fake_ad_manager(network), dfp.instrumentation.instrumented() as metrics, \
+      patch('settings.DFP_METRICS_FILE', metrics_file, create=True), \
+      patch('settings.DFP_LINE_ITEM_BATCH_SIZE', 100, create=True):
+      tasks.add_new_prebid_partner.setup_partner(email, advertiser,
+        'My Order', placements, [], [{'width': '300', 'height': '250'}],
+        'testbidder', prices, 2, 'USD', u'{bidder_code}: HB ${price}')
+
+    calls = self.calls_by_phase(metrics)
+    self.assertEqual(calls['lookups']['getUsersByStatement'], 1)
+    self.assertEqual(calls['orders'],
+      {'getOrdersByStatement': 2, 'createOrders': 2})
+    self.assertEqual(calls['creatives'], {'createCreatives': 1})
+    self.assertEqual(calls['line_item_configs'],
+      {'createCustomTargetingValues': 3})
+    self.assertEqual(calls['line_items'], {'createLineItems': 6})
+    self.assertEqual(calls['licas'],
+      {'createLineItemCreativeAssociations': 3})
+    self.assertNotIn(dfp.instrumentation.NO_PHASE, calls)
+
+    line_items = metrics.calls[
+      ('line_items', 'LineItemService', 'createLineItems')]
+    self.assertEqual(line_items['objects_sent'], 600)
+    self.assertEqual(line_items['objects_received'], 600)
+    self.assertEqual(sum(line_items['latency_buckets']), 6)
+
+    summary = metrics.summary()
+    self.assertIn('line_items:', summary)
+    self.assertIn('LineItemService.createLineItems: 6 calls', summary)
+
+    with open(metrics_file) as json_file:
+      written = json.load(json_file)
+    self.assertEqual(sorted(written['phases']), sorted(['lookups', 'orders',
+      'creatives', 'line_item_configs', 'line_items', 'licas']))
+
+  def test_phases_without_contextvars(self):
+    """
+    Without contextvars (Python 3.6), phases are kept per thread and still
+    reach the threads started with `propagate`.
+    """
+    network = build_network(email, advertiser, placements=placements)
+
+    with patch.object(dfp.instrumentation, 'contextvars', None), \
+      patch.object(dfp.instrumentation, '_thread_phase', threading.local(),
+        create=True), \
+      fake_ad_manager(network), dfp.instrumentation.instrumented() as metrics:
+      tasks.add_new_prebid_partner.setup_partner(email, advertiser,
+        'My Order', placements, [], [{'width': '300', 'height': '250'}],
+        'testbidder', [10000, 20000], 2, 'USD', u'{bidder_code}: HB ${price}')
+      self.assertEqual(dfp.instrumentation.get_phase(),
+        dfp.instrumentation.NO_PHASE)
+
+    calls = self.calls_by_phase(metrics)
+    self.assertEqual(calls['orders'],
+      {'getOrdersByStatement': 1, 'createOrders': 1})
+    self.assertEqual(calls['creatives'], {'createCreatives': 1})
+    self.assertEqual(calls['line_items'], {'createLineItems': 1})
+    self.assertNotIn(dfp.instrumentation.NO_PHASE, calls)
+
+  def test_errors_and_prometheus(self):
+    """
+    Failed calls are counted, and metrics can be written for Prometheus.
+    """
+    network = FakeNetwork()
+    order = network.add('order', name='My Order')
+    network.inject_error('createLineItems', 'PermissionError.PERMISSION_DENIED')
+
+    with fake_ad_manager(network), dfp.instrumentation.instrumented() as metrics:
+      with dfp.instrumentation.phase('line_items'):
+        with self.assertRaises(errors.GoogleAdsServerFault):
+          dfp.create_line_items.create_line_items(
+            [{'orderId': order['id'], 'name': 'a'}])
+        dfp.create_line_items.create_line_items(
+          [{'orderId': order['id'], 'name': 'b'}])
+
+    stats = metrics.calls[('line_items', 'LineItemService', 'createLineItems')]
+    self.assertEqual((stats['calls'], stats['errors']), (2, 1))
+
+    metrics_file = os.path.join(self.metrics_dir, 'metrics.prom')
+    metrics.write(metrics_file)
+    with open(metrics_file) as prom_file:
+      prometheus = prom_file.read()
+    labels = 'phase="line_items",service="LineItemService",method="createLineItems"'
+    self.assertIn('dfp_api_calls_total{%s} 2' % labels, prometheus)
+    self.assertIn('dfp_api_errors_total{%s} 1' % labels, prometheus)
+    self.assertIn('dfp_api_call_seconds_bucket{%s,le="+Inf"} 2' % labels,
+      prometheus)
+
+  def test_inactive(self):
+    """
+    Services are not wrapped when no instrumentation is active.
+    """
+    service = object()
+    self.assertIs(dfp.instrumentation.wrap_service(service, 'OrderService'),
+      service)
@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.get_placements
+import dfp.get_users
+import dfp.lookup_cache
+from dfp.lookup_cache import LookupCache
+
+
+class DFPLookupCacheTests(TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    self.cache_file = os.path.join(self.temp_dir, 'lookup_cache.sqlite3')
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_dir)
+
+  def test_get_and_set(self):
+    """
+    Ensure values are stored per network code and object type.
+    """
+    cache = LookupCache(self.cache_file, ttl=60)
+    cache.set(1234, 'user', 'a@example.com', 5555)
+
+    self.assertEqual(cache.get(1234, 'user', 'a@example.com'), 5555)
+    self.assertIsNone(cache.get(9999, 'user', 'a@example.com'))
+    self.assertIsNone(cache.get(1234, 'advertiser', 'a@example.com'))
+
+  @patch('dfp.lookup_cache.time')
+  def test_expiry(self, mock_time):
+    """
+    Ensure values expire after the TTL.
+    """
+    mock_time.time.return_value = 1000
+    cache = LookupCache(self.cache_file, ttl=60)
+    cache.set(1234, 'user', 'a@example.com', 5555)
+
+    mock_time.time.return_value = 1060
+    self.assertEqual(cache.get(1234, 'user', 'a@example.com'), 5555)
+    mock_time.time.return_value = 1061
+    self.assertIsNone(cache.get(1234, 'user', 'a@example.com'))
+
+  def test_invalidate(self):
+    """
+    Ensure values can be invalidated by type or all at once.
+    """
+    cache = LookupCache(self.cache_file, ttl=60)
+    cache.set(1234, 'user', 'a@example.com', 5555)
+    cache.set(1234, 'placement', 'Top', 6666)
+
+    cache.invalidate(object_type='user')
+    self.assertIsNone(cache.get(1234, 'user', 'a@example.com'))
+    self.assertEqual(cache.get(1234, 'placement', 'Top'), 6666)
+
+    cache.invalidate()
+    self.assertIsNone(cache.get(1234, 'placement', 'Top'))
+
+  @patch('dfp.lookup_cache.get_network_code', return_value='1234')
+  @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+  def test_cached_lookup(self, mock_dfp_client,
+    mock_get_network_code):
+    """
+    Ensure a cached lookup only calls DFP, or loads credentials, once
+    across runs.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getUsersByStatement) = MagicMock(
+        return_value={'results': [{'id': 5555}]})
+
+    with patch('settings.DFP_LOOKUP_CACHE_FILE', self.cache_file,
+      create=True):
+      self.assertEqual(
+        dfp.get_users.get_user_id_by_email('a@example.com'), 5555)
+      self.assertEqual(
+        dfp.get_users.get_user_id_by_email('a@example.com'), 5555)
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getUsersByStatement.assert_called_once())
+    # A cache hit doesn't load the client.
+    mock_dfp_client.assert_called_once()
+
+  @patch('dfp.lookup_cache.get_network_code', return_value='1234')
+  @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+  def test_cached_lookup_many(self, mock_dfp_client,
+    mock_get_network_code):
+    """
+    Ensure only uncached names are looked up in DFP.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    LookupCache(self.cache_file, ttl=60).set('1234', 'placement', 'Top', 6666)
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getPlacementsByStatement) = MagicMock(side_effect=[
+        {'results': [{'id': 7777, 'name': 'Bottom'}]},
+        {},
+      ])
+
+    with patch('settings.DFP_LOOKUP_CACHE_FILE', self.cache_file,
+      create=True):
+      placement_ids = dfp.get_placements.get_placement_ids_by_name(
+        ['Top', 'Bottom'])
+
+    self.assertEqual(placement_ids, [6666, 7777])
+    first_statement = (mock_dfp_client.return_value
+      .GetService.return_value
+      .getPlacementsByStatement.call_args_list[0][0][0])
+    self.assertEqual([value['value']['value']
+      for value in first_statement['values']], ['Bottom'])
+
+  @patch('dfp.lookup_cache.sqlite3.connect')
+  def test_connections_closed(self, mock_connect):
+    """
+    Ensure every connection is closed after use.
+    """
+    mock_connect.return_value.execute.return_value.fetchone.return_value = None
+    cache = LookupCache(self.cache_file, ttl=60)
+    cache.get(1234, 'user', 'a@example.com')
+    cache.set(1234, 'user', 'a@example.com', 5555)
+
+    self.assertEqual(mock_connect.call_count, 3)
+    self.assertEqual(mock_connect.return_value.close.call_count, 3)
+
+  def test_get_lookup_cache_once(self):
+    """
+    Ensure the cache is built once for the same settings.
+    """
+    with patch('settings.DFP_LOOKUP_CACHE_FILE', self.cache_file,
+      create=True):
+      lookup_cache = dfp.lookup_cache.get_lookup_cache()
+      self.assertIs(dfp.lookup_cache.get_lookup_cache(), lookup_cache)
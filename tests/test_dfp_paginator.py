@@ -0,0 +1,73 @@
+
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.paginator
+from tests.fake_ad_manager import FakeNetwork, fake_ad_manager
+
+
+class DFPPaginatorTests(TestCase):
+
+  def setUp(self):
+    self.network = FakeNetwork()
+    self.orders = [self.network.add('order', name='Order {0}'.format(i),
+      advertiserId=i % 2) for i in range(1200)]
+
+  def test_pages_in_order(self):
+    """
+    It fetches every page once, using the total from the first page, and
+    yields them in order.
+    """
+    with fake_ad_manager(self.network):
+      pages = list(dfp.paginator.iter_pages('OrderService',
+        'getOrdersByStatement', max_workers=3))
+
+    self.assertEqual([len(page) for page in pages], [500, 500, 200])
+    self.assertEqual([order['id'] for page in pages for order in page],
+      [order['id'] for order in self.orders])
+    self.assertEqual(self.network.calls['getOrdersByStatement'], 3)
+
+  def test_query_and_page_size(self):
+    """
+    It passes the query and bind variables, and pages by `page_size`.
+    """
+    values = [{'key': 'advertiser_id',
+      'value': {'xsi_type': 'NumberValue', 'value': 1}}]
+    with fake_ad_manager(self.network):
+      orders = dfp.paginator.get_all_results('OrderService',
+        'getOrdersByStatement', 'WHERE advertiserId = :advertiser_id',
+        values, page_size=100, max_workers=1)
+
+    self.assertEqual(len(orders), 600)
+    self.assertTrue(all(order['advertiserId'] == 1 for order in orders))
+    self.assertEqual(self.network.calls['getOrdersByStatement'], 6)
+
+  def test_no_results(self):
+    """
+    It makes one request when there are no results.
+    """
+    with fake_ad_manager(self.network):
+      orders = list(dfp.paginator.iter_results('OrderService',
+        'getOrdersByStatement', "WHERE name = 'missing'"))
+
+    self.assertEqual(orders, [])
+    self.assertEqual(self.network.calls['getOrdersByStatement'], 1)
+
+  @patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+  def test_without_total(self, mock_dfp_client):
+    """
+    It pages until an empty page when DFP reports no total.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getOrdersByStatement) = MagicMock(side_effect=[
+        {'results': [{'id': 1}, {'id': 2}]},
+        {'results': [{'id': 3}]},
+        {},
+      ])
+
+    orders = dfp.paginator.get_all_results('OrderService',
+      'getOrdersByStatement', page_size=2)
+
+    self.assertEqual([order['id'] for order in orders], [1, 2, 3])
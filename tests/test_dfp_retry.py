@@ -0,0 +1,163 @@
+
+import socket
+import time
+from unittest import TestCase
+
+from googleads import errors
+from mock import patch
+
+import dfp.create_line_items
+import dfp.get_custom_targeting
+import dfp.retry
+from tests.fake_ad_manager import FakeNetwork, fake_ad_manager, server_fault
+
+
+@patch.multiple('settings', create=True, DFP_RETRY_BASE_DELAY=0,
+  DFP_MAX_RETRIES=3)
+class DFPRetryTests(TestCase):
+
+  def setUp(self):
+    dfp.retry.reset_rate_limiter()
+    dfp.retry.reset_retry_stats()
+
+  def tearDown(self):
+    dfp.retry.reset_rate_limiter()
+    dfp.retry.reset_retry_stats()
+
+  def test_retries_quota_errors(self):
+    """
+    Quota errors are retried, and throttle later requests.
+    """
+    network = FakeNetwork()
+    network.add('targeting_key', name='hb_pb')
+    network.inject_error('getCustomTargetingKeysByStatement',
+      'QuotaError.EXCEEDED_QUOTA', times=2)
+
+    with fake_ad_manager(network):
+      self.assertIsNotNone(dfp.get_custom_targeting.get_key_id_by_name('hb_pb'))
+
+    self.assertEqual(network.calls['getCustomTargetingKeysByStatement'], 3)
+    stats = dfp.retry.get_retry_stats()
+    self.assertEqual(stats['retries'], 2)
+    self.assertEqual(stats['retries:QuotaError.EXCEEDED_QUOTA'], 2)
+    self.assertIsNotNone(dfp.retry.get_rate_limiter().rate)
+
+  def test_gives_up(self):
+    """
+    It raises the error once the retries run out.
+    """
+    network = FakeNetwork()
+    network.inject_error('getCustomTargetingKeysByStatement', times=10)
+
+    with fake_ad_manager(network):
+      with self.assertRaises(errors.GoogleAdsServerFault):
+        dfp.get_custom_targeting.get_key_id_by_name('hb_pb')
+
+    self.assertEqual(network.calls['getCustomTargetingKeysByStatement'], 4)
+    self.assertEqual(dfp.retry.get_retry_stats()['gave_up'], 1)
+
+  def test_does_not_retry_other_errors(self):
+    """
+    Errors that will not go away on their own are raised immediately.
+    """
+    network = FakeNetwork()
+    network.inject_error('getCustomTargetingKeysByStatement',
+      'PermissionError.PERMISSION_DENIED')
+
+    with fake_ad_manager(network):
+      with self.assertRaises(errors.GoogleAdsServerFault):
+        dfp.get_custom_targeting.get_key_id_by_name('hb_pb')
+
+    self.assertEqual(network.calls['getCustomTargetingKeysByStatement'], 1)
+    self.assertEqual(dfp.retry.get_retry_stats(), {})
+
+  def test_splits_batches_that_are_too_large(self):
+    """
+    A batch rejected as too large is split, and later batches shrink too.
+    """
+    network = FakeNetwork()
+    order = network.add('order', name='My Order')
+    network.inject_error('createLineItems', 'CollectionSizeError.TOO_LARGE')
+
+    with fake_ad_manager(network):
+      line_item_ids = dfp.create_line_items.create_line_items(
+        [{'orderId': order['id'], 'name': str(i)} for i in range(12)],
+        batch_size=8, max_workers=1)
+
+    self.assertEqual(len(line_item_ids), 12)
+    self.assertEqual([line_item['name'] for line_item in network.get_all('line_item')],
+      [str(i) for i in range(12)])
+    # One rejected batch of 8, then 3 batches of 4.
+    self.assertEqual(network.calls['createLineItems'], 4)
+    self.assertEqual(dfp.retry.get_retry_stats()['batch_splits'], 1)
+
+  def test_transport_errors_only_retried_for_reads(self):
+    """
+    Timeouts are retried for reads, but not for creates, which DFP may have
+    carried out before the connection failed.
+    """
+    network = FakeNetwork()
+    network.add('targeting_key', name='hb_pb')
+    order = network.add('order', name='My Order')
+    network.inject_error('getCustomTargetingKeysByStatement', socket.timeout())
+    network.inject_error('createLineItems',
+      errors.GoogleAdsSoapTransportError('timed out'))
+
+    with fake_ad_manager(network):
+      self.assertIsNotNone(dfp.get_custom_targeting.get_key_id_by_name('hb_pb'))
+      with self.assertRaises(errors.GoogleAdsSoapTransportError):
+        dfp.create_line_items.create_line_items(
+          [{'orderId': order['id'], 'name': 'li'}], max_workers=1)
+
+    self.assertEqual(network.calls['getCustomTargetingKeysByStatement'], 2)
+    self.assertEqual(network.calls['createLineItems'], 1)
+    self.assertEqual(dfp.retry.get_retry_stats()['retries'], 1)
+
+  def test_error_strings(self):
+    """
+    It finds the DFP error in the fault's errors or its message.
+    """
+    self.assertEqual(dfp.retry.get_error_strings(
+      server_fault('QuotaError.EXCEEDED_QUOTA')), ['QuotaError.EXCEEDED_QUOTA'])
+    self.assertEqual(dfp.retry.get_error_strings(errors.GoogleAdsServerFault(
+      None, message='[ServerError.SERVER_BUSY @ ]')), ['ServerError.SERVER_BUSY'])
+    self.assertTrue(dfp.retry.is_retryable(
+      errors.GoogleAdsSoapTransportError('timed out')))
+    self.assertFalse(dfp.retry.is_retryable(
+      errors.GoogleAdsSoapTransportError('timed out'),
+      retry_transport_errors=False))
+    self.assertTrue(dfp.retry.is_retryable(
+      server_fault('ServerError.SERVER_BUSY'), retry_transport_errors=False))
+    self.assertTrue(dfp.retry.is_idempotent('getLineItemsByStatement'))
+    self.assertTrue(dfp.retry.is_idempotent('updateLineItems'))
+    self.assertFalse(dfp.retry.is_idempotent('createLineItems'))
+    self.assertFalse(dfp.retry.is_retryable(ValueError()))
+
+class RateLimiterTests(TestCase):
+
+  def test_token_bucket(self):
+    """
+    It allows a second's worth of requests at once, then paces the rest.
+    """
+    limiter = dfp.retry.RateLimiter(20)
+    start = time.time()
+    for _ in range(25):
+      limiter.acquire()
+    self.assertGreaterEqual(time.time() - start, 0.2)
+
+  def test_adapts_to_quota_errors(self):
+    """
+    It halves the rate on quota errors and recovers on success.
+    """
+    limiter = dfp.retry.RateLimiter(8)
+    limiter.on_quota_error()
+    self.assertEqual(limiter.rate, 4)
+    for _ in range(100):
+      limiter.on_success()
+    self.assertEqual(limiter.rate, 8)
+
+    unlimited = dfp.retry.RateLimiter()
+    self.assertEqual(unlimited.acquire(), 0)
+    self.assertIsNone(unlimited.rate)
+    unlimited.on_quota_error()
+    self.assertIsNotNone(unlimited.rate)
@@ -0,0 +1,98 @@
+
+from unittest import TestCase
+
+from googleads import errors
+
+import dfp.create_line_items
+import dfp.get_custom_targeting
+import tasks.add_new_prebid_partner
+from tasks.price_utils import get_prices_array
+from tests.fake_ad_manager import (
+  FakeNetwork,
+  build_network,
+  fake_ad_manager,
+)
+
+
+email = 'fakeuser@example.com'
+advertiser = 'My Advertiser'
+placements = ['My Site Leaderboard', 'Another Placement']
+sizes = [{'width': '728', 'height': '90'}]
+price_buckets = {
+  'precision': 2,
+  'min': 0,
+  'max': 20,
+  'increment': 0.10,
+}
+
+class FakeAdManagerTests(TestCase):
+
+  def test_setup_partner(self):
+    """
+    A full partner setup runs against the fake network.
+    """
+    network = build_network(email, advertiser, placements=placements)
+    prices = get_prices_array(price_buckets)
+
+    with fake_ad_manager(network):
+      tasks.add_new_prebid_partner.setup_partner(email, advertiser,
+        'My Order', placements, [], sizes, 'testbidder', prices, 2, 'USD',
+        u'{bidder_code}: HB ${price}')
+
+    orders = network.get_all('order')
+    self.assertEqual([order['name'] for order in orders], ['My Order'])
+
+    line_items = network.get_all('line_item')
+    self.assertEqual(len(line_items), len(prices))
+    self.assertTrue(all(line_item['orderId'] == orders[0]['id']
+      for line_item in line_items))
+    self.assertEqual(len(network.get_all('creative')), 2)
+    self.assertEqual(len(network.get_all('lica')), 2 * len(prices))
+
+    value_names = [value['name'] for value in network.get_all('targeting_value')]
+    self.assertIn('testbidder', value_names)
+    self.assertIn('19.90', value_names)
+
+  def test_paging(self):
+    """
+    Results are returned in pages of at most 500.
+    """
+    network = FakeNetwork()
+    key = network.add('targeting_key', name='hb_pb', status='ACTIVE')
+    for i in range(1200):
+      network.add('targeting_value', name=str(i), displayName=str(i),
+        customTargetingKeyId=key['id'], status='ACTIVE')
+
+    with fake_ad_manager(network):
+      values = dfp.get_custom_targeting.get_targeting_by_key_name('hb_pb')
+
+    self.assertEqual(len(values), 1200)
+    self.assertEqual(network.calls['getCustomTargetingValuesByStatement'], 3)
+
+  def test_inject_error(self):
+    """
+    Injected errors are raised by the next calls to the method.
+    """
+    network = FakeNetwork()
+    network.inject_error('getCustomTargetingKeysByStatement',
+      'PermissionError.PERMISSION_DENIED')
+
+    with fake_ad_manager(network):
+      with self.assertRaises(errors.GoogleAdsServerFault) as context:
+        dfp.get_custom_targeting.get_key_id_by_name('hb_pb')
+      self.assertEqual(context.exception.errors[0]['errorString'],
+        'PermissionError.PERMISSION_DENIED')
+      self.assertIsNone(dfp.get_custom_targeting.get_key_id_by_name('hb_pb'))
+
+  def test_line_item_limit(self):
+    """
+    It enforces DFP's limit on line items per order.
+    """
+    network = FakeNetwork()
+    order = network.add('order', name='My Order')
+
+    with fake_ad_manager(network) as network:
+      with self.assertRaises(errors.GoogleAdsServerFault):
+        dfp.create_line_items.create_line_items(
+          [{'orderId': order['id'], 'name': str(i)} for i in range(451)],
+          batch_size=500)
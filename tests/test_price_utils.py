@@ -2,9 +2,12 @@
 from unittest import TestCase
 
 from tasks.price_utils import (
+  PriceTable,
   num_to_micro_amount,
   num_to_str,
+  get_price_bucket_ranges,
   get_prices_array,
+  get_prices_array_from_ranges,
   get_prices_summary_string,
   micro_amount_to_num,
 )
@@ -148,6 +151,74 @@ class UtilsTests(TestCase):
     }
     self.assertEqual(len(get_prices_array(config)), 1501)
 
+  def test_get_price_bucket_ranges(self):
+    """
+    It normalizes every form of the price bucket setting.
+    """
+    single_range = {
+      'precision': 2,
+      'min' : 0,
+      'max' : 20,
+      'increment': 0.10,
+    }
+    self.assertEqual(get_price_bucket_ranges(single_range), [single_range])
+
+    self.assertEqual(get_price_bucket_ranges('auto'), [
+      {'precision': 2, 'min': 0, 'max': 5, 'increment': 0.05},
+      {'precision': 2, 'min': 5, 'max': 10, 'increment': 0.1},
+      {'precision': 2, 'min': 10, 'max': 20, 'increment': 0.5},
+    ])
+
+    # Prebid-style custom buckets default "min" to the previous "max".
+    custom = {
+      'buckets': [
+        {'max': 5, 'increment': 0.25},
+        {'precision': 3, 'max': 10, 'increment': 1},
+      ]
+    }
+    self.assertEqual(get_price_bucket_ranges(custom), [
+      {'precision': 2, 'min': 0, 'max': 5, 'increment': 0.25},
+      {'precision': 3, 'min': 5, 'max': 10, 'increment': 1},
+    ])
+    self.assertEqual(get_price_bucket_ranges(custom['buckets']),
+      get_price_bucket_ranges(custom))
+
+    with self.assertRaises(KeyError):
+      get_price_bucket_ranges('extra-dense')
+
+  def test_get_prices_array_from_ranges(self):
+    """
+    It merges ranges into one sorted array without duplicates.
+    """
+    prices = get_prices_array_from_ranges([
+      {'precision': 2, 'min': 1, 'max': 2, 'increment': 0.5},
+      {'precision': 2, 'min': 0, 'max': 1, 'increment': 0.25},
+    ])
+    self.assertEqual(prices, [0, 250000, 500000, 750000, 1000000, 1500000,
+      2000000])
+
+  def test_get_prices_array_from_presets(self):
+    """
+    It creates the expected number of prices for each preset.
+    """
+    def get_preset_prices(name):
+      return get_prices_array_from_ranges(get_price_bucket_ranges(name))
+
+    self.assertEqual(len(get_preset_prices('low')), 11)
+    self.assertEqual(len(get_preset_prices('medium')), 201)
+    self.assertEqual(len(get_preset_prices('high')), 2001)
+
+    # 0-5 by 0.05, 5.10-10 by 0.1, 10.50-20 by 0.5
+    auto_prices = get_preset_prices('auto')
+    self.assertEqual(len(auto_prices), 101 + 50 + 20)
+    self.assertEqual(auto_prices[100:102], [5000000, 5100000])
+
+    # 0-3 by 0.01, 3.05-8 by 0.05, 8.50-20 by 0.5
+    dense_prices = get_preset_prices('dense')
+    self.assertEqual(len(dense_prices), 301 + 100 + 24)
+    self.assertEqual(dense_prices, sorted(set(dense_prices)))
+    self.assertEqual(dense_prices[-1], 20000000)
+
   def test_get_prices_summary_string(self):
     """
     It returns the expected string summary of the array.
@@ -171,3 +242,33 @@ class UtilsTests(TestCase):
         precision=4),
       '8.2200, 8.0600, 8.4271, 8.0000'
     )
+
+  def test_price_table_to_strs(self):
+    """
+    It formats every price like the scalar helpers.
+    """
+    prices = get_prices_array_from_ranges(get_price_bucket_ranges('dense'))
+    table = PriceTable(prices)
+    self.assertEqual(len(table), len(prices))
+    self.assertEqual(table.to_strs(),
+      [num_to_str(micro_amount_to_num(price)) for price in prices])
+    self.assertEqual(table.to_strs(0)[:3], ['0', '0', '0'])
+    self.assertEqual(PriceTable([1500000]).to_strs(7), ['1.5000000'])
+
+  def test_price_table_exact(self):
+    """
+    It formats with integer arithmetic, rounding half to even.
+    """
+    table = PriceTable([125000, 135000, 9007199254740993])
+    self.assertEqual(table.to_strs(),
+      ['0.12', '0.14', '9007199254.74'])
+    self.assertEqual(PriceTable([9007199254740993]).to_strs(6),
+      ['9007199254.740993'])
+
+  def test_price_table_to_names(self):
+    """
+    It formats a line item name for every price.
+    """
+    table = PriceTable.from_ranges(get_price_bucket_ranges('low'))
+    self.assertEqual(table.to_names(u'{bidder_code}: HB ${price}', 'ax')[:2],
+      [u'ax: HB $0.00', u'ax: HB $0.50'])
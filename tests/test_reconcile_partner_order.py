@@ -0,0 +1,174 @@
+
+from unittest import TestCase
+
+from mock import patch
+
+import tasks.add_new_prebid_partner
+from tests.fake_ad_manager import build_network, fake_ad_manager
+
+
+EMAIL = 'fakeuser@example.com'
+ADVERTISER = 'My Advertiser'
+PLACEMENTS = ['My Placement']
+
+def criteria(hb_pb_value_id):
+  return {
+    'xsi_type': 'CustomCriteriaSet',
+    'logicalOperator': 'AND',
+    'children': [
+      {'xsi_type': 'CustomCriteria', 'keyId': 1, 'valueIds': [10], 'operator': 'IS'},
+      {'xsi_type': 'CustomCriteria', 'keyId': 2, 'valueIds': [hb_pb_value_id], 'operator': 'IS'},
+    ],
+  }
+
+def line_item(name, micro_amount, hb_pb_value_id, line_item_id=None):
+  obj = {
+    'name': name,
+    'orderId': 111,
+    'costPerUnit': {'currencyCode': 'USD', 'microAmount': micro_amount},
+    'targeting': {'customTargeting': criteria(hb_pb_value_id)},
+  }
+  if line_item_id is not None:
+    obj['id'] = line_item_id
+  return obj
+
+def setup_partner(prices, reconcile=False):
+  tasks.add_new_prebid_partner.setup_partner(EMAIL, ADVERTISER, 'My Order',
+    PLACEMENTS, [], [{'width': '300', 'height': '250'}], 'appnexus', prices,
+    2, 'USD', u'{bidder_code}: HB ${price}', reconcile=reconcile)
+
+class ReconcilePartnerOrderTests(TestCase):
+
+  def test_get_line_item_diff(self):
+    """
+    It matches line items by name, then by hb_pb value, and reports drift.
+    """
+    existing = [
+      line_item('HB $0.10', 100000, 21, line_item_id=501),
+      line_item('old name', 200000, 22, line_item_id=502),
+      line_item('HB $0.30', 350000, 23, line_item_id=503),
+    ]
+    configs = [
+      line_item('HB $0.10', 100000, 21),
+      line_item('HB $0.20', 200000, 22),
+      line_item('HB $0.30', 300000, 23),
+      line_item('HB $0.40', 400000, 24),
+    ]
+
+    diff = tasks.add_new_prebid_partner.get_line_item_diff(iter(configs),
+      existing, hb_pb_key_id=2)
+
+    self.assertEqual([config['name'] for config in diff['missing']],
+      ['HB $0.40'])
+    self.assertEqual(diff['line_item_ids'], [501, 502, 503, None])
+    self.assertEqual(
+      [(obj['id'], obj['name'], obj['costPerUnit']['microAmount'])
+        for obj in diff['drifted']],
+      [(502, 'HB $0.20', 200000), (503, 'HB $0.30', 300000)])
+
+  def test_reconcile(self):
+    """
+    A rerun only creates what is missing and fixes drifted CPMs.
+    """
+    network = build_network(EMAIL, ADVERTISER, placements=PLACEMENTS)
+    with fake_ad_manager(network):
+      setup_partner([100000, 200000, 300000])
+
+      line_items = network.get_all('line_item')
+      # Someone changed a CPM by hand.
+      network._objects['line_item'][line_items[1]['id']]['costPerUnit']['microAmount'] = 250000
+      network.calls.clear()
+
+      with patch('settings.DFP_USE_EXISTING_ORDER_IF_EXISTS', False,
+        create=True):
+        setup_partner([100000, 200000, 300000, 400000], reconcile=True)
+
+    self.assertEqual(len(network.get_all('order')), 1)
+    self.assertEqual(len(network.get_all('creative')), 2)
+    line_items = network.get_all('line_item')
+    self.assertEqual(len(line_items), 4)
+    self.assertEqual([obj['costPerUnit']['microAmount'] for obj in line_items],
+      [100000, 200000, 300000, 400000])
+    self.assertEqual(len(network.get_all('lica')), 8)
+
+    self.assertEqual(network.calls['createOrders'], 0)
+    self.assertEqual(network.calls['createCreatives'], 0)
+    self.assertEqual(network.calls['createLineItems'], 1)
+    self.assertEqual(network.calls['updateLineItems'], 1)
+    self.assertEqual(network.calls['createLineItemCreativeAssociations'], 1)
+
+  def reconcile_line_items_by_order(self, prices, new_prices):
+    """
+    Sets up a partner with `prices`, then reconciles it with `new_prices`,
+    five line items per order. Returns the names of the line items of each
+    order.
+    """
+    network = build_network(EMAIL, ADVERTISER, placements=PLACEMENTS)
+    with fake_ad_manager(network), patch(
+      'settings.DFP_MAX_LINE_ITEMS_PER_ORDER', 5, create=True):
+      setup_partner(prices)
+      with patch('settings.DFP_USE_EXISTING_ORDER_IF_EXISTS', False,
+        create=True):
+        setup_partner(new_prices, reconcile=True)
+
+    order_names = dict((order['id'], order['name'])
+      for order in network.get_all('order'))
+    line_items_by_order = {}
+    for obj in network.get_all('line_item'):
+      line_items_by_order.setdefault(order_names[obj['orderId']], []).append(
+        obj['name'])
+    return line_items_by_order
+
+  def test_reconcile_unsharded_into_shards(self):
+    """
+    When a setup outgrows one order, the existing order is kept and only
+    the missing line items go in a new one.
+    """
+    prices = [i * 10000 for i in range(1, 8)]
+    line_items_by_order = self.reconcile_line_items_by_order(prices[:5],
+      prices)
+
+    self.assertEqual(sorted(line_items_by_order), ['My Order',
+      'My Order (1/2)'])
+    self.assertEqual(len(line_items_by_order['My Order']), 5)
+    self.assertEqual(len(line_items_by_order['My Order (1/2)']), 2)
+    names = sum(line_items_by_order.values(), [])
+    self.assertEqual(len(names), len(set(names)))
+
+  def test_reconcile_keeps_orders_within_limit(self):
+    """
+    When the shard boundaries move, no order ends up with more line items
+    than the limit and none are duplicated.
+    """
+    # A cheaper price moves every existing line item up a slot.
+    prices = [i * 10000 for i in range(1, 10)]
+    line_items_by_order = self.reconcile_line_items_by_order(prices[1:7],
+      prices)
+
+    self.assertEqual(sorted(line_items_by_order), ['My Order (1/2)',
+      'My Order (2/2)'])
+    self.assertEqual(len(line_items_by_order['My Order (1/2)']), 5)
+    self.assertEqual(len(line_items_by_order['My Order (2/2)']), 4)
+    names = sum(line_items_by_order.values(), [])
+    self.assertEqual(len(names), 9)
+    self.assertEqual(len(names), len(set(names)))
+
+  def test_get_existing_partner_orders(self):
+    """
+    It finds the unsharded order and its shards for any number of shards,
+    and no other orders.
+    """
+    with patch('dfp.get_orders.get_order_by_name',
+      return_value={'id': 1, 'name': 'My Order'}), patch(
+      'dfp.get_orders.get_orders_by_name_pattern') as mock_get_orders:
+      mock_get_orders.return_value = [
+        {'id': 4, 'name': 'My Order (2/3)'},
+        {'id': 2, 'name': 'My Order (1/2)'},
+        {'id': 5, 'name': 'My Order (copy) (1/2)'},
+        {'id': 3, 'name': 'My Order (1/3)'},
+      ]
+      orders = tasks.add_new_prebid_partner.get_existing_partner_orders(
+        'My Order')
+
+    mock_get_orders.assert_called_once_with('My Order (%/%)')
+    self.assertEqual([order['id'] for order in orders], [1, 2, 3, 4])
@@ -0,0 +1,117 @@
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from mock import patch
+
+from tasks.setup_journal import (
+  NullSetupJournal,
+  SetupJournal,
+  get_setup_journal,
+)
+
+
+class SetupJournalTests(TestCase):
+
+  def setUp(self):
+    self.journal_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.journal_dir, 'nested', 'journal.jsonl')
+
+  def tearDown(self):
+    shutil.rmtree(self.journal_dir)
+
+  def test_round_trip(self):
+    """
+    It saves each step and loads it back when resuming.
+    """
+    journal = SetupJournal(self.path)
+    journal.record_order('My Order', 1234)
+    journal.record_creatives([11, 22])
+    journal.record_line_items([{'id': 555, 'name': 'appnexus: HB $0.10'}])
+    journal.record_licas([{'lineItemId': 555, 'creativeId': 11}])
+
+    # One record is appended per step.
+    with open(self.path, 'r') as journal_file:
+      self.assertEqual(len(journal_file.readlines()), 4)
+
+    resumed = SetupJournal(self.path, resume=True)
+    self.assertTrue(resumed.resuming)
+    self.assertEqual(resumed.get_order_id('My Order'), 1234)
+    self.assertEqual(resumed.get_creative_ids(), [11, 22])
+    self.assertEqual(resumed.get_line_item_ids_by_name(),
+      {'appnexus: HB $0.10': 555})
+    self.assertEqual(resumed.get_licas(), {(555, 11)})
+    self.assertFalse(resumed.is_done())
+
+    resumed.record_line_items([{'id': 556, 'name': 'appnexus: HB $0.20'}])
+    resumed.mark_done()
+    resumed = SetupJournal(self.path, resume=True)
+    self.assertEqual(resumed.get_line_item_ids_by_name(),
+      {'appnexus: HB $0.10': 555, 'appnexus: HB $0.20': 556})
+    self.assertTrue(resumed.is_done())
+
+  def test_ignores_partial_record(self):
+    """
+    It ignores a last record cut short by a crash.
+    """
+    journal = SetupJournal(self.path)
+    journal.record_order('My Order', 1234)
+    with open(self.path, 'a') as journal_file:
+      journal_file.write('{"line_items": [["appnexus: HB $0.1')
+
+    resumed = SetupJournal(self.path, resume=True)
+    self.assertEqual(resumed.get_order_id('My Order'), 1234)
+    self.assertEqual(resumed.get_line_item_ids_by_name(), {})
+
+  def test_without_resume_starts_empty(self):
+    """
+    It ignores an existing journal unless resuming.
+    """
+    SetupJournal(self.path).record_order('My Order', 1234)
+
+    journal = SetupJournal(self.path)
+    self.assertFalse(journal.resuming)
+    self.assertIsNone(journal.get_order_id('My Order'))
+
+    # Its first record replaces the old journal.
+    journal.record_order('Other Order', 5678)
+    resumed = SetupJournal(self.path, resume=True)
+    self.assertIsNone(resumed.get_order_id('My Order'))
+    self.assertEqual(resumed.get_order_id('Other Order'), 5678)
+
+  def test_for_order(self):
+    """
+    It names the journal after the order, in DFP_SETUP_JOURNAL_DIR.
+    """
+    with patch('settings.DFP_SETUP_JOURNAL_DIR', self.journal_dir,
+      create=True):
+      journal = SetupJournal.for_order(u'Prebid: appnexus (1/2)')
+    self.assertEqual(journal.path,
+      os.path.join(self.journal_dir, 'Prebid_appnexus_1_2_.jsonl'))
+
+  def test_get_setup_journal(self):
+    """
+    It only journals setups that are resumed, unless DFP_SETUP_JOURNAL is
+    enabled.
+    """
+    with patch('settings.DFP_SETUP_JOURNAL_DIR', self.journal_dir,
+      create=True):
+      self.assertIsInstance(get_setup_journal('My Order'), NullSetupJournal)
+      journal = get_setup_journal('My Order', resume=True)
+      self.assertIsInstance(journal, SetupJournal)
+      self.assertTrue(journal.resuming)
+      with patch('settings.DFP_SETUP_JOURNAL', True, create=True):
+        journal = get_setup_journal('My Order')
+      self.assertIsInstance(journal, SetupJournal)
+      self.assertFalse(journal.resuming)
+
+  def test_null_journal(self):
+    """
+    It records nothing.
+    """
+    journal = NullSetupJournal()
+    journal.record_order('My Order', 1234)
+    self.assertFalse(journal.resuming)
+    self.assertIsNone(journal.get_order_id('My Order'))
+    self.assertEqual(journal.get_licas(), set())
@@ -0,0 +1,141 @@
+import threading
+from unittest import TestCase
+
+from googleads.errors import GoogleAdsServerFault
+from mock import MagicMock, patch
+
+import dfp.aio
+import tasks.add_new_prebid_partner
+from tests.fake_ad_manager import build_network, fake_ad_manager
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromStorage')
+@patch('tasks.add_new_prebid_partner.create_partner_order')
+@patch('tasks.add_new_prebid_partner.DFPValueIdGetter')
+@patch('tasks.add_new_prebid_partner.get_or_create_dfp_targeting_key')
+@patch('dfp.get_advertisers')
+@patch('dfp.get_ad_units')
+@patch('dfp.get_placements')
+@patch('dfp.get_users')
+class SetupPartnerAsyncTests(TestCase):
+
+  def setup_mocks(self, mock_get_users, mock_get_placements,
+    mock_get_ad_units, mock_get_advertisers, mock_get_key,
+    mock_value_getter):
+    mock_get_users.get_user_id_by_email = MagicMock(return_value=14523)
+    mock_get_placements.get_placement_ids_by_name = MagicMock(
+      return_value=[1234567])
+    mock_get_ad_units.get_ad_unit_ids_by_name = MagicMock(return_value=[])
+    mock_get_advertisers.get_advertiser_id_by_name = MagicMock(
+      return_value=246810)
+    mock_get_key.return_value = 999999
+    mock_value_getter.return_value = 'value getter'
+
+  def setup_args(self):
+    return ('fakeuser@example.com', 'My Advertiser', 'My Order',
+      ['My Placement'], [], [{'width': '300', 'height': '250'}], 'appnexus',
+      [100000, 200000], 2, 'USD', u'{bidder_code}: HB ${price}')
+
+  def test_setup_partner_async(self, mock_get_users, mock_get_placements,
+    mock_get_ad_units, mock_get_advertisers, mock_get_key,
+    mock_value_getter, mock_create_partner_order, mock_dfp_client):
+    """
+    It resolves the same dependencies as `setup_partner`.
+    """
+    self.setup_mocks(mock_get_users, mock_get_placements, mock_get_ad_units,
+      mock_get_advertisers, mock_get_key, mock_value_getter)
+
+    dfp.aio.run_until_complete(
+      tasks.add_new_prebid_partner.setup_partner_async(*self.setup_args()))
+
+    mock_create_partner_order.assert_called_once_with(14523, 246810,
+      'My Order', [1234567], [], [{'width': '300', 'height': '250'}],
+      'appnexus', [100000, 200000], 2, 'USD', u'{bidder_code}: HB ${price}',
+      999999, 999999, 'value getter', 'value getter', False, '', None)
+    mock_get_key.assert_any_call('hb_bidder')
+    mock_get_key.assert_any_call('hb_pb')
+
+  def test_lookups_run_concurrently(self, mock_get_users,
+    mock_get_placements, mock_get_ad_units, mock_get_advertisers,
+    mock_get_key, mock_value_getter, mock_create_partner_order,
+    mock_dfp_client):
+    """
+    The async setup runs the lookups at the same time.
+    """
+    self.setup_mocks(mock_get_users, mock_get_placements, mock_get_ad_units,
+      mock_get_advertisers, mock_get_key, mock_value_getter)
+
+    # Each lookup waits for the others to start, which only happens if they
+    # run concurrently. Run one after another, the barrier breaks.
+    barrier = threading.Barrier(4, timeout=5)
+    def lookup(return_value):
+      def call(*args, **kwargs):
+        barrier.wait()
+        return return_value
+      return MagicMock(side_effect=call)
+    mock_get_users.get_user_id_by_email = lookup(14523)
+    mock_get_placements.get_placement_ids_by_name = lookup([1234567])
+    mock_get_ad_units.get_ad_unit_ids_by_name = lookup([])
+    mock_get_advertisers.get_advertiser_id_by_name = lookup(246810)
+
+    dfp.aio.run_until_complete(
+      tasks.add_new_prebid_partner.setup_partner_async(*self.setup_args()),
+      max_workers=6)
+
+    self.assertFalse(barrier.broken)
+    mock_create_partner_order.assert_called_once()
+
+class BackgroundCreativesTests(TestCase):
+
+  def setUp(self):
+    self.network = build_network('fakeuser@example.com', 'My Advertiser',
+      placements=['My Placement'])
+
+  def setup_partner(self):
+    tasks.add_new_prebid_partner.setup_partner('fakeuser@example.com',
+      'My Advertiser', 'My Order', ['My Placement'], [],
+      [{'width': '300', 'height': '250'}], 'appnexus', [100000, 200000], 2,
+      'USD', u'{bidder_code}: HB ${price}')
+
+  def test_creatives_reported_when_orders_fail(self):
+    """
+    If the order fails, it waits for the creatives and logs their IDs.
+    """
+    self.network.inject_error('createOrders', 'UniqueError.NOT_UNIQUE')
+
+    with fake_ad_manager(self.network), patch(
+      'tasks.add_new_prebid_partner.logger') as mock_logger:
+      with self.assertRaises(GoogleAdsServerFault):
+        self.setup_partner()
+
+    creative_ids = [creative['id']
+      for creative in self.network.get_all('creative')]
+    self.assertEqual(len(creative_ids), 2)
+    self.assertIn('{0}, {1}'.format(*creative_ids),
+      mock_logger.warning.call_args[0][0])
+
+  def test_creative_error_reported_when_orders_fail(self):
+    """
+    If the creatives fail too, their error is logged.
+    """
+    self.network.inject_error('createOrders', 'UniqueError.NOT_UNIQUE')
+    self.network.inject_error('createCreatives', 'UniqueError.NOT_UNIQUE')
+
+    with fake_ad_manager(self.network), patch(
+      'tasks.add_new_prebid_partner.logger') as mock_logger:
+      with self.assertRaises(GoogleAdsServerFault):
+        self.setup_partner()
+
+    self.assertIn('Creating the creatives also failed',
+      mock_logger.error.call_args[0][0])
+
+  def test_creative_error_raised(self):
+    """
+    If only the creatives fail, their error is raised.
+    """
+    self.network.inject_error('createCreatives', 'UniqueError.NOT_UNIQUE')
+
+    with fake_ad_manager(self.network):
+      with self.assertRaises(GoogleAdsServerFault):
+        self.setup_partner()
+    self.assertEqual(self.network.get_all('line_item'), [])
@@ -0,0 +1,119 @@
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import patch
+
+import tasks.add_new_prebid_partner
+from dfp.lookup_cache import LookupCache
+from tasks import setup_plan
+from tests.fake_ad_manager import build_network, fake_ad_manager
+
+
+SIZES = [{'width': '300', 'height': '250'}]
+
+def compile_test_plan(prices):
+  return tasks.add_new_prebid_partner.compile_plan('fakeuser@example.com',
+    'My Advertiser', 'My Order', ['My Placement'], [], SIZES, 'appnexus',
+    prices, 2, 'USD', u'{bidder_code}: HB ${price}')
+
+class SetupPlanTests(TestCase):
+
+  def setUp(self):
+    self.plan_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.plan_dir, 'plan.json')
+
+  def tearDown(self):
+    shutil.rmtree(self.plan_dir)
+
+  def test_resolve(self):
+    """
+    It replaces each placeholder with its ID, and fails on unknown ones.
+    """
+    obj = {'orderId': setup_plan.ref('order', 0),
+      'ids': [setup_plan.ref('placement', 'My Placement'), 5]}
+    self.assertEqual(setup_plan.find_refs(obj),
+      {'order:0', 'placement:My Placement'})
+    self.assertEqual(
+      setup_plan.resolve(obj, {'order:0': 11, 'placement:My Placement': 22}),
+      {'orderId': 11, 'ids': [22, 5]})
+    with self.assertRaises(ValueError):
+      setup_plan.resolve(obj, {'order:0': 11})
+
+  def test_compile_plan(self):
+    """
+    It builds every config without calling DFP, and writes it with counts
+    and sizes.
+    """
+    with fake_ad_manager(build_network('fakeuser@example.com',
+      'My Advertiser')) as network:
+      plan = compile_test_plan([100000, 200000, 300000])
+    self.assertEqual(sum(network.calls.values()), 0)
+
+    self.assertEqual(plan['orders'][0]['advertiserId'],
+      setup_plan.ref('advertiser', 'My Advertiser'))
+    self.assertEqual(plan['line_items'][1]['orderId'],
+      setup_plan.ref('order', 0))
+    self.assertEqual(
+      plan['line_items'][1]['targeting']['customTargeting']['children'][1]['valueIds'],
+      [setup_plan.ref('targeting_value', 'hb_pb:0.20')])
+    self.assertEqual(plan['licas'][5], {'lineItemId': setup_plan.ref('line_item', 2),
+      'creativeId': setup_plan.ref('creative', 1), 'sizes': SIZES})
+
+    summary = setup_plan.write_plan(plan, self.path)
+    self.assertEqual(summary['line_items']['count'], 3)
+    self.assertEqual(summary['licas']['count'], 6)
+    self.assertGreater(summary['creatives']['bytes'], 0)
+
+    loaded = setup_plan.load_plan(self.path)
+    self.assertEqual(loaded['summary'], summary)
+    self.assertEqual(loaded['licas'], plan['licas'])
+
+  def test_compile_plan_cached_ids(self):
+    """
+    It takes cached IDs from the lookup cache without loading a client.
+    """
+    cache_file = os.path.join(self.plan_dir, 'lookups.sqlite3')
+    LookupCache(cache_file, ttl=60).set('1234', 'advertiser', 'My Advertiser',
+      246810)
+
+    with patch('settings.DFP_LOOKUP_CACHE_FILE', cache_file, create=True), \
+      patch('dfp.client._network_codes', {}), \
+      patch('dfp.client.open', create=True) as mock_open, \
+      patch('dfp.client.get_client',
+        side_effect=AssertionError('get_client was called')), \
+      patch('dfp.client._load_client',
+        side_effect=AssertionError('a client was loaded')), \
+      patch('yaml.safe_load',
+        return_value={'ad_manager': {'network_code': '1234'}}):
+      plan = compile_test_plan([100000, 200000])
+
+    mock_open.assert_called_once()
+    self.assertEqual(plan['orders'][0]['advertiserId'], 246810)
+    self.assertEqual(plan['orders'][0]['traffickerId'],
+      setup_plan.ref('user', 'fakeuser@example.com'))
+
+  def test_apply_plan(self):
+    """
+    It creates a saved plan's objects against the network.
+    """
+    network = build_network('fakeuser@example.com', 'My Advertiser',
+      placements=['My Placement'])
+    with fake_ad_manager(network):
+      setup_plan.write_plan(compile_test_plan([100000, 200000]), self.path)
+      order_ids = tasks.add_new_prebid_partner.apply_plan(
+        setup_plan.load_plan(self.path))
+
+    orders = network.get_all('order')
+    self.assertEqual(order_ids, [orders[0]['id']])
+    line_items = network.get_all('line_item')
+    self.assertEqual(len(line_items), 2)
+    self.assertEqual(set(line_item['orderId'] for line_item in line_items),
+      set(order_ids))
+    self.assertEqual(
+      line_items[0]['targeting']['inventoryTargeting']['targetedPlacementIds'],
+      [network.get_all('placement')[0]['id']])
+    self.assertEqual(len(network.get_all('creative')), 2)
+    self.assertEqual(len(network.get_all('lica')), 4)
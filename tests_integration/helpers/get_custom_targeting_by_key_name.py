@@ -5,6 +5,7 @@ import logging
 from googleads import ad_manager
 
 from dfp.client import get_client
+from dfp.paginator import get_all_results
 
 def get_key_by_name(key_name):
   """
@@ -44,23 +45,13 @@ def get_custom_targeting_by_key_name(key_name):
 
   key_id = get_key_by_name(key_name)['id']
 
-  client = get_client()
-  custom_targeting_service = client.GetService('CustomTargetingService',
-    version='v202008')
-
-  statement = (ad_manager.StatementBuilder()
-    .Where('customTargetingKeyId = :customTargetingKeyId')
-    .WithBindVariable('customTargetingKeyId', key_id))
-  response = custom_targeting_service.getCustomTargetingValuesByStatement(
-    statement.ToStatement())
-
-  vals = []
-  while True:
-    response = custom_targeting_service.getCustomTargetingValuesByStatement(
-        statement.ToStatement())
-    if 'results' in response and len(response['results']) > 0:
-      vals = vals + response['results']
-      statement.offset += statement.limit
-    else:
-      break
-  return vals
+  values = [{
+    'key': 'customTargetingKeyId',
+    'value': {
+      'xsi_type': 'NumberValue',
+      'value': key_id
+    }
+  }]
+  return get_all_results('CustomTargetingService',
+    'getCustomTargetingValuesByStatement',
+    'WHERE customTargetingKeyId = :customTargetingKeyId', values)
@@ -2,9 +2,7 @@
 
 import logging
 
-from googleads import ad_manager
-
-from dfp.client import get_client
+from dfp.paginator import get_all_results
 
 def get_line_items_for_order(order_id):
   """
@@ -16,21 +14,15 @@ def get_line_items_for_order(order_id):
     an array of line items
   """
   print('Getting line items for order ID {0}...'.format(order_id))
-  client = get_client()
-  line_item_service = client.GetService('LineItemService', version='v202008')
-  statement = (ad_manager.StatementBuilder()
-    .Where('OrderId = :order_id')
-    .WithBindVariable('order_id', order_id))
-
-  line_items = []
-  while True:
-    response = line_item_service.getLineItemsByStatement(
-      statement.ToStatement())
-    if 'results' in response and len(response['results']) > 0:
-      line_items = line_items + response['results']
-      statement.offset += statement.limit
-    else:
-      break
+  values = [{
+    'key': 'order_id',
+    'value': {
+      'xsi_type': 'NumberValue',
+      'value': order_id
+    }
+  }]
+  line_items = get_all_results('LineItemService', 'getLineItemsByStatement',
+    'WHERE OrderId = :order_id', values)
 
   print('Finished fetching line items.')
 